@@ -22,8 +22,41 @@ class Settings(BaseModel):
     TRICKLE_CHARGING_PILE_NUM: int = int(os.getenv("TRICKLE_CHARGING_PILE_NUM", "3"))
     # 等候区车位容量 (与FAST_QUEUE_CAPACITY和TRICKLE_QUEUE_CAPACITY配合使用)
     WAITING_AREA_SIZE: int = int(os.getenv("WAITING_AREA_SIZE", "6"))
+    # 快充/慢充充电桩功率（度/小时）
+    FAST_PILE_POWER: float = float(os.getenv("FAST_PILE_POWER", "30"))
+    TRICKLE_PILE_POWER: float = float(os.getenv("TRICKLE_PILE_POWER", "7"))
     # 充电桩排队队列长度
     CHARGING_QUEUE_LEN: int = int(os.getenv("CHARGING_QUEUE_LEN", "2"))
+    # 等候区后台调度器的兜底轮询间隔（秒）
+    DISPATCH_INTERVAL: float = float(os.getenv("DISPATCH_INTERVAL", "5"))
+    # 充电桩与充电请求状态一致性检查的间隔（秒）
+    RECONCILE_INTERVAL: float = float(os.getenv("RECONCILE_INTERVAL", "30"))
+    # 状态推送：每个连接最多积压的消息数（超过后断开让客户端重连），空闲时的保活间隔（秒）
+    STREAM_MAX_PENDING: int = int(os.getenv("STREAM_MAX_PENDING", "256"))
+    STREAM_KEEPALIVE: float = float(os.getenv("STREAM_KEEPALIVE", "15"))
+    # 状态推送连接令牌的有效期（秒），只用于建立连接，连接建立后过期不影响推送
+    STREAM_TOKEN_EXPIRE_SECONDS: int = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", "60"))
+    # 充电通知长轮询最长挂起时间（秒）
+    NOTIFICATION_MAX_WAIT: float = float(os.getenv("NOTIFICATION_MAX_WAIT", "60"))
+    # 等候区批量调度策略：fifo（按到达顺序贪心）或 spt（最短处理时间优先）
+    DISPATCH_POLICY: str = os.getenv("DISPATCH_POLICY", "fifo")
+    # 充电桩选择及等候区排序策略：fifo、shortest_completion、sjf、least_loaded
+    SCHEDULING_POLICY: str = os.getenv("SCHEDULING_POLICY", "shortest_completion")
+    # 充电桩故障时的重新调度策略：priority（故障队列优先）或 time_order（按排队号码合并调度）
+    FAULT_RESCHEDULE_POLICY: str = os.getenv("FAULT_RESCHEDULE_POLICY", "priority")
+    # 充满后自动结束充电，及其时间轮刻度（秒）
+    AUTO_COMPLETE_CHARGING: bool = os.getenv("AUTO_COMPLETE_CHARGING", "true").lower() == "true"
+    COMPLETION_TICK: float = float(os.getenv("COMPLETION_TICK", "1"))
+    # 排队号码每次从数据库预留的号段大小
+    QUEUE_NUMBER_BLOCK_SIZE: int = int(os.getenv("QUEUE_NUMBER_BLOCK_SIZE", "20"))
+    # 编译后的电价方案缓存数量（LRU）
+    TARIFF_CACHE_SIZE: int = int(os.getenv("TARIFF_CACHE_SIZE", "16"))
+    # 历史详单重新计费时每批处理的行数（每批一个事务）
+    BACKFILL_CHUNK_SIZE: int = int(os.getenv("BACKFILL_CHUNK_SIZE", "5000"))
+    # 充电详单流式导出时每批读取的行数
+    EXPORT_BATCH_SIZE: int = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+    # 已完成充电会话的列式归档目录（按月分区）
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "./archive")
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -17,4 +17,28 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+def add_missing_columns(bind, metadata) -> list:
+    """
+    为已存在的表补充模型中新增的列（ALTER TABLE ADD COLUMN，带默认值）
+    create_all 只创建缺少的表，不会修改已有表；返回新增的 (表名, 列名) 列表
+    """
+    inspector = inspect(bind)
+    added = []
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+                if column.default is not None and column.default.is_scalar:
+                    ddl += f" DEFAULT {column.default.arg!r}"
+                conn.execute(text(ddl))
+                added.append((table.name, column.name))
+                print(f"数据表 {table.name} 新增列 {column.name}")
+    return added
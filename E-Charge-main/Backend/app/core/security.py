@@ -13,9 +13,13 @@ from ..core.config import settings
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM  
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+# 状态推送连接令牌的用途标记，带此标记的令牌不能当作访问令牌使用
+STREAM_TOKEN_SCOPE = "stream"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
+# 不强制要求 Authorization 头（EventSource 等无法设置请求头的客户端通过查询参数传递连接令牌）
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="api/token", auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -36,6 +40,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_stream_token(user: User) -> str:
+    """
+    创建状态推送连接令牌
+    EventSource 无法设置请求头，令牌只能放在 URL 中，可能被记录在访问日志、代理和浏览器历史里，
+    因此不直接使用访问令牌，而是签发只能用于建立推送连接、有效期很短的令牌
+    """
+    expire = datetime.utcnow() + timedelta(seconds=settings.STREAM_TOKEN_EXPIRE_SECONDS)
+    to_encode = {"sub": user.username, "uid": user.id, "scope": STREAM_TOKEN_SCOPE, "exp": expire}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
@@ -46,19 +60,52 @@ def get_current_user(
         detail="无效的认证凭据",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
+    user = get_user_by_token(token, db)
     if user is None:
         raise credentials_exception
     return user
 
+def decode_access_token(token: Optional[str]) -> Optional[dict]:
+    """校验访问令牌的签名和有效期（不查询数据库），令牌无效时返回None"""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None:
+        return None
+    # 推送连接令牌等限定用途的令牌不能当作访问令牌
+    if payload.get("scope") is not None:
+        return None
+    return payload
+
+def decode_stream_token(token: Optional[str]) -> Optional[dict]:
+    """校验状态推送连接令牌的签名、有效期和用途，令牌无效时返回None"""
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None or payload.get("scope") != STREAM_TOKEN_SCOPE:
+        return None
+    return payload
+
+def get_user_by_token(token: Optional[str], db: Session) -> Optional[User]:
+    """根据访问令牌获取用户，令牌无效时返回None"""
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    return db.query(User).filter(User.username == payload["sub"]).first()
+
+def get_user_by_stream_token(token: Optional[str], db: Session) -> Optional[User]:
+    """根据状态推送连接令牌获取用户，令牌无效时返回None"""
+    payload = decode_stream_token(token)
+    if payload is None:
+        return None
+    return db.query(User).filter(User.username == payload["sub"]).first()
+
 def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
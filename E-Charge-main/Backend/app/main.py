@@ -2,9 +2,10 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 from datetime import timedelta
 from .core.config import settings
-from .core.database import get_db, engine
+from .core.database import get_db, engine, add_missing_columns
 from .models import Base  # 从 __init__.py 导入 Base
 from .models.models import User, Vehicle
 from .routers import users, charging, admin
@@ -17,9 +18,16 @@ from .core.security import (
 from .schemas.user import Token
 from .services.auth import authenticate_user
 from .services.init_service import InitializationService
+from .services.station_state import station_state
+from .services.dispatcher import dispatcher
+from .services.completion_scheduler import completion_scheduler
+from .services.reconciler import reconciler
+from .services.event_hub import event_hub
+from .services.user_notifier import user_notifier
 
-# 创建数据库表
+# 创建数据库表，并为已有表补充新增的列
 Base.metadata.create_all(bind=engine)
+added_columns = add_missing_columns(engine, Base.metadata)
 
 # 创建默认数据
 def create_initial_data():
@@ -28,6 +36,18 @@ def create_initial_data():
     # 初始化充电桩
     InitializationService.initialize_charging_piles(db)
     
+    # 初始化并加载电价版本
+    InitializationService.initialize_tariffs(db)
+    
+    # 初始化充电详单小时汇总
+    InitializationService.initialize_rollups(db)
+    
+    # 新增的充电桩累计列按历史详单补齐
+    InitializationService.initialize_pile_counters(db, added_columns)
+    
+    # 加载常驻内存的充电站状态（充电桩队列与排队电量）
+    station_state.load(db)
+    
     # 检查是否已有车辆数据
     vehicle_count = db.query(Vehicle).count()
     if vehicle_count == 0:
@@ -49,13 +69,32 @@ try:
 except Exception as e:
     print(f"创建初始数据失败: {e}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动等候区后台调度器、充电自动结束调度器和状态一致性检查
+    dispatcher.start()
+    if settings.AUTO_COMPLETE_CHARGING:
+        completion_scheduler.start()
+    # 充电桩与充电请求状态一致性检查
+    reconciler.start()
+    # 状态变化推送及充电通知长轮询
+    event_hub.start()
+    user_notifier.start()
+    yield
+    user_notifier.stop()
+    event_hub.stop()
+    await reconciler.stop()
+    await completion_scheduler.stop()
+    await dispatcher.stop()
+
 app = FastAPI(
     title="充电站管理系统",
     description="基于FastAPI的充电站管理系统后端API",
     version="1.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -82,7 +121,8 @@ async def login_for_access_token(
         user = authenticate_user(db, form_data.username, form_data.password)
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            # uid 用于按用户的 ETag，无需查询数据库即可确定用户
+            data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException as e:
@@ -1 +1 @@
-from .models import Base, User, Vehicle, ChargingPile, ChargingRequest, ChargingDetail, ChargingMode, ChargingPileStatus 
\ No newline at end of file
+from .models import Base, User, Vehicle, ChargingPile, ChargingRequest, ChargingDetail, ChargingMode, ChargingPileStatus, QueueSequence, TariffVersion, BackfillCheckpoint, ChargingHourlyRollup 
\ No newline at end of file
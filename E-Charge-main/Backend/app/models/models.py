@@ -50,6 +50,9 @@ class ChargingPile(Base):
     total_charging_times = Column(Integer, default=0)
     total_charging_duration = Column(Float, default=0.0)  # 总充电时长（小时）
     total_charging_amount = Column(Float, default=0.0)    # 总充电量（度）
+    total_electricity_fee = Column(Float, default=0.0)    # 累计充电费用
+    total_service_fee = Column(Float, default=0.0)        # 累计服务费用
+    total_revenue = Column(Float, default=0.0)            # 累计总费用
     
     # 添加关系
     charging_requests = relationship("ChargingRequest", back_populates="charging_pile")
@@ -82,8 +85,8 @@ class ChargingDetail(Base):
     id = Column(Integer, primary_key=True, index=True)
     request_id = Column(Integer, ForeignKey("charging_requests.id"))
     charging_pile_id = Column(Integer, ForeignKey("charging_piles.id"))
-    start_time = Column(DateTime)
-    end_time = Column(DateTime)
+    start_time = Column(DateTime, index=True)
+    end_time = Column(DateTime, index=True)
     charging_amount = Column(Float)  # 实际充电量（度）
     charging_duration = Column(Float)  # 充电时长（小时）
     electricity_fee = Column(Float)  # 充电费用
@@ -92,4 +95,48 @@ class ChargingDetail(Base):
     
     # 添加关系
     request = relationship("ChargingRequest", back_populates="charging_details")
-    charging_pile = relationship("ChargingPile", back_populates="charging_details") 
\ No newline at end of file
+    charging_pile = relationship("ChargingPile", back_populates="charging_details") 
+
+class QueueSequence(Base):
+    __tablename__ = "queue_sequences"
+
+    # 每种充电模式一个排队号码序列
+    charging_mode = Column(Enum(ChargingMode), primary_key=True)
+    next_value = Column(Integer, nullable=False)  # 下一个未分配的号码
+
+class TariffVersion(Base):
+    __tablename__ = "tariff_versions"
+
+    # 电价方案按版本保存，修改电价时新增版本而不是修改已有版本
+    id = Column(Integer, primary_key=True, index=True)
+    effective_from = Column(DateTime, unique=True, nullable=False)  # 生效时间
+    service_fee_rate = Column(Float, nullable=False)  # 服务费单价（元/度）
+    schedule = Column(String, nullable=False)  # 各时段电价、时段划分、周末及季节方案（JSON）
+    description = Column(String)
+    created_at = Column(DateTime)
+
+class BackfillCheckpoint(Base):
+    __tablename__ = "backfill_checkpoints"
+
+    # 批量回填任务的进度，每个任务一行，与数据修改在同一事务中更新
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)  # 已处理的最大主键
+    processed = Column(Integer, nullable=False, default=0)  # 已处理行数
+    changed = Column(Integer, nullable=False, default=0)  # 已修改行数
+    updated_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+class ChargingHourlyRollup(Base):
+    __tablename__ = "charging_hourly_rollups"
+
+    # 充电详单按开始小时、结束小时和充电桩预聚合，结束充电时增量更新
+    # 主键以开始小时开头，报表按小时范围读取汇总行时走主键范围查找，不扫描整张表
+    start_hour = Column(DateTime, primary_key=True)  # 开始时间所在整点
+    end_hour = Column(DateTime, primary_key=True)  # 结束时间所在整点
+    charging_pile_id = Column(Integer, ForeignKey("charging_piles.id"), primary_key=True)
+    charging_times = Column(Integer, nullable=False, default=0)  # 充电次数
+    charging_duration = Column(Float, nullable=False, default=0.0)  # 充电时长（小时）
+    charging_amount = Column(Float, nullable=False, default=0.0)  # 充电量（度）
+    electricity_fee = Column(Float, nullable=False, default=0.0)  # 充电费用
+    service_fee = Column(Float, nullable=False, default=0.0)  # 服务费用
+    total_fee = Column(Float, nullable=False, default=0.0)  # 总费用
@@ -1,11 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+import json
 from ..core.database import get_db
-from ..models.models import User, ChargingPile, ChargingRequest, ChargingDetail, ChargingPileStatus as PileStatus
-from ..schemas.admin import ChargingPileStatus, ChargingPileResponse, ReportResponse
+from ..models.models import User, ChargingPile, ChargingRequest, TariffVersion, ChargingPileStatus as PileStatus
+from ..schemas.admin import (ChargingPileStatus, ChargingPileResponse, ReportResponse,
+                             TariffVersionCreate, TariffVersionResponse)
 from ..core.security import get_current_admin_user
+from ..services.station_state import station_state, ACTIVE_PILE_STATUSES
+from ..services.scheduling_service import SchedulingService
+from ..services.tariff import TariffSchedule
+from ..services.reconciler import reconciler
+from ..services.export_service import DetailExporter, EXPORT_FORMATS
+from ..services.report_service import ReportService, REPORT_BUCKETS, empty_statistics
+from ..services.tariff_registry import tariff_registry
+from ..services.etag import StateETag
 
 router = APIRouter(
     tags=["admin"]
@@ -26,6 +37,10 @@ def get_status_text(status):
     else:
         return "未知状态"
 
+def get_pile_name(charging_mode, pile_number):
+    """充电桩显示名称"""
+    return f"{'快充桩' if charging_mode.value == 'fast' else '慢充桩'} {pile_number}"
+
 @router.put("/piles/{pile_id}/status")
 def update_pile_status(
     pile_id: int,
@@ -41,13 +56,25 @@ def update_pile_status(
             detail="充电桩不存在"
         )
     
+    was_active = pile.status in ACTIVE_PILE_STATUSES
     pile.status = status
-    db.commit()
+    scheduling_service = SchedulingService(db)
+    if status not in ACTIVE_PILE_STATUSES:
+        # 故障/维护/关闭：队列中的车辆一次性重新调度
+        scheduling_service.handle_fault_pile(pile)
+    else:
+        db.commit()
+        if not was_active:
+            # 充电桩恢复，重新平衡同模式的排队车辆
+            scheduling_service.rebalance_on_recovery(pile)
+        else:
+            station_state.pile_status_changed(pile)
     
     return {"message": "充电桩状态已更新"}
 
 @router.get("/piles", response_model=List[ChargingPileResponse])
 def get_all_piles(
+    _: None = Depends(StateETag("admin-piles")),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
@@ -129,96 +156,86 @@ def get_report(
     start_date: datetime,
     end_date: datetime,
     pile_id: int = None,
+    bucket: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """获取报表数据"""
-    print(f"报表API调用 - 开始时间: {start_date}, 结束时间: {end_date}, 充电桩ID: {pile_id}")
-    
-    # 构建查询条件
-    query = db.query(ChargingDetail).filter(
-        ChargingDetail.start_time >= start_date,
-        ChargingDetail.end_time <= end_date
-    )
-    
-    # 如果指定了充电桩ID，添加过滤条件
-    if pile_id is not None:
-        query = query.filter(ChargingDetail.charging_pile_id == pile_id)
-        print(f"过滤特定充电桩: {pile_id}")
+    """获取报表数据（bucket 可选 day/week/month，按时间分桶统计）"""
+    print(f"报表API调用 - 开始时间: {start_date}, 结束时间: {end_date}, 充电桩ID: {pile_id}, 分桶: {bucket}")
+    if bucket is not None and bucket not in REPORT_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="分桶方式只支持 day、week、month"
+        )
     
-    details = query.all()
-    print(f"查询到 {len(details)} 条充电详单记录")
+    # 在数据库中按充电桩聚合，不加载详单
+    report_service = ReportService(db)
+    pile_stats = report_service.pile_statistics(start_date, end_date, pile_id)
     
     # 如果没有数据，返回空的统计结果
-    if not details:
+    if not pile_stats:
         print("没有找到充电详单数据")
         return {
             "start_date": start_date,
             "end_date": end_date,
-            "pile_statistics": {}
+            "pile_statistics": {},
+            "buckets": {} if bucket else None
         }
     
-    # 按充电桩分组统计
-    pile_stats = {}
-    for detail in details:
-        pile_id_key = detail.charging_pile_id
-        if pile_id_key not in pile_stats:
-            pile_stats[pile_id_key] = {
-                "charging_times": 0,
-                "total_duration": 0.0,
-                "total_amount": 0.0,
-                "total_electricity_fee": 0.0,
-                "total_service_fee": 0.0,
-                "total_fee": 0.0
-            }
-        
-        stats = pile_stats[pile_id_key]
-        stats["charging_times"] += 1
-        stats["total_duration"] += float(detail.charging_duration or 0)
-        stats["total_amount"] += float(detail.charging_amount or 0)
-        stats["total_electricity_fee"] += float(detail.electricity_fee or 0)
-        stats["total_service_fee"] += float(detail.service_fee or 0)
-        stats["total_fee"] += float(detail.total_fee or 0)
-    
-    print(f"统计结果: {pile_stats}")
-    
-    # 确保所有充电桩都有统计数据（即使为0）
-    if pile_id is None:
-        # 获取所有充电桩
-        all_piles = db.query(ChargingPile).all()
-        for pile in all_piles:
-            if pile.id not in pile_stats:
-                pile_stats[pile.id] = {
-                    "charging_times": 0,
-                    "total_duration": 0.0,
-                    "total_amount": 0.0,
-                    "total_electricity_fee": 0.0,
-                    "total_service_fee": 0.0,
-                    "total_fee": 0.0
-                }
-    elif pile_id is not None and pile_id not in pile_stats:
+    if pile_id is not None and pile_id not in pile_stats:
         # 如果指定的充电桩没有数据，也要返回0值统计
-        pile_stats[pile_id] = {
-            "charging_times": 0,
-            "total_duration": 0.0,
-            "total_amount": 0.0,
-            "total_electricity_fee": 0.0,
-            "total_service_fee": 0.0,
-            "total_fee": 0.0
-        }
+        pile_stats[pile_id] = empty_statistics()
     
     return {
         "start_date": start_date,
         "end_date": end_date,
-        "pile_statistics": pile_stats
+        "pile_statistics": pile_stats,
+        "buckets": report_service.bucket_statistics(start_date, end_date, bucket, pile_id) if bucket else None
+    }
+
+@router.get("/reconciler")
+def get_reconciler_status(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """状态一致性检查的运行次数和各类修复的累计次数"""
+    return {
+        "interval": reconciler.interval,
+        "last_run": reconciler.last_run,
+        "counters": dict(reconciler.counters)
     }
 
+@router.get("/details/export")
+def export_charging_details(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    pile_id: Optional[int] = None,
+    format: str = "csv",
+    current_user: User = Depends(get_current_admin_user)
+):
+    """流式导出充电详单（关联请求、用户和充电桩），format: csv 或 ndjson"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="导出格式只支持 csv、ndjson"
+        )
+    exporter = DetailExporter(start_date=start_date, end_date=end_date, pile_id=pile_id)
+    return StreamingResponse(
+        exporter.stream(format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="charging_details.{format}"'}
+    )
+
 @router.get("/statistics")
 def get_admin_statistics(
+    # 等待时长按分钟显示，ETag 每分钟更新
+    _: None = Depends(StateETag("admin-statistics", period=60)),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """获取管理员仪表盘统计数据"""
+    """获取管理员仪表盘统计数据（查询次数固定，与充电桩和排队车辆数量无关）"""
+    report_service = ReportService(db)
+    now = datetime.now()
+    
     # 获取所有充电桩
     charging_piles = db.query(ChargingPile).all()
     
@@ -226,47 +243,27 @@ def get_admin_statistics(
     active_piles = sum(1 for pile in charging_piles if pile.status in [PileStatus.AVAILABLE, PileStatus.OCCUPIED])
     total_piles = len(charging_piles)
     
+    # 一次查询按充电桩和状态统计排队、充电中的请求
+    breakdown = report_service.request_breakdown()
+    
     # 获取排队车辆总数
-    queued_cars = db.query(ChargingRequest).filter(
-        ChargingRequest.status == "waiting"
-    ).count()
+    queued_cars = sum(count for (_, request_status), count in breakdown.items() if request_status == "waiting")
     
     # 计算今日总收入
-    today = datetime.now().date()
+    today = now.date()
     today_start = datetime.combine(today, datetime.min.time())
     today_end = datetime.combine(today, datetime.max.time())
     
-    today_details = db.query(ChargingDetail).filter(
-        ChargingDetail.start_time >= today_start,
-        ChargingDetail.end_time <= today_end
-    ).all()
-    
-    total_revenue = sum(detail.total_fee for detail in today_details)
+    total_revenue = report_service.totals(today_start, today_end)["total_fee"]
     
     # 获取充电桩详细信息
     pile_details = []
     for pile in charging_piles:
-        # 获取与该充电桩相关的所有充电详单
-        details = db.query(ChargingDetail).filter(
-            ChargingDetail.charging_pile_id == pile.id
-        ).all()
-        
-        # 计算总充电次数、时长和充电量
-        total_charges = len(details)
-        total_hours = sum(detail.charging_duration for detail in details)
-        total_energy = sum(detail.charging_amount for detail in details)
-        
         # 获取该充电桩的排队车辆数量
-        queue_count = db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status == "waiting"
-        ).count()
+        queue_count = breakdown.get((pile.id, "waiting"), 0)
         
         # 检查充电桩是否有正在充电的请求
-        is_occupied = db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status == "charging"
-        ).first() is not None
+        is_occupied = breakdown.get((pile.id, "charging"), 0) > 0
         
         # 确定充电桩的实际状态
         actual_status = pile.status
@@ -275,25 +272,22 @@ def get_admin_statistics(
         
         pile_details.append({
             "id": pile.id,
-            "name": f"{'快充桩' if pile.charging_mode.value == 'fast' else '慢充桩'} {pile.pile_number}",
+            "name": get_pile_name(pile.charging_mode, pile.pile_number),
             "isActive": actual_status in [PileStatus.AVAILABLE, PileStatus.OCCUPIED],
             "isOccupied": actual_status == PileStatus.OCCUPIED,
             "statusText": get_status_text(actual_status),
-            "totalCharges": total_charges,
-            "totalHours": round(total_hours, 2),
-            "totalEnergy": round(total_energy, 2),
+            # 累计数据取自充电桩上的累计字段，与充电桩详情一致
+            "totalCharges": pile.total_charging_times or 0,
+            "totalHours": round(pile.total_charging_duration or 0.0, 2),
+            "totalEnergy": round(pile.total_charging_amount or 0.0, 2),
             "queueCount": queue_count
         })
     
-    # 获取等待车辆信息
+    # 获取等待车辆信息（连同用户名、充电桩和电池容量一次查询）
     waiting_cars = []
-    queued_requests = db.query(ChargingRequest).filter(
-        ChargingRequest.status == "waiting"
-    ).order_by(ChargingRequest.created_at).all()
-    
-    for req in queued_requests:
+    for req, username, pile_mode, pile_number, battery_capacity in report_service.waiting_requests():
         # 计算等待时间
-        wait_time = datetime.now() - req.created_at
+        wait_time = now - req.created_at
         hours, remainder = divmod(wait_time.total_seconds(), 3600)
         minutes, _ = divmod(remainder, 60)
         
@@ -305,21 +299,14 @@ def get_admin_statistics(
         
         # 获取充电桩名称
         pile_name = "未分配"
-        if req.charging_pile_id:
-            pile = db.query(ChargingPile).filter(ChargingPile.id == req.charging_pile_id).first()
-            if pile:
-                pile_name = f"{'快充桩' if pile.charging_mode.value == 'fast' else '慢充桩'} {pile.pile_number}"
-        
-        # 获取用户的车辆电池容量
-        battery_capacity = 0
-        if req.vehicle:
-            battery_capacity = req.vehicle.battery_capacity
+        if pile_number is not None:
+            pile_name = get_pile_name(pile_mode, pile_number)
         
         waiting_cars.append({
             "id": req.id,
             "pileName": pile_name,
-            "userId": db.query(User).filter(User.id == req.user_id).first().username,
-            "batteryCapacity": battery_capacity,
+            "userId": username,
+            "batteryCapacity": battery_capacity or 0,
             "requestedCharge": req.requested_amount,
             "queueTime": queue_time,
             "status": "排队中",
@@ -361,6 +348,8 @@ def start_charging_pile(
     # 将充电桩状态更新为可用
     pile.status = PileStatus.AVAILABLE
     db.commit()
+    # 充电桩恢复，重新平衡同模式的排队车辆
+    SchedulingService(db).rebalance_on_recovery(pile)
     
     return {
         "message": "充电桩启动成功",
@@ -381,11 +370,6 @@ def get_pile_detail(
             detail="充电桩不存在"
         )
     
-    # 获取该充电桩的所有充电详情记录
-    details = db.query(ChargingDetail).filter(
-        ChargingDetail.charging_pile_id == pile_id
-    ).all()
-    
     # 获取当前排队的车辆数
     queue_count = db.query(ChargingRequest).filter(
         ChargingRequest.charging_pile_id == pile_id,
@@ -425,23 +409,19 @@ def get_pile_detail(
             "started_at": charging_vehicle.started_at
         }
     
-    # 计算累计数据
-    total_charges = len(details)
-    total_hours = sum(detail.charging_duration for detail in details)
-    total_energy = sum(detail.charging_amount for detail in details)
-    total_revenue = sum(detail.total_fee for detail in details)
-    
-    # 添加额外计算信息到返回结果
+    # 累计数据直接读取充电桩上结束充电时维护的累计字段
     return {
         "id": pile.id,
         "pile_number": pile.pile_number,
         "charging_mode": pile.charging_mode,
         "status": pile.status,
         "power": pile.power,
-        "total_charging_times": total_charges,
-        "total_charging_duration": round(total_hours, 2),
-        "total_charging_amount": round(total_energy, 2),
-        "total_revenue": round(total_revenue, 2),
+        "total_charging_times": pile.total_charging_times or 0,
+        "total_charging_duration": round(pile.total_charging_duration or 0.0, 2),
+        "total_charging_amount": round(pile.total_charging_amount or 0.0, 2),
+        "total_electricity_fee": round(pile.total_electricity_fee or 0.0, 2),
+        "total_service_fee": round(pile.total_service_fee or 0.0, 2),
+        "total_revenue": round(pile.total_revenue or 0.0, 2),
         "queue_count": queue_count,
         "current_charging": current_charging  # 添加当前正在充电的车辆信息
     }
@@ -470,11 +450,13 @@ def toggle_pile_status(
             )
         pile.status = PileStatus.CLOSED
         message = "充电桩已关闭"
+        # 队列中的车辆一次性重新调度
+        SchedulingService(db).handle_fault_pile(pile)
     else:
         pile.status = PileStatus.AVAILABLE
         message = "充电桩已启用"
-    
-    db.commit()
+        db.commit()
+        SchedulingService(db).rebalance_on_recovery(pile)
     
     return {
         "message": message,
@@ -483,6 +465,7 @@ def toggle_pile_status(
 
 @router.get("/waiting-area")
 def get_waiting_area(
+    _: None = Depends(StateETag("admin-waiting-area", period=60)),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
@@ -510,4 +493,52 @@ def get_waiting_area(
             "created_at": req.created_at
         })
     
-    return result 
\ No newline at end of file
+    return result
+
+def _tariff_version_response(version: TariffVersion) -> dict:
+    schedule = json.loads(version.schedule)
+    return {
+        "id": version.id,
+        "effective_from": version.effective_from,
+        "service_fee_rate": version.service_fee_rate,
+        "rates": schedule["rates"],
+        "periods": schedule["periods"],
+        "weekend_periods": schedule.get("weekend_periods"),
+        "seasons": schedule.get("seasons") or [],
+        "description": version.description,
+        "created_at": version.created_at
+    }
+
+@router.get("/tariffs", response_model=List[TariffVersionResponse])
+def get_tariff_versions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """获取所有电价版本（按生效时间排序）"""
+    versions = db.query(TariffVersion).order_by(TariffVersion.effective_from).all()
+    return [_tariff_version_response(version) for version in versions]
+
+@router.post("/tariffs", response_model=TariffVersionResponse)
+def create_tariff_version(
+    tariff: TariffVersionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """新增电价版本，从生效时间起按新电价计费，跨越生效时间的充电分段计费"""
+    try:
+        schedule = TariffSchedule(
+            tariff.effective_from, tariff.rates, tariff.periods, tariff.service_fee_rate,
+            tariff.weekend_periods, [season.model_dump() for season in tariff.seasons]
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if db.query(TariffVersion).filter(TariffVersion.effective_from == tariff.effective_from).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="该生效时间已有电价版本"
+        )
+    version = tariff_registry.add_version(db, schedule, tariff.description)
+    return _tariff_version_response(version)
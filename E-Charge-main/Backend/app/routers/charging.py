@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
-from ..core.database import get_db
+from ..core.database import get_db, SessionLocal
 from ..models.models import User, ChargingRequest, ChargingPile, ChargingMode, ChargingDetail, ChargingPileStatus
 from ..schemas.charging import ChargingRequestCreate, ChargingRequestResponse
 from pydantic import BaseModel
 from ..services.scheduling_service import SchedulingService
-from ..services.billing_service import BillingService
-from ..core.security import get_current_user, get_current_admin_user
+from ..services.station_state import station_state
+from ..services.queue_status import queue_status_view
+from ..services.queue_numbers import queue_number_allocator
+from ..services.admission import admission_controller
+from ..core.security import (
+    get_current_user, get_current_admin_user, get_user_by_token, get_user_by_stream_token,
+    create_stream_token, oauth2_scheme, oauth2_scheme_optional
+)
 from ..core.config import settings
+from ..services.export_service import DetailExporter, EXPORT_FORMATS
+from ..services.event_hub import event_hub
+from ..services.user_notifier import user_notifier
+from ..services.etag import StateETag
 
 router = APIRouter(
     tags=["charging"]
@@ -26,51 +38,35 @@ def create_charging_request(
     current_user: User = Depends(get_current_user)
 ):
     """创建充电请求"""
-    # 只检查等候区容量（未分配充电桩的等待请求）
-    waiting_area_count = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == request.charging_mode,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.is_(None)
-    ).count()
-    
-    max_capacity = (settings.FAST_QUEUE_CAPACITY 
-                    if request.charging_mode == ChargingMode.FAST 
-                    else settings.TRICKLE_QUEUE_CAPACITY)
-    
-    if waiting_area_count >= max_capacity:
+    # 原子地预留等候区名额（只计算未分配充电桩的等待请求），已满时直接拒绝
+    if not admission_controller.try_reserve(request.charging_mode, db):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="等候区已满，请稍后再试"
         )
     
-    # 生成排队号码
-    prefix = "F" if request.charging_mode == ChargingMode.FAST else "T"
-    last_request = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == request.charging_mode
-    ).order_by(ChargingRequest.id.desc()).first()
-    
-    if last_request:
-        last_number = int(last_request.queue_number[1:])
-        new_number = last_number + 1
-    else:
-        new_number = 1
-    
-    queue_number = f"{prefix}{new_number}"
-    
-    # 创建充电请求
-    db_request = ChargingRequest(
-        user_id=current_user.id,
-        vehicle_id=request.vehicle_id,
-        queue_number=queue_number,
-        charging_mode=request.charging_mode,
-        requested_amount=request.requested_amount,
-        status="waiting",
-        created_at=datetime.now()
-    )
-    
-    db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    try:
+        # 生成排队号码（按充电模式的序列原子分配）
+        queue_number = queue_number_allocator.next_number(request.charging_mode)
+        
+        # 创建充电请求
+        db_request = ChargingRequest(
+            user_id=current_user.id,
+            vehicle_id=request.vehicle_id,
+            queue_number=queue_number,
+            charging_mode=request.charging_mode,
+            requested_amount=request.requested_amount,
+            status="waiting",
+            created_at=datetime.now()
+        )
+        
+        db.add(db_request)
+        db.commit()
+        db.refresh(db_request)
+    except Exception:
+        # 创建失败，归还预留的名额
+        admission_controller.release(request.charging_mode)
+        raise
     
     # 计算前车等待数量
     waiting_count = db.query(ChargingRequest).filter(
@@ -81,13 +77,13 @@ def create_charging_request(
     
     # 尝试分配充电桩
     scheduling_service = SchedulingService(db)
-    assigned_pile = scheduling_service.assign_charging_pile(db_request)
+    with station_state.lock:
+        # 名额转为等候区请求并立即分配，后台调度器不会同时调度该请求
+        admission_controller.admit(db_request)
+        assigned_pile = scheduling_service.assign_charging_pile(db_request)
     
     if assigned_pile:
-        db_request.charging_pile_id = assigned_pile.id
-        db_request.status = "charging"
-        db_request.started_at = datetime.now()
-        db.commit()
+        # 请求状态（直接充电或在充电桩后排队）已由调度服务设置
         db.refresh(db_request)
         waiting_count = 0  # 已分配充电桩，无需等待
     
@@ -98,6 +94,7 @@ def create_charging_request(
 
 @router.get("/requests", response_model=List[ChargingRequestResponse])
 def get_user_requests(
+    _: None = Depends(StateETag("requests", per_user=True)),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -156,194 +153,63 @@ def cancel_charging_request(
     request.status = "cancelled"
     request.completed_at = datetime.now()
     db.commit()
+    station_state.request_cancelled(request)
     
     return {"message": "充电请求已取消"}
 
 @router.get("/queue/status")
-def get_queue_status(db: Session = Depends(get_db)):
-    """获取排队状态"""
-    # 首先检查数据一致性，确保充电桩状态与充电请求状态一致
-    # 查找所有标记为充电中但关联的充电桩已不存在的请求
-    orphaned_charging_requests = db.query(ChargingRequest).filter(
-        ChargingRequest.status == "charging",
-        ChargingRequest.charging_pile_id.is_(None)
-    ).all()
-    
-    # 修复这些孤立的请求
-    for req in orphaned_charging_requests:
-        req.status = "waiting"  # 改为等待状态
-        print(f"修复孤立的充电请求 {req.queue_number}: 无关联充电桩但标记为充电中")
-    
-    if orphaned_charging_requests:
-        db.commit()
-        print(f"已修复 {len(orphaned_charging_requests)} 个孤立的充电请求")
-    
-    # 获取等待中请求的数量（不包括已分配充电桩的请求）
-    fast_waiting_area = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == ChargingMode.FAST,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.is_(None)
-    ).count()
-    
-    trickle_waiting_area = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == ChargingMode.TRICKLE,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.is_(None)
-    ).count()
-    
-    # 获取已分配充电桩但仍在等待的请求数量
-    fast_waiting_queue = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == ChargingMode.FAST,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.isnot(None)
-    ).count()
-    
-    trickle_waiting_queue = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == ChargingMode.TRICKLE,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.isnot(None)
-    ).count()
-    
-    # 计算总等待数
-    fast_waiting = fast_waiting_area + fast_waiting_queue
-    trickle_waiting = trickle_waiting_area + trickle_waiting_queue
-    
-    # 获取所有充电桩
-    fast_piles = db.query(ChargingPile).filter(
-        ChargingPile.charging_mode == ChargingMode.FAST
-    ).all()
-    
-    trickle_piles = db.query(ChargingPile).filter(
-        ChargingPile.charging_mode == ChargingMode.TRICKLE
-    ).all()
-    
-    # 修复：确保每个充电桩最多只有一辆车处于充电状态
-    fast_charging_count = 0
-    trickle_charging_count = 0
-    
-    for pile in fast_piles + trickle_piles:
-        charging_requests = db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status == "charging"
-        ).order_by(ChargingRequest.created_at).all()
-        
-        # 如果有多个充电请求，只保留最早的一个
-        if len(charging_requests) > 1:
-            keep_request = charging_requests[0]
-            print(f"充电桩 {pile.pile_number} (ID: {pile.id}) 发现多辆车同时充电，保留最早的请求 {keep_request.queue_number}")
-            
-            for req in charging_requests[1:]:
-                req.status = "waiting"
-                print(f"将请求 {req.queue_number} 改为等待状态")
-            
-            db.commit()
-        
-        # 统计正在充电的车辆
-        if len(charging_requests) > 0:
-            if pile.charging_mode == ChargingMode.FAST:
-                fast_charging_count += 1
-            else:
-                trickle_charging_count += 1
-    
-    # 构建充电桩信息
-    fast_pile_info = []
-    for pile in fast_piles:
-        # 检查该充电桩是否有正在充电的请求
-        charging_request = db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status == "charging"
-        ).first()
-        
-        is_charging = charging_request is not None
-        
-        status = pile.status
-        if is_charging and status != ChargingPileStatus.OCCUPIED:
-            # 更新充电桩状态以保持一致性
-            pile.status = ChargingPileStatus.OCCUPIED
-            db.commit()
-            status = ChargingPileStatus.OCCUPIED
-        elif not is_charging and status == ChargingPileStatus.OCCUPIED:
-            # 如果充电桩显示为占用但没有充电请求，更新为可用状态
-            pile.status = ChargingPileStatus.AVAILABLE
-            db.commit()
-            status = ChargingPileStatus.AVAILABLE
-            
-        # 添加充电桩信息和充电中的车辆信息
-        current_vehicle = None
-        if is_charging:
-            user = db.query(User).filter(User.id == charging_request.user_id).first()
-            current_vehicle = {
-                "id": charging_request.id,
-                "queue_number": charging_request.queue_number,
-                "user_name": user.username if user else "未知用户",
-                "requested_amount": charging_request.requested_amount
-            }
-        
-        fast_pile_info.append({
-            "id": pile.id,
-            "number": pile.pile_number,
-            "status": status.value,
-            "current_vehicle": current_vehicle
-        })
-        
-    trickle_pile_info = []
-    for pile in trickle_piles:
-        # 检查该充电桩是否有正在充电的请求
-        charging_request = db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status == "charging"
-        ).first()
-        
-        is_charging = charging_request is not None
-        
-        status = pile.status
-        if is_charging and status != ChargingPileStatus.OCCUPIED:
-            # 更新充电桩状态以保持一致性
-            pile.status = ChargingPileStatus.OCCUPIED
-            db.commit()
-            status = ChargingPileStatus.OCCUPIED
-        elif not is_charging and status == ChargingPileStatus.OCCUPIED:
-            # 如果充电桩显示为占用但没有充电请求，更新为可用状态
-            pile.status = ChargingPileStatus.AVAILABLE
-            db.commit()
-            status = ChargingPileStatus.AVAILABLE
-            
-        # 添加充电桩信息和充电中的车辆信息
-        current_vehicle = None
-        if is_charging:
-            user = db.query(User).filter(User.id == charging_request.user_id).first()
-            current_vehicle = {
-                "id": charging_request.id,
-                "queue_number": charging_request.queue_number,
-                "user_name": user.username if user else "未知用户",
-                "requested_amount": charging_request.requested_amount
-            }
-        
-        trickle_pile_info.append({
-            "id": pile.id,
-            "number": pile.pile_number,
-            "status": status.value,
-            "current_vehicle": current_vehicle
-        })
-    
-    # 打印返回的统计数据
-    print("\n返回的统计数据:")
-    print(f"快充等候区: {fast_waiting_area}, 快充队列: {fast_waiting_queue}, 快充中: {fast_charging_count}")
-    print(f"慢充等候区: {trickle_waiting_area}, 慢充队列: {trickle_waiting_queue}, 慢充中: {trickle_charging_count}")
-    
+def get_queue_status(
+    _: None = Depends(StateETag("queue-status", public=True)),
+    db: Session = Depends(get_db)
+):
+    """获取排队状态（只读，由内存中的充电站状态生成，状态未变化时返回缓存结果或304）"""
+    return queue_status_view.snapshot(db)
+
+def _user_from_token(token: Optional[str], lookup=get_user_by_token) -> Optional[User]:
+    # 只在建立连接时短暂使用数据库会话，推送或长轮询挂起期间不占用连接
+    db = SessionLocal()
+    try:
+        return lookup(token, db)
+    finally:
+        db.close()
+
+@router.post("/stream/token")
+def create_station_stream_token(current_user: User = Depends(get_current_user)):
+    """签发状态推送连接令牌（短期有效，只能用于建立 /stream 连接）"""
     return {
-        "fast_waiting": fast_waiting,
-        "trickle_waiting": trickle_waiting,
-        "fast_charging": fast_charging_count,
-        "trickle_charging": trickle_charging_count,
-        "fast_piles": fast_pile_info,
-        "trickle_piles": trickle_pile_info,
-        "fast_waiting_area": fast_waiting_area,
-        "trickle_waiting_area": trickle_waiting_area,
-        "fast_waiting_queue": fast_waiting_queue,
-        "trickle_waiting_queue": trickle_waiting_queue
+        "token": create_stream_token(current_user),
+        "expires_in": settings.STREAM_TOKEN_EXPIRE_SECONDS
     }
 
+@router.get("/stream")
+async def stream_station_events(
+    token: Optional[str] = None,
+    header_token: Optional[str] = Depends(oauth2_scheme_optional)
+):
+    """
+    充电站状态推送（Server-Sent Events）
+    连接后先收到 hello（当前状态版本号），之后每次状态变化收到一条全站事件，
+    与当前用户请求相关的变化另收到一条 my_request 事件；收到 resync 时应重新获取完整状态并重连。
+    EventSource 无法设置请求头，可先通过 POST /stream/token 获取连接令牌，再以 ?token= 传递；
+    URL 中只接受连接令牌，不接受访问令牌，避免访问令牌出现在日志、代理和浏览器历史中
+    """
+    if token:
+        user = await run_in_threadpool(_user_from_token, token, get_user_by_stream_token)
+    else:
+        user = await run_in_threadpool(_user_from_token, header_token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    subscription = event_hub.subscribe(user.id)
+    return StreamingResponse(
+        event_hub.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/details")
 def get_user_charging_details(
     db: Session = Depends(get_db),
@@ -359,6 +225,24 @@ def get_user_charging_details(
     
     return charging_details
 
+@router.get("/details/export")
+def export_user_charging_details(
+    format: str = "csv",
+    current_user: User = Depends(get_current_user)
+):
+    """流式导出用户的充电详单（format: csv 或 ndjson）"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="导出格式只支持 csv、ndjson"
+        )
+    exporter = DetailExporter(user_id=current_user.id)
+    return StreamingResponse(
+        exporter.stream(format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="charging_details.{format}"'}
+    )
+
 @router.get("/statistics")
 def get_user_charging_statistics(
     db: Session = Depends(get_db),
@@ -449,66 +333,29 @@ def finish_charging(
             detail="该充电请求未开始充电"
         )
     
-    end_time = datetime.now()
-    charging_request.completed_at = end_time
-    charging_request.status = "completed"
-    
-    # 获取充电桩信息
-    charging_pile = charging_request.charging_pile
-    if not charging_pile:
+    if not charging_request.charging_pile:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="充电请求未关联充电桩"
         )
     
-    # 计算充电时长（小时）
-    charging_duration = (end_time - charging_request.started_at).total_seconds() / 3600
-    
-    # 根据充电桩功率计算实际充电量
-    charging_amount = min(charging_pile.power * charging_duration, charging_request.requested_amount)
-    
-    # 使用计费服务计算费用
-    billing_service = BillingService()
-    electricity_fee, service_fee, total_fee = billing_service.calculate_fee(
-        charging_amount, 
-        charging_request.started_at, 
-        end_time
-    )
-    
-    # 创建充电详单
-    charging_detail = ChargingDetail(
-        request_id=charging_request.id,
-        charging_pile_id=charging_pile.id,
-        start_time=charging_request.started_at,
-        end_time=end_time,
-        charging_amount=charging_amount,
-        charging_duration=charging_duration,
-        electricity_fee=electricity_fee,
-        service_fee=service_fee,
-        total_fee=total_fee
-    )
-    
-    # 更新充电桩的累计充电数据
-    charging_pile.total_charging_times += 1
-    charging_pile.total_charging_duration += charging_duration
-    charging_pile.total_charging_amount += charging_amount
-    
-    # 保存数据
-    db.add(charging_detail)
-    db.commit()
-    
-    # 让下一辆等待的车开始充电
+    # 计费、生成详单并让下一辆车开始充电（与到时自动结束共用同一流程）
     scheduling_service = SchedulingService(db)
-    scheduling_service.handle_charging_completion(charging_pile)
+    charging_detail = scheduling_service.complete_charging(charging_request, datetime.now())
+    if charging_detail is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="只有正在充电的请求才能结束充电"
+        )
     
     return {
         "message": "充电已完成",
         "detail_id": charging_detail.id,
-        "charging_amount": round(charging_amount, 2),
-        "charging_duration": round(charging_duration, 2),
-        "electricity_fee": round(electricity_fee, 2),
-        "service_fee": round(service_fee, 2),
-        "total_fee": round(total_fee, 2)
+        "charging_amount": round(charging_detail.charging_amount, 2),
+        "charging_duration": round(charging_detail.charging_duration, 2),
+        "electricity_fee": round(charging_detail.electricity_fee, 2),
+        "service_fee": round(charging_detail.service_fee, 2),
+        "total_fee": round(charging_detail.total_fee, 2)
     }
 
 @router.get("/queue/status/current")
@@ -571,9 +418,9 @@ def get_current_queue_status(
     
     # 根据充电模式获取充电功率
     if request.charging_mode == ChargingMode.FAST:
-        power = 30  # 快充功率（度/小时）
+        power = settings.FAST_PILE_POWER  # 快充功率（度/小时）
     else:
-        power = 7  # 慢充功率（度/小时）
+        power = settings.TRICKLE_PILE_POWER  # 慢充功率（度/小时）
     
     # 如果已经分配了充电桩，计算更准确的等待时间
     if request.charging_pile_id:
@@ -682,16 +529,10 @@ def precheck_charging_request(
             }
         }
     
-    # 只检查等候区容量（未分配充电桩的等待请求）
-    waiting_area_count = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == charging_mode,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.is_(None)
-    ).count()
-    
-    max_capacity = (settings.FAST_QUEUE_CAPACITY 
-                    if charging_mode == ChargingMode.FAST 
-                    else settings.TRICKLE_QUEUE_CAPACITY)
+    # 只检查等候区容量（未分配充电桩的等待请求），使用准入控制的内存计数
+    station_state.ensure_loaded(db)
+    waiting_area_count = admission_controller.occupancy(charging_mode)
+    max_capacity = admission_controller.capacity(charging_mode)
     
     if waiting_area_count >= max_capacity:
         return {
@@ -722,13 +563,6 @@ def precheck_charging_request(
         ChargingRequest.charging_pile_id.isnot(None)
     ).count()
     
-    # 检查等候区排队情况（未分配充电桩的等待请求）
-    waiting_area_count = db.query(ChargingRequest).filter(
-        ChargingRequest.charging_mode == charging_mode,
-        ChargingRequest.status == "waiting",
-        ChargingRequest.charging_pile_id.is_(None)
-    ).count()
-    
     # 分析可能的状态
     if len(available_piles) > 0 and waiting_area_count == 0 and charging_queue_count == 0:
         # 有空闲充电桩且无等待车辆，可以直接充电
@@ -741,7 +575,7 @@ def precheck_charging_request(
         message = "当前充电桩已满，但可进入充电区排队"
         
         # 计算预计等待时间
-        power = 30 if charging_mode == ChargingMode.FAST else 7  # 充电功率
+        power = settings.FAST_PILE_POWER if charging_mode == ChargingMode.FAST else settings.TRICKLE_PILE_POWER  # 充电功率
         avg_wait_time = 0
         
         # 简单估算：假设平均每个请求的充电量为10度，所需时间 = 充电量/功率
@@ -774,7 +608,7 @@ def precheck_charging_request(
         message = "需要进入等候区等待"
         
         # 估算等待时间（更复杂，考虑等候区和充电区的等待）
-        power = 30 if charging_mode == ChargingMode.FAST else 7
+        power = settings.FAST_PILE_POWER if charging_mode == ChargingMode.FAST else settings.TRICKLE_PILE_POWER
         pile_count = len(available_piles) + len(occupied_piles)
         if pile_count == 0:
             estimated_wait = "无法估计（无可用充电桩）"
@@ -802,6 +636,7 @@ def precheck_charging_request(
 
 @router.get("/piles")
 def get_piles_info(
+    _: None = Depends(StateETag("piles")),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -879,12 +714,14 @@ def get_waiting_vehicles(
     return waiting_vehicles
 
 @router.get("/user/charging-notification")
-def get_charging_notification(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+async def get_charging_notification(
+    wait: float = Query(0, ge=0, le=settings.NOTIFICATION_MAX_WAIT),
+    token: str = Depends(oauth2_scheme)
 ):
     """
     检查用户是否有可用的充电桩并可以开始充电
+    wait > 0 时为长轮询：充电桩暂不可用则挂起最多 wait 秒，
+    分配的充电桩空出或请求状态变化时立即返回最新结果
     返回格式:
     {
         "has_available_pile": true/false,
@@ -895,9 +732,33 @@ def get_charging_notification(
         }
     }
     """
+    user = await run_in_threadpool(_user_from_token, token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # 先记下版本号再查询，查询之后发生的变化也能立即唤醒
+    version = user_notifier.version(user.id)
+    result = await run_in_threadpool(_charging_notification, user.id)
+    if wait > 0 and not result["has_available_pile"]:
+        # 挂起期间只是事件循环中的一个协程，不占用线程池线程和数据库连接
+        if await user_notifier.wait(user.id, version, wait):
+            result = await run_in_threadpool(_charging_notification, user.id)
+    return result
+
+def _charging_notification(user_id: int) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return _check_charging_notification(db, user_id)
+    finally:
+        db.close()
+
+def _check_charging_notification(db: Session, user_id: int) -> Dict[str, Any]:
     # 查找用户当前在充电区排队的请求（已分配充电桩但状态仍为waiting）
     waiting_request = db.query(ChargingRequest).filter(
-        ChargingRequest.user_id == current_user.id,
+        ChargingRequest.user_id == user_id,
         ChargingRequest.status == "waiting",
         ChargingRequest.charging_pile_id.isnot(None)
     ).first()
@@ -999,6 +860,8 @@ def start_charging(
     
     # 提交事务
     db.commit()
+    station_state.request_started(charging_request)
+    station_state.pile_status_changed(charging_pile)
     
     return {
         "message": "充电已开始",
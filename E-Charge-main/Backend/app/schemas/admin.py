@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional
 from ..models.models import ChargingPileStatus
 
 class ChargingPileResponse(BaseModel):
@@ -12,6 +12,9 @@ class ChargingPileResponse(BaseModel):
     total_charging_times: int
     total_charging_duration: float
     total_charging_amount: float
+    total_electricity_fee: float = 0.0
+    total_service_fee: float = 0.0
+    total_revenue: float = 0.0
 
     class Config:
         from_attributes = True
@@ -27,4 +30,30 @@ class PileStatistics(BaseModel):
 class ReportResponse(BaseModel):
     start_date: datetime
     end_date: datetime
-    pile_statistics: Dict[int, PileStatistics] 
\ No newline at end of file
+    pile_statistics: Dict[int, PileStatistics]
+    # 按时间分桶的统计：桶起始日期 -> 充电桩ID -> 统计
+    buckets: Optional[Dict[str, Dict[int, PileStatistics]]] = None
+
+class TariffSeason(BaseModel):
+    months: List[int]
+    rates: Dict[str, float]
+
+class TariffVersionCreate(BaseModel):
+    effective_from: datetime
+    service_fee_rate: float
+    rates: Dict[str, float]
+    periods: List[str]
+    weekend_periods: Optional[List[str]] = None
+    seasons: List[TariffSeason] = []
+    description: Optional[str] = None
+
+class TariffVersionResponse(BaseModel):
+    id: int
+    effective_from: datetime
+    service_fee_rate: float
+    rates: Dict[str, float]
+    periods: List[str]
+    weekend_periods: Optional[List[str]] = None
+    seasons: List[TariffSeason] = []
+    description: Optional[str] = None
+    created_at: Optional[datetime] = None
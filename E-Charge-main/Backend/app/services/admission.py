@@ -0,0 +1,55 @@
+from typing import Dict
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.models import ChargingRequest, ChargingMode
+from .station_state import StationState, station_state
+
+
+class AdmissionController:
+    """
+    等候区准入控制
+    每种充电模式维护“等候区人数 + 已预留未入区的名额”，在充电站状态锁内原子地预留名额，
+    超出容量时 O(1) 拒绝，不再先 COUNT 再插入；等候区人数来自启动时从数据库加载的内存状态
+    """
+
+    def __init__(self, state: StationState = None, capacities: Dict[ChargingMode, int] = None):
+        self.state = state if state is not None else station_state
+        # 各模式等候区容量，默认取配置
+        self.capacities = capacities
+        self._reserved: Dict[ChargingMode, int] = {mode: 0 for mode in ChargingMode}
+
+    def capacity(self, charging_mode: ChargingMode) -> int:
+        if self.capacities is not None:
+            return self.capacities[charging_mode]
+        return (settings.FAST_QUEUE_CAPACITY
+                if charging_mode == ChargingMode.FAST
+                else settings.TRICKLE_QUEUE_CAPACITY)
+
+    def occupancy(self, charging_mode: ChargingMode) -> int:
+        """等候区当前占用（含已预留的名额）"""
+        with self.state.lock:
+            return self.state.waiting_area_count(charging_mode) + self._reserved[charging_mode]
+
+    def try_reserve(self, charging_mode: ChargingMode, db: Session = None) -> bool:
+        """尝试预留一个等候区名额，容量已满时返回False"""
+        with self.state.lock:
+            if db is not None:
+                self.state.ensure_loaded(db)
+            if self.occupancy(charging_mode) >= self.capacity(charging_mode):
+                return False
+            self._reserved[charging_mode] += 1
+            return True
+
+    def admit(self, request: ChargingRequest):
+        """请求已写入数据库：预留的名额转为等候区中的请求"""
+        with self.state.lock:
+            self._reserved[request.charging_mode] -= 1
+            self.state.request_created(request)
+
+    def release(self, charging_mode: ChargingMode):
+        """请求未能创建，归还预留的名额"""
+        with self.state.lock:
+            self._reserved[charging_mode] -= 1
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,92 @@
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from .session_archive import SessionArchive, MODE_CODES
+
+HOUR = np.timedelta64(3600 * 10 ** 6, "us")
+
+
+class ArchiveAnalytics:
+    """
+    基于列式归档的离线分析：利用率、收入和等待时间分布
+    只读取内存映射的归档文件，逐个分段向量化计算后累加，不把归档拼接到内存，不访问线上数据库
+    """
+
+    def __init__(self, archive: SessionArchive = None):
+        self.archive = archive or SessionArchive()
+
+    def revenue(self, months: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """按月汇总充电次数、电量、电费、服务费和总费用"""
+        fields = ("charging_amount", "electricity_fee", "service_fee", "total_fee")
+        result = {}
+        for month, columns in self.archive.iter_segments(fields, months):
+            # 分段按充电开始时间的月份分区，分段内的行都属于该月
+            item = result.setdefault(month, dict.fromkeys(fields, 0.0))
+            for field in fields:
+                item[field] += float(np.nansum(columns[field]))
+            item["charging_times"] = item.get("charging_times", 0) + len(columns[fields[0]])
+        return result
+
+    def utilisation(self, months: Optional[Iterable[str]] = None) -> Dict[int, dict]:
+        """
+        各充电桩的累计充电时长及利用率（充电时长 / 归档时间跨度），
+        时间跨度取所选数据中最早开始到最晚结束
+        """
+        counts: Dict[int, int] = {}
+        busy: Dict[int, float] = {}
+        first = last = None
+        for _, columns in self.archive.iter_segments(["pile_id", "start_time", "end_time", "charging_duration"],
+                                                     months):
+            piles, inverse = np.unique(columns["pile_id"], return_inverse=True)
+            hours = np.bincount(inverse, weights=np.nan_to_num(columns["charging_duration"]), minlength=len(piles))
+            for pile, count, value in zip(piles.tolist(), np.bincount(inverse, minlength=len(piles)), hours):
+                counts[pile] = counts.get(pile, 0) + int(count)
+                busy[pile] = busy.get(pile, 0.0) + float(value)
+            start, end = columns["start_time"].min(), columns["end_time"].max()
+            first = start if first is None else min(first, start)
+            last = end if last is None else max(last, end)
+        if not counts:
+            return {}
+        span = (last - first) / HOUR
+        return {
+            pile: {
+                "charging_times": counts[pile],
+                "busy_hours": busy[pile],
+                "utilisation": busy[pile] / span if span > 0 else 0.0,
+            }
+            for pile in sorted(counts)
+        }
+
+    def wait_distribution(self, months: Optional[Iterable[str]] = None,
+                          quantiles: List[float] = (0.5, 0.9, 0.95, 0.99),
+                          bins: List[float] = (0, 5, 15, 30, 60, 120, 240)) -> Dict[str, dict]:
+        """
+        等待时间（提交请求到开始充电，分钟）分布：按充电模式给出均值、分位数和直方图，
+        直方图最后一档包含所有更长的等待。次数、总和与直方图逐段累加；
+        分位数需要全部取值，只保留各段算出的等待时长
+        """
+        edges = np.append(np.asarray(bins, dtype=float), np.inf)
+        histograms = {code: np.zeros(len(edges) - 1, dtype=np.int64) for code in MODE_CODES.values()}
+        totals = dict.fromkeys(MODE_CODES.values(), 0.0)
+        waits = {code: [] for code in MODE_CODES.values()}
+        for _, columns in self.archive.iter_segments(["charging_mode", "created_at", "start_time"], months):
+            segment_waits = (columns["start_time"] - columns["created_at"]) / np.timedelta64(60 * 10 ** 6, "us")
+            valid = ~np.isnan(segment_waits)
+            for code in MODE_CODES.values():
+                values = segment_waits[valid & (columns["charging_mode"] == code)]
+                if len(values):
+                    histograms[code] += np.histogram(values, bins=edges)[0]
+                    totals[code] += float(values.sum())
+                    waits[code].append(values)
+        result = {}
+        for mode, code in MODE_CODES.items():
+            if not waits[code]:
+                continue
+            values = np.concatenate(waits[code])
+            result[mode.value] = {
+                "count": int(len(values)),
+                "mean": totals[code] / len(values),
+                "quantiles": {str(q): float(v) for q, v in zip(quantiles, np.quantile(values, quantiles))},
+                "histogram": {f"{int(lo)}+" if np.isinf(hi) else f"{int(lo)}-{int(hi)}": int(count)
+                              for lo, hi, count in zip(edges[:-1], edges[1:], histograms[code])},
+            }
+        return result
@@ -0,0 +1,76 @@
+import math
+import random
+from typing import List
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..models.models import ChargingRequest, ChargingPile, ChargingMode
+
+
+class Arrival:
+    """到达轨迹中的一辆车：到达时刻（相对轨迹起点，小时）、充电模式和请求充电量"""
+
+    __slots__ = ("time", "charging_mode", "amount")
+
+    def __init__(self, time: float, charging_mode: ChargingMode, amount: float):
+        self.time = time
+        self.charging_mode = charging_mode
+        self.amount = amount
+
+
+class PileSpec:
+    """回放使用的充电桩配置"""
+
+    __slots__ = ("pile_id", "charging_mode", "power")
+
+    def __init__(self, pile_id: int, charging_mode: ChargingMode, power: float):
+        self.pile_id = pile_id
+        self.charging_mode = charging_mode
+        self.power = power
+
+
+def default_piles() -> List[PileSpec]:
+    """按配置的快充/慢充充电桩数量和功率生成充电桩"""
+    piles = []
+    for _ in range(settings.FAST_CHARGING_PILE_NUM):
+        piles.append(PileSpec(len(piles) + 1, ChargingMode.FAST, settings.FAST_PILE_POWER))
+    for _ in range(settings.TRICKLE_CHARGING_PILE_NUM):
+        piles.append(PileSpec(len(piles) + 1, ChargingMode.TRICKLE, settings.TRICKLE_PILE_POWER))
+    return piles
+
+
+def synthetic_trace(count: int, rate: float, seed: int = 0, fast_ratio: float = 0.5,
+                    min_amount: float = 5.0, max_amount: float = 60.0) -> List[Arrival]:
+    """生成泊松到达轨迹：rate 为每小时到达车辆数，充电量均匀分布"""
+    rng = random.Random(seed)
+    now = 0.0
+    trace = []
+    for _ in range(count):
+        now += rng.expovariate(rate)
+        mode = ChargingMode.FAST if rng.random() < fast_ratio else ChargingMode.TRICKLE
+        trace.append(Arrival(now, mode, rng.uniform(min_amount, max_amount)))
+    return trace
+
+
+def recorded_trace(db: Session) -> List[Arrival]:
+    """从历史充电请求生成到达轨迹"""
+    rows = db.query(
+        ChargingRequest.created_at, ChargingRequest.charging_mode, ChargingRequest.requested_amount
+    ).filter(ChargingRequest.requested_amount > 0).order_by(ChargingRequest.created_at).all()
+    if not rows:
+        return []
+    origin = rows[0][0]
+    return [Arrival((created_at - origin).total_seconds() / 3600, mode, amount)
+            for created_at, mode, amount in rows]
+
+
+def recorded_piles(db: Session) -> List[PileSpec]:
+    return [PileSpec(pile.id, pile.charging_mode, pile.power)
+            for pile in db.query(ChargingPile).order_by(ChargingPile.id).all()]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
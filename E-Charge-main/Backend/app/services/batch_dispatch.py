@@ -0,0 +1,97 @@
+from typing import Callable, Dict, List, Tuple
+
+
+class PileSlot:
+    """批量调度时一个充电桩的快照：功率、队列耗尽时间（小时）和剩余车位"""
+
+    __slots__ = ("pile_id", "power", "ready_time", "slots")
+
+    def __init__(self, pile_id: int, power: float, ready_time: float, slots: int):
+        self.pile_id = pile_id
+        self.power = power
+        self.ready_time = ready_time
+        self.slots = slots
+
+
+class Assignment:
+    """调度方案中的一项：请求分配到的充电桩及预计完成时间（相对当前时刻，小时）"""
+
+    __slots__ = ("request_id", "pile_id", "completion_time")
+
+    def __init__(self, request_id: int, pile_id: int, completion_time: float):
+        self.request_id = request_id
+        self.pile_id = pile_id
+        self.completion_time = completion_time
+
+
+def _copy(piles: List[PileSlot]) -> List[PileSlot]:
+    return [PileSlot(p.pile_id, p.power, p.ready_time, p.slots) for p in piles]
+
+
+def earliest_completion_key(pile: PileSlot, amount: float) -> Tuple[float, int]:
+    """选桩键：请求排在队尾时的完成时间，相同时取编号小的充电桩"""
+    return pile.ready_time + amount / pile.power, pile.pile_id
+
+
+def _place(jobs: List[Tuple[int, float]], piles: List[PileSlot],
+           pile_key: Callable[[PileSlot, float], tuple] = earliest_completion_key) -> List[Assignment]:
+    """按给定顺序依次把请求放到选桩键最小的充电桩（默认为完成时间最早的充电桩）"""
+    piles = _copy(piles)
+    plan = []
+    for request_id, amount in jobs:
+        best = None
+        best_key = None
+        for pile in piles:
+            if pile.slots <= 0:
+                continue
+            key = pile_key(pile, amount)
+            if best is None or key < best_key:
+                best, best_key = pile, key
+        if best is None:
+            break
+        best.ready_time += amount / best.power
+        best.slots -= 1
+        plan.append(Assignment(request_id, best.pile_id, best.ready_time))
+    return plan
+
+
+def plan_fifo(jobs: List[Tuple[int, float]], piles: List[PileSlot]) -> List[Assignment]:
+    """贪心：按到达顺序逐个分配到完成时间最早的充电桩（与单次分配规则一致）"""
+    return _place(jobs, piles)
+
+
+def plan_spt(jobs: List[Tuple[int, float]], piles: List[PileSlot]) -> List[Assignment]:
+    """
+    最短处理时间优先（SPT）：先按请求充电量从小到大排序，再依次分配到完成时间最早的充电桩
+    对并行机上的总完成时间，SPT 顺序的列表调度优于按到达顺序逐个贪心
+    """
+    return _place(sorted(jobs, key=lambda job: job[1]), piles)
+
+
+DISPATCH_POLICIES: Dict[str, Callable[[List[Tuple[int, float]], List[PileSlot]], List[Assignment]]] = {
+    "fifo": plan_fifo,
+    "spt": plan_spt,
+}
+
+
+def total_completion_time(plan: List[Assignment]) -> float:
+    """本批次所有请求的完成时间之和（小时）"""
+    return sum(item.completion_time for item in plan)
+
+
+def makespan(plan: List[Assignment]) -> float:
+    """本批次最后一个请求的完成时间（小时）"""
+    return max((item.completion_time for item in plan), default=0.0)
+
+
+def compare_policies(jobs: List[Tuple[int, float]], piles: List[PileSlot]) -> Dict[str, dict]:
+    """对同一批请求比较各调度策略的总完成时间和最大完成时间"""
+    result = {}
+    for name, policy in DISPATCH_POLICIES.items():
+        plan = policy(jobs, piles)
+        result[name] = {
+            "assigned": len(plan),
+            "total_completion_time": total_completion_time(plan),
+            "makespan": makespan(plan),
+        }
+    return result
@@ -1,26 +1,37 @@
 from datetime import datetime, time, timedelta
 from typing import Tuple, List
+import numpy as np
+from .tariff import (TariffSchedule, TariffTimeline, DEFAULT_RATES, DEFAULT_PERIODS,
+                     DEFAULT_SERVICE_FEE_RATE, DEFAULT_EFFECTIVE_FROM)
+from .tariff_registry import TariffRegistry, tariff_registry
 
 class BillingService:
-    def __init__(self):
-        self.service_fee_rate = 0.8  # 服务费单价（元/度）
-        self.peak_rate = 1.0  # 峰时电价（元/度）
-        self.normal_rate = 0.7  # 平时电价（元/度）
-        self.valley_rate = 0.4  # 谷时电价（元/度）
+    def __init__(self, registry: TariffRegistry = None):
+        # 电价版本注册表；数据库中没有电价版本时使用下面的默认电价
+        self.registry = registry if registry is not None else tariff_registry
+        self.service_fee_rate = DEFAULT_SERVICE_FEE_RATE  # 服务费单价（元/度）
+        self.peak_rate = DEFAULT_RATES["peak"]  # 峰时电价（元/度）
+        self.normal_rate = DEFAULT_RATES["normal"]  # 平时电价（元/度）
+        self.valley_rate = DEFAULT_RATES["valley"]  # 谷时电价（元/度）
+        self._default_timeline = None
+        self._default_key = None
+
+    def timeline(self) -> TariffTimeline:
+        """当前使用的电价版本（未加载电价版本时由默认电价生成，电价修改后重新编译）"""
+        if self.registry.loaded:
+            return self.registry.timeline
+        key = (self.peak_rate, self.normal_rate, self.valley_rate, self.service_fee_rate)
+        if self._default_timeline is None or self._default_key != key:
+            rates = {"peak": self.peak_rate, "normal": self.normal_rate, "valley": self.valley_rate}
+            self._default_timeline = TariffTimeline.single(
+                TariffSchedule(DEFAULT_EFFECTIVE_FROM, rates, DEFAULT_PERIODS, self.service_fee_rate)
+            )
+            self._default_key = key
+        return self._default_timeline
 
     def get_electricity_rate(self, current_time: datetime) -> float:
-        """根据时间获取电价"""
-        current_hour = current_time.time().hour
-        
-        # 峰时：10:00-15:00, 18:00-21:00
-        if (10 <= current_hour < 15) or (18 <= current_hour < 21):
-            return self.peak_rate
-        # 平时：7:00-10:00, 15:00-18:00, 21:00-23:00
-        elif (7 <= current_hour < 10) or (15 <= current_hour < 18) or (21 <= current_hour < 23):
-            return self.normal_rate
-        # 谷时：23:00-次日7:00
-        else:
-            return self.valley_rate
+        """根据时间获取电价（按该时刻生效的电价版本）"""
+        return self.timeline().schedule_at(current_time).rate_at(current_time)
 
     def get_time_periods(self, start_time: datetime, end_time: datetime) -> List[Tuple[datetime, datetime, float]]:
         """
@@ -36,6 +47,7 @@ class BillingService:
         if start_time >= end_time:
             return []
             
+        timeline = self.timeline()
         periods = []
         current = start_time
         
@@ -43,31 +55,17 @@ class BillingService:
             # 计算当前费率
             rate = self.get_electricity_rate(current)
             
-            # 计算当前费率时段的结束时间
-            hour = current.hour
-            
-            if 7 <= hour < 10:
-                # 平时 7:00-10:00
-                next_rate_change = datetime(current.year, current.month, current.day, 10, 0)
-            elif 10 <= hour < 15:
-                # 峰时 10:00-15:00
-                next_rate_change = datetime(current.year, current.month, current.day, 15, 0)
-            elif 15 <= hour < 18:
-                # 平时 15:00-18:00
-                next_rate_change = datetime(current.year, current.month, current.day, 18, 0)
-            elif 18 <= hour < 21:
-                # 峰时 18:00-21:00
-                next_rate_change = datetime(current.year, current.month, current.day, 21, 0)
-            elif 21 <= hour < 23:
-                # 平时 21:00-23:00
-                next_rate_change = datetime(current.year, current.month, current.day, 23, 0)
-            else:
-                # 谷时 23:00-次日7:00
-                if hour >= 23:
-                    next_day = current + timedelta(days=1)
-                    next_rate_change = datetime(next_day.year, next_day.month, next_day.day, 7, 0)
-                else:
-                    next_rate_change = datetime(current.year, current.month, current.day, 7, 0)
+            # 电价只在整点或电价版本切换时变化，连续相同电价的小时合并为一个时段
+            version_index = timeline._index(current)
+            version_end = (timeline.starts[version_index + 1]
+                           if version_index + 1 < len(timeline.starts) else None)
+            next_rate_change = current.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            while (next_rate_change < end_time
+                   and (version_end is None or next_rate_change < version_end)
+                   and self.get_electricity_rate(next_rate_change) == rate):
+                next_rate_change += timedelta(hours=1)
+            if version_end is not None and current < version_end < next_rate_change:
+                next_rate_change = version_end
             
             # 确保不超过充电结束时间
             period_end = min(next_rate_change, end_time)
@@ -81,7 +79,35 @@ class BillingService:
         return periods
 
     def calculate_fee(self, charging_amount: float, start_time: datetime, end_time: datetime) -> Tuple[float, float, float]:
-        """计算充电费用
+        """计算充电费用（使用预编译的分时电价表，与逐时段计算结果一致）
+
+        Args:
+            charging_amount: 充电量（度）
+            start_time: 开始充电时间
+            end_time: 结束充电时间
+
+        Returns:
+            Tuple[float, float, float]: (充电费用, 服务费用, 总费用)
+        """
+        electricity_fee, service_fee = self.timeline().fee(charging_amount, start_time, end_time)
+        return electricity_fee, service_fee, electricity_fee + service_fee
+
+    def calculate_fees(self, charging_amounts, start_times, end_times) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """批量计算充电费用
+
+        Args:
+            charging_amounts: 充电量数组（度）
+            start_times: 开始充电时间数组（datetime64 或 datetime 序列）
+            end_times: 结束充电时间数组
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: (充电费用, 服务费用, 总费用) 数组
+        """
+        electricity_fees, service_fees = self.timeline().fees(charging_amounts, start_times, end_times)
+        return electricity_fees, service_fees, electricity_fees + service_fees
+
+    def calculate_fee_by_periods(self, charging_amount: float, start_time: datetime, end_time: datetime) -> Tuple[float, float, float]:
+        """逐时段计算充电费用（参考实现）
         
         Args:
             charging_amount: 充电量（度）
@@ -91,8 +117,10 @@ class BillingService:
         Returns:
             Tuple[float, float, float]: (充电费用, 服务费用, 总费用)
         """
-        # 计算服务费
-        service_fee = charging_amount * self.service_fee_rate
+        timeline = self.timeline()
+
+        # 计算服务费（按开始时刻的电价版本）
+        service_fee = charging_amount * timeline.schedule_at(start_time).service_fee_rate
 
         # 获取不同电价时段
         periods = self.get_time_periods(start_time, end_time)
@@ -102,6 +130,7 @@ class BillingService:
             electricity_rate = self.get_electricity_rate(start_time)
             electricity_fee = charging_amount * electricity_rate
         else:
+            service_fee = 0.0
             # 计算充电总时长（小时）
             total_duration = (end_time - start_time).total_seconds() / 3600
             
@@ -115,8 +144,9 @@ class BillingService:
                 # 计算当前时段消耗的电量
                 period_amount = charging_amount * period_ratio
                 
-                # 计算当前时段的电费
+                # 计算当前时段的电费，服务费按时段所在版本的单价
                 electricity_fee += period_amount * rate
+                service_fee += period_amount * timeline.schedule_at(period_start).service_fee_rate
 
         # 计算总费用
         total_fee = electricity_fee + service_fee
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Hashable, List, Optional, Set
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import ChargingRequest, ChargingPile
+from .scheduling_service import SchedulingService
+from .station_state import StationState, station_state
+
+
+class HashedTimingWheel:
+    """
+    哈希时间轮
+    时间按固定刻度划分，定时器按到期刻度散列到环形槽中，添加、取消均为O(1)，
+    每个刻度只检查一个槽
+    """
+
+    def __init__(self, tick: float = 1.0, wheel_size: int = 512, origin: float = 0.0):
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self.origin = origin
+        # 每个槽：key -> 到期刻度（绝对值）
+        self._slots: List[Dict[Hashable, int]] = [dict() for _ in range(wheel_size)]
+        self._where: Dict[Hashable, int] = {}
+        # 已处理到的刻度
+        self._current = -1
+
+    def __len__(self):
+        return len(self._where)
+
+    def _tick_of(self, timestamp: float) -> int:
+        return int((timestamp - self.origin) // self.tick)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """添加（或更新）定时器，deadline 为到期时刻（秒）"""
+        self.cancel(key)
+        # 已过期的定时器放到下一个刻度处理
+        due = max(self._tick_of(deadline), self._current + 1)
+        slot = due % self.wheel_size
+        self._slots[slot][key] = due
+        self._where[key] = slot
+
+    def cancel(self, key: Hashable):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            self._slots[slot].pop(key, None)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """推进到当前时刻，返回所有到期的定时器"""
+        target = self._tick_of(now)
+        if target <= self._current:
+            return []
+        expired = []
+        # 跨越超过一圈时每个槽只需检查一次
+        start = max(self._current + 1, target - self.wheel_size + 1)
+        for t in range(start, target + 1):
+            slot = self._slots[t % self.wheel_size]
+            due_keys = [key for key, due in slot.items() if due <= target]
+            for key in due_keys:
+                del slot[key]
+                del self._where[key]
+            expired.extend(due_keys)
+        self._current = target
+        return expired
+
+
+class CompletionScheduler:
+    """
+    充电自动结束调度器
+    为每个充电中的请求按预计结束时间（started_at + requested_amount / 充电桩功率）登记定时器，
+    到期后通过与手动结束充电相同的计费流程结束充电；启动或状态重新加载时从数据库重建定时器
+    """
+
+    def __init__(self, session_factory=SessionLocal, state: StationState = None, tick: float = None):
+        self.session_factory = session_factory
+        self.state = state if state is not None else station_state
+        self.tick = tick if tick is not None else settings.COMPLETION_TICK
+        self.wheel = HashedTimingWheel(self.tick)
+        self._lock = threading.Lock()
+        # 同一时刻只有一次重建；重建期间状态事件对定时器的修改记录在 _changes 中，
+        # 换上新时间轮前重放（request_id -> 到期时刻，None 表示取消）
+        self._rebuild_lock = threading.Lock()
+        self._changes: Optional[Dict[int, Optional[float]]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._rebuilds: Set[asyncio.Task] = set()
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.rebuild()
+        self.state.subscribe(self._on_state_event)
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self.state.unsubscribe(self._on_state_event)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        if self._rebuilds:
+            await asyncio.gather(*self._rebuilds, return_exceptions=True)
+        self._task = None
+        self._loop = None
+
+    @staticmethod
+    def projected_end(started_at: datetime, requested_amount: float, power: float) -> datetime:
+        """预计充满时刻"""
+        return started_at + timedelta(hours=requested_amount / power)
+
+    def rebuild(self):
+        """
+        从数据库重建所有充电中请求的定时器
+        查询期间发生的开始/结束充电会记录下来，在换上新时间轮前重放，不会丢失
+        """
+        with self._rebuild_lock:
+            # 调度服务在持有状态锁期间更新状态并提交数据库：持状态锁开始记录，
+            # 之前的变化已在数据库中，之后的变化都会被记录
+            with self.state.lock, self._lock:
+                self._changes = {}
+            try:
+                db = self.session_factory()
+                try:
+                    rows = db.query(ChargingRequest.id, ChargingRequest.started_at,
+                                    ChargingRequest.requested_amount, ChargingPile.power).join(
+                        ChargingPile, ChargingRequest.charging_pile_id == ChargingPile.id
+                    ).filter(
+                        ChargingRequest.status == "charging",
+                        ChargingRequest.started_at.isnot(None)
+                    ).all()
+                finally:
+                    db.close()
+                wheel = HashedTimingWheel(self.tick)
+                for request_id, started_at, amount, power in rows:
+                    wheel.schedule(request_id, self.projected_end(started_at, amount, power).timestamp())
+                with self._lock:
+                    for request_id, deadline in self._changes.items():
+                        if deadline is None:
+                            wheel.cancel(request_id)
+                        else:
+                            wheel.schedule(request_id, deadline)
+                    self.wheel = wheel
+            finally:
+                with self._lock:
+                    self._changes = None
+        print(f"自动结束充电调度器已登记 {len(rows)} 个定时器")
+
+    def _schedule(self, request_id: int, deadline: Optional[float]):
+        """修改定时器（deadline 为 None 时取消），调用方需持有 _lock"""
+        if deadline is None:
+            self.wheel.cancel(request_id)
+        else:
+            self.wheel.schedule(request_id, deadline)
+        if self._changes is not None:
+            self._changes[request_id] = deadline
+
+    def _start_rebuild(self):
+        task = self._loop.create_task(self._rebuild())
+        self._rebuilds.add(task)
+        task.add_done_callback(self._rebuilds.discard)
+
+    async def _rebuild(self):
+        try:
+            await self._loop.run_in_executor(None, self.rebuild)
+        except Exception as e:
+            print(f"重建自动结束充电定时器失败: {e}")
+
+    def _on_state_event(self, event: str, data: dict):
+        request_id = data.get("request_id")
+        if event in ("request_started", "request_assigned"):
+            pile = self.state.piles.get(data.get("pile_id"))
+            entry = pile.queue.get(request_id) if pile else None
+            deadline = None
+            if entry is not None and entry.status == "charging" and entry.started_at:
+                deadline = self.projected_end(entry.started_at, entry.requested_amount, pile.power).timestamp()
+            with self._lock:
+                self._schedule(request_id, deadline)
+        elif event in ("request_finished", "request_cancelled", "request_requeued"):
+            with self._lock:
+                self._schedule(request_id, None)
+        elif event == "loaded" and self._task is not None:
+            # 状态从数据库重新加载后（如一致性检查修复后），在线程池中重建定时器，失败时记录日志
+            self._loop.call_soon_threadsafe(self._start_rebuild)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            with self._lock:
+                expired = self.wheel.advance(datetime.now().timestamp())
+            if not expired:
+                continue
+            try:
+                await self._loop.run_in_executor(None, self.complete, expired)
+            except Exception as e:
+                print(f"自动结束充电失败: {e}")
+
+    def complete(self, request_ids: List[int]) -> int:
+        """按预计充满时刻结束到期的充电请求，返回结束的数量"""
+        completed = 0
+        db = self.session_factory()
+        try:
+            service = SchedulingService(db, self.state)
+            for request_id in request_ids:
+                request = db.get(ChargingRequest, request_id)
+                if request is None or request.status != "charging" or not request.charging_pile:
+                    continue
+                end_time = self.projected_end(request.started_at, request.requested_amount,
+                                              request.charging_pile.power)
+                if service.complete_charging(request, end_time) is not None:
+                    completed += 1
+                    print(f"请求 {request.queue_number} 已充满，自动结束充电")
+        finally:
+            db.close()
+        return completed
+
+
+completion_scheduler = CompletionScheduler()
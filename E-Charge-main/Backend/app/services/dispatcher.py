@@ -0,0 +1,84 @@
+import asyncio
+from typing import Optional
+from ..core.config import settings
+from ..core.database import SessionLocal
+from .scheduling_service import SchedulingService
+from .station_state import StationState, station_state
+
+# 这些事件可能释放充电桩车位，需要唤醒调度器
+WAKE_EVENTS = ("request_finished", "request_cancelled", "pile_status_changed", "loaded")
+
+
+class WaitingAreaDispatcher:
+    """
+    等候区后台调度器
+    运行在应用生命周期内的 asyncio 任务，充电完成、取消请求和充电桩恢复时被唤醒，
+    按先来先服务顺序把等候区的请求批量调入有空位的充电桩队列
+    """
+
+    def __init__(self, session_factory=SessionLocal, state: StationState = None,
+                 interval: float = None):
+        self.session_factory = session_factory
+        self.state = state if state is not None else station_state
+        # 兜底轮询间隔（秒），防止漏掉唤醒事件
+        self.interval = interval if interval is not None else settings.DISPATCH_INTERVAL
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """在当前事件循环中启动调度任务"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self.state.subscribe(self._on_state_event)
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self.state.unsubscribe(self._on_state_event)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+    def _on_state_event(self, event: str, data: dict):
+        if event in WAKE_EVENTS:
+            self.notify()
+
+    def notify(self):
+        """唤醒调度器（可在任意线程调用）"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._event.clear()
+            try:
+                # 数据库操作在线程池中执行，不阻塞事件循环
+                await self._loop.run_in_executor(None, self.dispatch_once)
+            except Exception as e:
+                print(f"等候区调度失败: {e}")
+
+    def dispatch_once(self) -> int:
+        """执行一次等候区调度，返回调度的请求数"""
+        if not any(self.state.waiting_area_count(mode) and self.state.free_slots(mode)
+                   for mode in self.state.waiting_area):
+            return 0
+        db = self.session_factory()
+        try:
+            return SchedulingService(db, self.state).dispatch_waiting_area()
+        finally:
+            db.close()
+
+
+dispatcher = WaitingAreaDispatcher()
@@ -0,0 +1,74 @@
+import hashlib
+import hmac
+import time
+import uuid
+from typing import Optional
+from fastapi import Depends, HTTPException, Request, Response, status
+from ..core.security import SECRET_KEY, decode_access_token, oauth2_scheme_optional
+from .station_state import StationState, station_state
+
+# 进程启动标识：重启后版本号从头计数，旧的 ETag 全部失效
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def make_etag(scope: str, version: str, subject: str) -> str:
+    """
+    由状态版本号生成弱 ETag，并用密钥绑定到令牌中的用户：
+    只有之前以该用户身份拿到过完整响应的客户端才能得到 304，因此 304 无需查询数据库校验权限
+    """
+    message = f"{BOOT_ID}:{scope}:{version}:{subject}".encode("utf-8")
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()[:16]
+    return f'W/"{scope}-{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+
+class StateETag:
+    """
+    轮询接口的 ETag 依赖：由充电站状态版本号（per_user 时为该用户的版本号）生成 ETag，
+    请求的 If-None-Match 与之相同时直接返回 304，不查询数据库。
+    需放在接口的第一个依赖，先于数据库会话和用户认证执行。
+    period 大于0时 ETag 还包含时间段（秒），用于响应中含有随时间变化的字段（如等待时长）的接口
+    """
+
+    def __init__(self, scope: str, per_user: bool = False, public: bool = False, period: int = 0,
+                 state: StationState = None):
+        self.scope = scope
+        self.per_user = per_user
+        self.public = public
+        self.period = period
+        self.state = state if state is not None else station_state
+
+    def __call__(self, request: Request, response: Response,
+                 token: Optional[str] = Depends(oauth2_scheme_optional)):
+        etag = self.current(token)
+        if etag is None:
+            return
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED,
+                                headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+
+    def current(self, token: Optional[str]) -> Optional[str]:
+        """当前 ETag，无法确定用户时返回None（不使用 ETag，由接口自己的认证处理）"""
+        payload = decode_access_token(token)
+        if payload is None and not self.public:
+            return None
+        subject = payload["sub"] if payload is not None else ""
+        if self.per_user:
+            user_id = payload.get("uid") if payload is not None else None
+            if user_id is None:
+                return None
+            version = self.state.user_version(user_id)
+        else:
+            # 调度服务在持锁期间先更新状态再提交数据库，持锁读取避免拿到数据尚未提交的版本号
+            with self.state.lock:
+                version = str(self.state.version)
+        if self.period:
+            version += f".{int(time.time() // self.period)}"
+        return make_etag(self.scope, version, subject)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from enum import Enum
+from typing import Dict, Optional, Set
+from ..core.config import settings
+from .station_state import StationState, station_state
+
+# 推送给客户端的状态事件
+PUSH_EVENTS = ("request_created", "request_assigned", "request_started", "request_finished",
+               "request_cancelled", "request_requeued", "pile_status_changed", "loaded")
+
+
+def format_sse(event: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    """编码为一条 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscription:
+    """一个推送连接：有界消息队列，按用户接收个人事件"""
+
+    def __init__(self, user_id: Optional[int], max_pending: int):
+        self.user_id = user_id
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue(maxsize=max_pending)
+        # 消息积压超过上限时标记为滞后，连接将被关闭，客户端重连后重新获取完整状态
+        self.lagging = False
+
+
+class EventHub:
+    """
+    充电站状态推送中心
+    订阅充电站状态模型的变化事件，每个事件只编码一次：全站增量推送给所有连接，
+    涉及某个用户请求的事件另外编码一条个人事件推送给该用户的连接
+    状态监听器在请求处理线程中持锁调用，这里只把已编码的消息交给事件循环分发，不阻塞调用方
+    """
+
+    def __init__(self, state: StationState = None, max_pending: int = None):
+        self.state = state if state is not None else station_state
+        self.max_pending = max_pending if max_pending is not None else settings.STREAM_MAX_PENDING
+        self._subscribers: Set[Subscription] = set()
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.state.subscribe(self._on_state_event)
+
+    def stop(self):
+        self.state.unsubscribe(self._on_state_event)
+        self._loop = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # ---- 订阅 ----
+
+    def subscribe(self, user_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(user_id, self.max_pending)
+        self._subscribers.add(subscription)
+        if user_id is not None:
+            self._by_user.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        if subscription.user_id is not None:
+            subscriptions = self._by_user.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._by_user[subscription.user_id]
+
+    # ---- 发布 ----
+
+    def _on_state_event(self, event: str, data: dict):
+        if event not in PUSH_EVENTS or self._loop is None or self._loop.is_closed():
+            return
+        version = self.state.version
+        payload = {key: value.value if isinstance(value, Enum) else value
+                   for key, value in data.items() if key != "user_id"}
+        payload["version"] = version
+        station_message = format_sse(event, payload, version)
+        user_message = None
+        user_id = data.get("user_id")
+        if user_id is not None:
+            user_message = format_sse("my_request", {"event": event, **payload}, version)
+        self._loop.call_soon_threadsafe(self.publish, station_message, user_id, user_message)
+
+    def publish(self, message: bytes, user_id: Optional[int] = None, user_message: Optional[bytes] = None):
+        """在事件循环中把已编码的消息放入各连接的队列"""
+        for subscription in self._subscribers:
+            self._offer(subscription, message)
+        if user_id is not None and user_message is not None:
+            for subscription in self._by_user.get(user_id, ()):
+                self._offer(subscription, user_message)
+
+    @staticmethod
+    def _offer(subscription: Subscription, message: bytes):
+        if subscription.lagging:
+            return
+        try:
+            subscription.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            subscription.lagging = True
+
+    # ---- 连接 ----
+
+    async def stream(self, subscription: Subscription, keepalive: float = None):
+        """逐条产出推送消息；空闲时发送注释行保持连接，连接滞后或断开时结束"""
+        keepalive = keepalive if keepalive is not None else settings.STREAM_KEEPALIVE
+        try:
+            yield format_sse("hello", {"version": self.state.version})
+            while not subscription.lagging:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield message
+            yield format_sse("resync", {"version": self.state.version})
+        finally:
+            self.unsubscribe(subscription)
+
+
+event_hub = EventHub()
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Iterator, Optional
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import ChargingDetail, ChargingRequest, ChargingPile, User
+
+# 导出字段：列名 -> 查询列（详单关联请求、用户和充电桩）
+EXPORT_COLUMNS = {
+    "detail_id": ChargingDetail.id,
+    "request_id": ChargingDetail.request_id,
+    "queue_number": ChargingRequest.queue_number,
+    "user_id": ChargingRequest.user_id,
+    "username": User.username,
+    "charging_mode": ChargingRequest.charging_mode,
+    "pile_id": ChargingDetail.charging_pile_id,
+    "pile_number": ChargingPile.pile_number,
+    "requested_amount": ChargingRequest.requested_amount,
+    "created_at": ChargingRequest.created_at,
+    "start_time": ChargingDetail.start_time,
+    "end_time": ChargingDetail.end_time,
+    "charging_amount": ChargingDetail.charging_amount,
+    "charging_duration": ChargingDetail.charging_duration,
+    "electricity_fee": ChargingDetail.electricity_fee,
+    "service_fee": ChargingDetail.service_fee,
+    "total_fee": ChargingDetail.total_fee,
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class DetailExporter:
+    """
+    充电详单流式导出
+    按详单主键游标分批查询（不使用 OFFSET，不加载ORM对象），每批编码后立即输出，
+    内存占用只与批大小有关；CSV 表头在第一次查询之前输出，客户端立即收到首字节
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = None,
+                 start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                 user_id: Optional[int] = None, pile_id: Optional[int] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        self.start_date = start_date
+        self.end_date = end_date
+        self.user_id = user_id
+        self.pile_id = pile_id
+
+    def batches(self) -> Iterator[list]:
+        """逐批返回导出行（元组，字段顺序同 EXPORT_COLUMNS）；导出期间独占一个数据库会话"""
+        db = self.session_factory()
+        try:
+            query = db.query(*EXPORT_COLUMNS.values()).outerjoin(
+                ChargingRequest, ChargingRequest.id == ChargingDetail.request_id
+            ).outerjoin(
+                User, User.id == ChargingRequest.user_id
+            ).outerjoin(
+                ChargingPile, ChargingPile.id == ChargingDetail.charging_pile_id
+            )
+            if self.start_date is not None:
+                query = query.filter(ChargingDetail.start_time >= self.start_date)
+            if self.end_date is not None:
+                query = query.filter(ChargingDetail.end_time <= self.end_date)
+            if self.user_id is not None:
+                query = query.filter(ChargingRequest.user_id == self.user_id)
+            if self.pile_id is not None:
+                query = query.filter(ChargingDetail.charging_pile_id == self.pile_id)
+
+            last_id = 0
+            while True:
+                rows = query.filter(ChargingDetail.id > last_id).order_by(
+                    ChargingDetail.id).limit(self.batch_size).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                yield rows
+        finally:
+            db.close()
+
+    def csv(self) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # UTF-8 BOM，便于 Excel 识别中文
+        writer.writerow(EXPORT_COLUMNS)
+        yield "\ufeff" + buffer.getvalue()
+        for rows in self.batches():
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([_plain(value) for value in row] for row in rows)
+            yield buffer.getvalue()
+
+    def ndjson(self) -> Iterator[str]:
+        names = list(EXPORT_COLUMNS)
+        for rows in self.batches():
+            yield "".join(
+                json.dumps(dict(zip(names, (_plain(value) for value in row))), ensure_ascii=False) + "\n"
+                for row in rows
+            )
+
+    def stream(self, export_format: str) -> Iterator[str]:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {export_format}")
+        return self.csv() if export_format == "csv" else self.ndjson()
@@ -1,6 +1,10 @@
+from typing import List
 from sqlalchemy.orm import Session
 from ..core.config import settings
-from ..models.models import ChargingPile, ChargingMode, ChargingPileStatus
+from ..models.models import ChargingPile, ChargingMode, ChargingPileStatus, ChargingDetail
+from .tariff_registry import tariff_registry
+from .rollup_service import RollupService
+from .pile_counters import PileCounterChecker
 
 class InitializationService:
     """
@@ -36,7 +40,7 @@ class InitializationService:
                         pile_number=pile_name,
                         charging_mode=ChargingMode.FAST,
                         status=ChargingPileStatus.AVAILABLE,
-                        power=30.0  # 快充功率30度/小时
+                        power=settings.FAST_PILE_POWER  # 快充功率（度/小时）
                     ))
             
             # 创建慢充电桩
@@ -50,7 +54,7 @@ class InitializationService:
                         pile_number=pile_name,
                         charging_mode=ChargingMode.TRICKLE,
                         status=ChargingPileStatus.AVAILABLE,
-                        power=7.0  # 慢充功率7度/小时
+                        power=settings.TRICKLE_PILE_POWER  # 慢充功率（度/小时）
                     ))
                     
             db.commit()
@@ -64,7 +68,7 @@ class InitializationService:
                 pile_number=pile_names[i],
                 charging_mode=ChargingMode.FAST,
                 status=ChargingPileStatus.AVAILABLE,
-                power=30.0  # 快充功率30度/小时
+                power=settings.FAST_PILE_POWER  # 快充功率（度/小时）
             ))
         
         # 创建慢充电桩
@@ -75,7 +79,28 @@ class InitializationService:
                 pile_number=pile_names[i],
                 charging_mode=ChargingMode.TRICKLE,
                 status=ChargingPileStatus.AVAILABLE,
-                power=7.0  # 慢充功率7度/小时
+                power=settings.TRICKLE_PILE_POWER  # 慢充功率（度/小时）
             ))
             
-        db.commit() 
\ No newline at end of file
+        db.commit()
+
+    @staticmethod
+    def initialize_tariffs(db: Session):
+        """初始化电价版本（没有任何版本时写入默认分时电价）并加载到计费服务"""
+        tariff_registry.ensure_default(db)
+
+    @staticmethod
+    def initialize_rollups(db: Session):
+        """补建充电详单的时间索引，小时汇总表为空时根据历史详单重建"""
+        bind = db.get_bind()
+        for index in ChargingDetail.__table__.indexes:
+            index.create(bind=bind, checkfirst=True)
+        RollupService(db).ensure_built()
+
+    @staticmethod
+    def initialize_pile_counters(db: Session, added_columns: List[tuple]):
+        """升级后充电桩表新增了累计列时，按历史充电详单重新计算累计数据"""
+        if not any(table == ChargingPile.__tablename__ for table, _ in added_columns):
+            return
+        mismatches = PileCounterChecker(db).check(fix=True)
+        print(f"已根据历史充电详单修正 {len(mismatches)} 项充电桩累计数据")
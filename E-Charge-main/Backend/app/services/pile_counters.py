@@ -0,0 +1,79 @@
+from typing import Dict, List
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+from ..models.models import ChargingPile, ChargingDetail
+
+# 充电桩累计字段 -> 对应的充电详单字段
+PILE_COUNTERS = {
+    "total_charging_duration": "charging_duration",
+    "total_charging_amount": "charging_amount",
+    "total_electricity_fee": "electricity_fee",
+    "total_service_fee": "service_fee",
+    "total_revenue": "total_fee",
+}
+
+# 浮点累计误差容忍度
+COUNTER_TOLERANCE = 1e-6
+
+
+def record_charging(pile: ChargingPile, detail: ChargingDetail):
+    """把一条新详单计入充电桩累计数据（与详单在同一事务中提交）"""
+    pile.total_charging_times = (pile.total_charging_times or 0) + 1
+    for counter, field in PILE_COUNTERS.items():
+        setattr(pile, counter, (getattr(pile, counter) or 0.0) + float(getattr(detail, field) or 0))
+
+
+def apply_counter_deltas(db: Session, deltas: Dict[int, Dict[str, float]]):
+    """
+    按充电桩把累计字段的修改量（如重新计费的费用差额）原地加到累计数据上，
+    不覆盖同时结束充电写入的增量（由调用方提交）
+    """
+    if not deltas:
+        return
+    counters = sorted({counter for values in deltas.values() for counter in values})
+    table = ChargingPile.__table__
+    statement = update(table).where(table.c.id == bindparam("key_pile_id")).values(
+        {counter: func.coalesce(table.c[counter], 0.0) + bindparam("delta_" + counter) for counter in counters}
+    )
+    db.execute(statement, [
+        {"key_pile_id": pile_id, **{"delta_" + counter: values.get(counter, 0.0) for counter in counters}}
+        for pile_id, values in deltas.items()
+    ])
+
+
+class PileCounterChecker:
+    """
+    充电桩累计数据一致性检查
+    用一次分组查询从充电详单重新计算各充电桩的累计次数、时长、电量和费用，与充电桩上的
+    累计字段比较，可选择按详单修正
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def recompute(self) -> Dict[int, dict]:
+        rows = self.db.query(
+            ChargingDetail.charging_pile_id, func.count(ChargingDetail.id),
+            *[func.coalesce(func.sum(getattr(ChargingDetail, field)), 0.0) for field in PILE_COUNTERS.values()]
+        ).group_by(ChargingDetail.charging_pile_id)
+        return {
+            row[0]: {"total_charging_times": row[1], **dict(zip(PILE_COUNTERS, row[2:]))}
+            for row in rows
+        }
+
+    def check(self, fix: bool = False) -> List[dict]:
+        """返回不一致项 [{pile_id, pile_number, field, stored, expected}]，fix 为 True 时修正并提交"""
+        expected = self.recompute()
+        mismatches = []
+        for pile in self.db.query(ChargingPile).order_by(ChargingPile.id).all():
+            totals = expected.get(pile.id, {"total_charging_times": 0, **{counter: 0.0 for counter in PILE_COUNTERS}})
+            for counter, value in totals.items():
+                stored = getattr(pile, counter) or 0
+                if abs(stored - value) > COUNTER_TOLERANCE:
+                    mismatches.append({"pile_id": pile.id, "pile_number": pile.pile_number,
+                                       "field": counter, "stored": stored, "expected": value})
+                    if fix:
+                        setattr(pile, counter, value)
+        if fix and mismatches:
+            self.db.commit()
+        return mismatches
@@ -0,0 +1,96 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+from ..models.models import ChargingMode
+
+
+class EarliestFinishIndex:
+    """
+    按充电模式维护的“最早完成”充电桩索引
+    每个 (充电模式, 功率) 一个最小堆，键为充电桩队列全部充完所需时间；
+    同时记录每个充电桩相对 CHARGING_QUEUE_LEN 的剩余车位，队列已满或
+    故障/关闭的充电桩不在堆中。堆内过期条目采用惰性删除。
+    """
+
+    def __init__(self, queue_len: int):
+        self.queue_len = queue_len
+        # (充电模式, 功率) -> [(队列耗尽时间, 充电桩ID, 版本号)]
+        self._heaps: Dict[Tuple[ChargingMode, float], List[Tuple[float, int, int]]] = {}
+        self._versions: Dict[int, int] = {}
+        self._slots: Dict[int, int] = {}
+        self._modes: Dict[int, ChargingMode] = {}
+        self._free_slots: Dict[ChargingMode, int] = {mode: 0 for mode in ChargingMode}
+
+    def clear(self):
+        self._heaps = {}
+        self._versions = {}
+        self._slots = {}
+        self._modes = {}
+        self._free_slots = {mode: 0 for mode in ChargingMode}
+
+    def rebuild(self, piles):
+        """根据全部充电桩状态重建索引"""
+        self.clear()
+        for pile in piles:
+            self.update(pile)
+
+    def update(self, pile):
+        """充电桩队列或状态变化后刷新其在索引中的位置"""
+        version = self._versions.get(pile.id, 0) + 1
+        self._versions[pile.id] = version
+
+        # 更新该模式的空闲车位总数
+        old_mode = self._modes.get(pile.id)
+        if old_mode is not None:
+            self._free_slots[old_mode] -= self._slots.get(pile.id, 0)
+        slots = pile.remaining_slots(self.queue_len) if pile.is_active else 0
+        self._slots[pile.id] = slots
+        self._modes[pile.id] = pile.charging_mode
+        self._free_slots[pile.charging_mode] += slots
+
+        if slots > 0:
+            heap = self._heaps.setdefault((pile.charging_mode, pile.power), [])
+            heapq.heappush(heap, (pile.projected_drain_time(), pile.id, version))
+            self._compact(heap)
+
+    def remove(self, pile_id: int):
+        """将充电桩移出索引"""
+        mode = self._modes.pop(pile_id, None)
+        if mode is not None:
+            self._free_slots[mode] -= self._slots.pop(pile_id, 0)
+        self._versions[pile_id] = self._versions.get(pile_id, 0) + 1
+
+    def _is_live(self, item: Tuple[float, int, int]) -> bool:
+        return self._versions.get(item[1]) == item[2] and self._slots.get(item[1], 0) > 0
+
+    def _top(self, heap: List[Tuple[float, int, int]]) -> Optional[Tuple[float, int, int]]:
+        while heap and not self._is_live(heap[0]):
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _compact(self, heap: List[Tuple[float, int, int]]):
+        # 过期条目过多时重建堆，避免无限增长
+        if len(heap) > 4 * len(self._versions) + 16:
+            heap[:] = [item for item in heap if self._is_live(item)]
+            heapq.heapify(heap)
+
+    def best(self, charging_mode: ChargingMode, amount: float) -> Optional[int]:
+        """返回完成时间（等待时间+自己充电时间）最短的充电桩ID"""
+        best_key = None
+        best_id = None
+        for (mode, power), heap in self._heaps.items():
+            if mode != charging_mode:
+                continue
+            top = self._top(heap)
+            if top is None:
+                continue
+            key = (top[0] + amount / power, top[1])
+            if best_key is None or key < best_key:
+                best_key, best_id = key, top[1]
+        return best_id
+
+    def remaining_slots(self, pile_id: int) -> int:
+        return self._slots.get(pile_id, 0)
+
+    def free_slots(self, charging_mode: ChargingMode) -> int:
+        """该模式下所有可用充电桩的剩余车位总数"""
+        return self._free_slots[charging_mode]
@@ -0,0 +1,34 @@
+from typing import Dict, List, Optional
+# 到达轨迹和充电桩配置在 arrival_trace 中定义，这里一并导出供基准脚本使用
+from .arrival_trace import (Arrival, PileSpec, default_piles, synthetic_trace, recorded_trace, recorded_piles,
+                            percentile)
+from .scheduling_policies import SchedulingPolicy, SCHEDULING_POLICIES
+from .simulator import StationSimulator
+
+
+def replay(trace: List[Arrival], policy: SchedulingPolicy, piles: List[PileSpec] = None,
+           queue_len: int = None, waiting_capacity: Optional[int] = None) -> Dict[str, float]:
+    """
+    按调度策略回放到达轨迹
+    使用充电站仿真（与线上相同的准入控制和调度规则）回放，统计等待时间（到达至开始充电，小时）、
+    充电桩平均利用率和每次调度决策的耗时（微秒）
+    """
+    simulator = StationSimulator(piles, queue_len, waiting_capacity, policy)
+    result = simulator.run(trace)
+    utilisation = result["utilisation"]
+    return {
+        "served": result["served"],
+        "rejected": result["rejected"],
+        "mean_wait": result["mean_wait"],
+        "p95_wait": result["p95_wait"],
+        "utilisation": sum(utilisation.values()) / len(utilisation) if utilisation else 0.0,
+        "mean_decision_us": result["mean_decision_us"],
+        "p95_decision_us": result["p95_decision_us"],
+    }
+
+
+def compare_scheduling_policies(trace: List[Arrival], piles: List[PileSpec] = None, queue_len: int = None,
+                                waiting_capacity: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """用同一条到达轨迹回放所有调度策略"""
+    return {name: replay(trace, policy, piles, queue_len, waiting_capacity)
+            for name, policy in SCHEDULING_POLICIES.items()}
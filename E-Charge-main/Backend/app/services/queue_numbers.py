@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, List
+from sqlalchemy import func, cast, Integer
+from sqlalchemy.exc import IntegrityError
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import ChargingRequest, ChargingMode, QueueSequence
+
+# 排队号码前缀：快充F，慢充T
+QUEUE_NUMBER_PREFIX = {ChargingMode.FAST: "F", ChargingMode.TRICKLE: "T"}
+
+
+class QueueNumberAllocator:
+    """
+    排队号码分配器
+    每种充电模式在 queue_sequences 表中有一个计数器，进程每次用一条 UPDATE 原子地
+    预留一段号码，段内号码在进程内加锁发放。不再“先查最后一个号码再加一”，
+    并发提交时不会产生重复号码；进程重启时未用完的号段会被跳过
+    """
+
+    def __init__(self, session_factory=SessionLocal, block_size: int = None):
+        self.session_factory = session_factory
+        self.block_size = block_size if block_size is not None else settings.QUEUE_NUMBER_BLOCK_SIZE
+        self._lock = threading.Lock()
+        # 充电模式 -> [下一个号码, 号段上界(不含)]
+        self._blocks: Dict[ChargingMode, List[int]] = {}
+
+    def next_number(self, charging_mode: ChargingMode) -> str:
+        """分配一个排队号码，如 F12 / T3"""
+        with self._lock:
+            block = self._blocks.get(charging_mode)
+            if block is None or block[0] >= block[1]:
+                block = self._blocks[charging_mode] = self._reserve(charging_mode)
+            number = block[0]
+            block[0] += 1
+        return f"{QUEUE_NUMBER_PREFIX[charging_mode]}{number}"
+
+    def _reserve(self, charging_mode: ChargingMode) -> List[int]:
+        """从数据库计数器原子地预留一个号段"""
+        db = self.session_factory()
+        try:
+            for _ in range(2):
+                # UPDATE 先取得写锁，同一事务内再读取，中间没有可被抢占的窗口
+                updated = db.query(QueueSequence).filter(
+                    QueueSequence.charging_mode == charging_mode
+                ).update({QueueSequence.next_value: QueueSequence.next_value + self.block_size},
+                         synchronize_session=False)
+                if updated:
+                    end = db.query(QueueSequence.next_value).filter(
+                        QueueSequence.charging_mode == charging_mode
+                    ).scalar()
+                    db.commit()
+                    return [end - self.block_size, end]
+                db.rollback()
+                self._seed(db, charging_mode)
+            raise RuntimeError(f"无法为 {charging_mode.value} 预留排队号码")
+        finally:
+            db.close()
+
+    @staticmethod
+    def _seed(db, charging_mode: ChargingMode):
+        """首次使用时根据已有请求的最大号码初始化计数器"""
+        max_number = db.query(
+            func.max(cast(func.substr(ChargingRequest.queue_number, 2), Integer))
+        ).filter(ChargingRequest.charging_mode == charging_mode).scalar()
+        db.add(QueueSequence(charging_mode=charging_mode, next_value=(max_number or 0) + 1))
+        try:
+            db.commit()
+        except IntegrityError:
+            # 其他进程已完成初始化
+            db.rollback()
+
+    def reset(self):
+        """丢弃进程内未用完的号段"""
+        with self._lock:
+            self._blocks = {}
+
+
+queue_number_allocator = QueueNumberAllocator()
@@ -0,0 +1,76 @@
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+from ..models.models import User, ChargingMode, ChargingPileStatus
+from .station_state import StationState, station_state
+
+
+class QueueStatusView:
+    """
+    排队状态的只读快照
+    由常驻内存的充电站状态生成，不修改数据库；按状态版本号缓存，状态未变化时直接返回上次的结果
+    """
+
+    def __init__(self, state: StationState = None):
+        self.state = state if state is not None else station_state
+        self._cached: Optional[Tuple[int, dict]] = None
+
+    def snapshot(self, db: Session) -> dict:
+        self.state.ensure_loaded(db)
+        with self.state.lock:
+            cached = self._cached
+            if cached is not None and cached[0] == self.state.version:
+                return cached[1]
+            version = self.state.version
+            result = self._build()
+        # 正在充电车辆的用户名一次查询
+        vehicles = [pile["current_vehicle"] for mode in ("fast_piles", "trickle_piles")
+                    for pile in result[mode] if pile["current_vehicle"]]
+        user_ids = {vehicle["user_name"] for vehicle in vehicles}
+        names = dict(db.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+        for vehicle in vehicles:
+            vehicle["user_name"] = names.get(vehicle["user_name"], "未知用户")
+        self._cached = (version, result)
+        return result
+
+    def _build(self) -> dict:
+        result = {}
+        for mode, prefix in ((ChargingMode.FAST, "fast"), (ChargingMode.TRICKLE, "trickle")):
+            piles = sorted((pile for pile in self.state.piles.values() if pile.charging_mode == mode),
+                           key=lambda pile: pile.id)
+            waiting_area = len(self.state.waiting_area[mode])
+            waiting_queue = sum(1 for pile in piles for entry in pile.queue.values() if entry.status == "waiting")
+            charging = 0
+            pile_info = []
+            for pile in piles:
+                entry = pile.charging_entry()
+                status = pile.status
+                # 展示状态与是否有车辆充电保持一致（数据修复由后台一致性检查完成）
+                if entry is not None:
+                    charging += 1
+                    status = ChargingPileStatus.OCCUPIED
+                elif status == ChargingPileStatus.OCCUPIED:
+                    status = ChargingPileStatus.AVAILABLE
+                current_vehicle = None
+                if entry is not None:
+                    current_vehicle = {
+                        "id": entry.request_id,
+                        "queue_number": entry.queue_number,
+                        # 先放用户ID，生成快照后替换为用户名
+                        "user_name": entry.user_id,
+                        "requested_amount": entry.requested_amount
+                    }
+                pile_info.append({
+                    "id": pile.id,
+                    "number": pile.pile_number,
+                    "status": status.value,
+                    "current_vehicle": current_vehicle
+                })
+            result[f"{prefix}_waiting"] = waiting_area + waiting_queue
+            result[f"{prefix}_charging"] = charging
+            result[f"{prefix}_piles"] = pile_info
+            result[f"{prefix}_waiting_area"] = waiting_area
+            result[f"{prefix}_waiting_queue"] = waiting_queue
+        return result
+
+
+queue_status_view = QueueStatusView()
@@ -0,0 +1,205 @@
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+import numpy as np
+from sqlalchemy import update
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import ChargingDetail, BackfillCheckpoint
+from .billing_service import BillingService
+from .rollup_service import RollupService, floor_hour
+from .pile_counters import apply_counter_deltas
+from .session_archive import SessionArchive
+
+# 费用差异小于该值（元）视为未变化
+FEE_TOLERANCE = 1e-6
+
+
+class RebillingReport:
+    """重新计费的结果：处理/修改行数、费用差额、耗时，以及试运行时的差异样例"""
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.processed = 0
+        self.changed = 0
+        self.old_total = 0.0
+        self.new_total = 0.0
+        self.elapsed = 0.0
+        self.last_id = 0
+        # 差异样例 (详单ID, 原总费用, 新总费用)
+        self.samples: List[tuple] = []
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "processed": self.processed,
+            "changed": self.changed,
+            "old_total_fee": self.old_total,
+            "new_total_fee": self.new_total,
+            "elapsed": self.elapsed,
+            "rows_per_second": self.rows_per_second,
+            "last_id": self.last_id,
+            "samples": self.samples,
+        }
+
+
+class RebillingJob:
+    """
+    历史充电详单重新计费（回填）
+    按主键游标分批读取 charging_details（不使用 OFFSET），用批量计费接口重新计算电费、服务费和
+    总费用，只对有变化的行执行批量 UPDATE，并在同一事务中把费用差额加到对应的小时汇总行和充电桩
+    累计费用上（按差额增减，服务运行中同时结束的充电不受影响）；每批一个事务，进度检查点与
+    数据修改一起提交，中断后从检查点继续，全部完成后重写会话归档中费用有变化的月份。
+    试运行只统计差异，不修改数据
+    """
+
+    def __init__(self, session_factory=SessionLocal, billing: BillingService = None,
+                 chunk_size: int = None, name: str = "rebill_charging_details",
+                 dry_run: bool = False, sample_limit: int = 20,
+                 progress: Optional[Callable[[RebillingReport], None]] = None,
+                 archive: SessionArchive = None):
+        self.session_factory = session_factory
+        self.billing = billing or BillingService()
+        self.archive = archive or SessionArchive()
+        self.chunk_size = chunk_size or settings.BACKFILL_CHUNK_SIZE
+        self.name = name
+        self.dry_run = dry_run
+        self.sample_limit = sample_limit
+        self.progress = progress
+
+    def _checkpoint(self, db) -> BackfillCheckpoint:
+        checkpoint = db.get(BackfillCheckpoint, self.name)
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(name=self.name, last_id=0, processed=0, changed=0)
+            db.add(checkpoint)
+        return checkpoint
+
+    def reset(self):
+        """清除检查点，下次从头开始"""
+        db = self.session_factory()
+        try:
+            db.query(BackfillCheckpoint).filter(BackfillCheckpoint.name == self.name).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def _fetch(self, db, last_id: int) -> list:
+        return db.query(
+            ChargingDetail.id, ChargingDetail.charging_amount, ChargingDetail.start_time,
+            ChargingDetail.end_time, ChargingDetail.electricity_fee, ChargingDetail.service_fee,
+            ChargingDetail.total_fee, ChargingDetail.charging_pile_id
+        ).filter(
+            ChargingDetail.id > last_id,
+            ChargingDetail.start_time.isnot(None),
+            ChargingDetail.end_time.isnot(None)
+        ).order_by(ChargingDetail.id).limit(self.chunk_size).all()
+
+    @staticmethod
+    def _apply_deltas(db, rows: list, changed: np.ndarray, electricity_deltas: np.ndarray,
+                      service_deltas: np.ndarray, total_deltas: np.ndarray):
+        """把本批费用差额按汇总行和充电桩合并后加到小时汇总和充电桩累计费用（与详单修改同一事务）"""
+        rollups = {}
+        counters = {}
+        for i in np.flatnonzero(changed):
+            pile_id = rows[i][7]
+            if pile_id is None:
+                continue
+            fees = {"electricity_fee": float(electricity_deltas[i]), "service_fee": float(service_deltas[i]),
+                    "total_fee": float(total_deltas[i])}
+            rollup = rollups.setdefault((floor_hour(rows[i][2]), floor_hour(rows[i][3]), pile_id),
+                                        dict.fromkeys(fees, 0.0))
+            counter = counters.setdefault(pile_id, dict.fromkeys(
+                ("total_electricity_fee", "total_service_fee", "total_revenue"), 0.0))
+            for field, value in fees.items():
+                rollup[field] += value
+            counter["total_electricity_fee"] += fees["electricity_fee"]
+            counter["total_service_fee"] += fees["service_fee"]
+            counter["total_revenue"] += fees["total_fee"]
+        RollupService(db).apply_deltas(rollups)
+        apply_counter_deltas(db, counters)
+
+    def run(self, resume: bool = True) -> RebillingReport:
+        report = RebillingReport(self.dry_run)
+        db = self.session_factory()
+        started = time.perf_counter()
+        try:
+            last_id = 0
+            checkpoint = None
+            # 本次运行中费用有变化的详单所在月份；从检查点继续且之前已有修改时不知道之前的月份，重写全部月份
+            changed_months = set()
+            if not self.dry_run:
+                checkpoint = self._checkpoint(db)
+                if resume and checkpoint.completed_at is None:
+                    # 上次运行未完成，从检查点继续
+                    last_id = checkpoint.last_id
+                    if checkpoint.changed:
+                        changed_months = None
+                else:
+                    checkpoint.last_id = 0
+                    checkpoint.processed = 0
+                    checkpoint.changed = 0
+                    checkpoint.completed_at = None
+            while True:
+                rows = self._fetch(db, last_id)
+                if not rows:
+                    break
+                ids = np.array([row[0] for row in rows])
+                amounts = np.array([row[1] or 0.0 for row in rows])
+                old_electricity = np.array([row[4] or 0.0 for row in rows])
+                old_service = np.array([row[5] or 0.0 for row in rows])
+                old_totals = np.array([row[6] or 0.0 for row in rows])
+                electricity_fees, service_fees, total_fees = self.billing.calculate_fees(
+                    amounts, [row[2] for row in rows], [row[3] for row in rows]
+                )
+                changed = ((np.abs(electricity_fees - old_electricity) > FEE_TOLERANCE)
+                           | (np.abs(service_fees - old_service) > FEE_TOLERANCE)
+                           | (np.abs(total_fees - old_totals) > FEE_TOLERANCE))
+                last_id = int(ids[-1])
+
+                report.processed += len(rows)
+                report.changed += int(changed.sum())
+                report.old_total += float(old_totals.sum())
+                report.new_total += float(total_fees.sum())
+                report.last_id = last_id
+                for index in np.flatnonzero(changed)[:max(0, self.sample_limit - len(report.samples))]:
+                    report.samples.append((int(ids[index]), float(old_totals[index]), float(total_fees[index])))
+
+                if not self.dry_run:
+                    if changed.any():
+                        if changed_months is not None:
+                            changed_months.update(rows[i][2].strftime("%Y-%m") for i in np.flatnonzero(changed))
+                        db.execute(update(ChargingDetail), [
+                            {"id": int(ids[i]), "electricity_fee": float(electricity_fees[i]),
+                             "service_fee": float(service_fees[i]), "total_fee": float(total_fees[i])}
+                            for i in np.flatnonzero(changed)
+                        ])
+                        self._apply_deltas(db, rows, changed, electricity_fees - old_electricity,
+                                           service_fees - old_service, total_fees - old_totals)
+                    checkpoint.last_id = last_id
+                    checkpoint.processed += len(rows)
+                    checkpoint.changed += int(changed.sum())
+                    checkpoint.updated_at = datetime.now()
+                    checkpoint.completed_at = None
+                    db.commit()
+                report.elapsed = time.perf_counter() - started
+                if self.progress:
+                    self.progress(report)
+
+            if checkpoint is not None:
+                if checkpoint.changed:
+                    # 归档只追加新详单，已归档的详单费用被修改后重写所在月份的分区；重写完成后才标记完成，
+                    # 之前中断时下次从检查点继续（累计修改数仍不为0），会再次重写
+                    self.archive.rewrite(changed_months, self.session_factory)
+                checkpoint.completed_at = datetime.now()
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            report.elapsed = time.perf_counter() - started
+            db.close()
+        return report
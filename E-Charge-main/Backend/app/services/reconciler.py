@@ -0,0 +1,118 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, aliased
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import ChargingRequest, ChargingPile, ChargingPileStatus
+from .station_state import StationState, station_state
+
+# 修复类型
+REPAIR_TYPES = ("orphaned_charging", "duplicate_charging", "pile_marked_occupied", "pile_marked_available")
+
+
+class StateReconciler:
+    """
+    充电桩与充电请求状态一致性检查
+    后台 asyncio 任务在启动时（崩溃恢复）和之后按间隔检查以下约束，用集合式 UPDATE 在一个事务中修复：
+    充电中的请求必须关联存在的充电桩；每个充电桩最多一个充电中的请求（保留最早提交的）；
+    可用/占用的充电桩当且仅当有车辆充电时为占用。各类修复次数累计在 counters 中，修复后重新加载
+    内存中的充电站状态
+    """
+
+    def __init__(self, session_factory=SessionLocal, state: StationState = None, interval: float = None):
+        self.session_factory = session_factory
+        self.state = state if state is not None else station_state
+        self.interval = interval if interval is not None else settings.RECONCILE_INTERVAL
+        # 运行次数及各类修复的累计次数
+        self.counters = Counter({name: 0 for name in ("runs",) + REPAIR_TYPES})
+        self.last_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # 数据库操作在线程池中执行，不阻塞事件循环；启动后立即检查一次
+                await loop.run_in_executor(None, self.reconcile_once)
+            except Exception as e:
+                print(f"状态一致性检查失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    def reconcile_once(self) -> Dict[str, int]:
+        db = self.session_factory()
+        try:
+            return self.reconcile(db)
+        finally:
+            db.close()
+
+    def reconcile(self, db: Session) -> Dict[str, int]:
+        """检查并修复一次，所有修复在一个事务中提交，返回本次各类修复的记录数"""
+        with self.state.lock:
+            try:
+                repairs = self._repair(db)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            self.counters["runs"] += 1
+            self.counters.update(repairs)
+            self.last_run = datetime.now()
+            if any(repairs.values()):
+                print(f"状态一致性检查修复: {repairs}")
+                self.state.load(db)
+            return repairs
+
+    @staticmethod
+    def _repair(db: Session) -> Dict[str, int]:
+        repairs = {}
+        pile_ids = select(ChargingPile.id)
+
+        # 充电中但没有关联（或关联的充电桩已不存在）的请求退回等候区
+        repairs["orphaned_charging"] = db.query(ChargingRequest).filter(
+            ChargingRequest.status == "charging",
+            or_(ChargingRequest.charging_pile_id.is_(None), ChargingRequest.charging_pile_id.not_in(pile_ids))
+        ).update({"status": "waiting", "charging_pile_id": None}, synchronize_session=False)
+
+        # 同一充电桩上有更早的充电中请求时，其余请求改为在该充电桩排队等待
+        earlier = aliased(ChargingRequest)
+        has_earlier = select(earlier.id).where(
+            earlier.status == "charging",
+            earlier.charging_pile_id == ChargingRequest.charging_pile_id,
+            or_(earlier.created_at < ChargingRequest.created_at,
+                and_(earlier.created_at == ChargingRequest.created_at, earlier.id < ChargingRequest.id))
+        ).exists()
+        repairs["duplicate_charging"] = db.query(ChargingRequest).filter(
+            ChargingRequest.status == "charging", has_earlier
+        ).update({"status": "waiting"}, synchronize_session=False)
+
+        # 充电桩占用状态与是否有车辆充电保持一致（故障、维护和关闭的充电桩不改动）
+        charging_piles = select(ChargingRequest.charging_pile_id).where(
+            ChargingRequest.status == "charging", ChargingRequest.charging_pile_id.isnot(None)
+        )
+        repairs["pile_marked_occupied"] = db.query(ChargingPile).filter(
+            ChargingPile.status == ChargingPileStatus.AVAILABLE, ChargingPile.id.in_(charging_piles)
+        ).update({"status": ChargingPileStatus.OCCUPIED}, synchronize_session=False)
+        repairs["pile_marked_available"] = db.query(ChargingPile).filter(
+            ChargingPile.status == ChargingPileStatus.OCCUPIED, ChargingPile.id.not_in(charging_piles)
+        ).update({"status": ChargingPileStatus.AVAILABLE}, synchronize_session=False)
+        return repairs
+
+
+reconciler = StateReconciler()
@@ -0,0 +1,148 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..models.models import (ChargingDetail, ChargingPile, ChargingHourlyRollup, ChargingRequest,
+                             User, Vehicle)
+from .rollup_service import ROLLUP_MEASURES, ceil_hour, floor_hour
+
+# 报表分桶方式 -> 桶起始日期表达式（SQLite 日期函数）
+REPORT_BUCKETS = {
+    "day": lambda column: func.date(column),
+    # 所在周的周一
+    "week": lambda column: func.date(column, "weekday 0", "-6 days"),
+    "month": lambda column: func.strftime("%Y-%m-01", column),
+}
+
+
+def empty_statistics() -> dict:
+    return {
+        "charging_times": 0,
+        "total_duration": 0.0,
+        "total_amount": 0.0,
+        "total_electricity_fee": 0.0,
+        "total_service_fee": 0.0,
+        "total_fee": 0.0
+    }
+
+
+class ReportService:
+    """
+    充电报表统计
+    完整的小时从小时汇总表读取，只有范围首尾不完整的小时在数据库中聚合原始详单，
+    报表耗时和内存占用只与充电桩数量（及分桶数量）和范围内的小时数有关，与历史详单数量无关
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _sources(self, start_date: datetime, end_date: datetime):
+        """
+        把报表范围（开始时间 >= start_date 且结束时间 <= end_date）拆成互不重叠的三部分：
+        开始和结束都在完整小时内的汇总行、开始于首个不完整小时的详单、结束于最后一个不完整小时的详单
+        依次返回 (充电桩列, 时间列, 统计列, 过滤条件)
+        """
+        lo, hi = ceil_hour(start_date), floor_hour(end_date)
+        rollup = ChargingHourlyRollup
+        yield rollup.charging_pile_id, rollup.start_hour, [
+            func.sum(rollup.charging_times),
+            *[func.sum(getattr(rollup, measure)) for measure in ROLLUP_MEASURES]
+        ], [rollup.start_hour >= lo, rollup.end_hour < hi]
+
+        detail = ChargingDetail
+        measures = [
+            func.count(detail.id),
+            *[func.coalesce(func.sum(getattr(detail, measure)), 0.0) for measure in ROLLUP_MEASURES]
+        ]
+        yield detail.charging_pile_id, detail.start_time, measures, [
+            detail.start_time >= start_date, detail.start_time < lo, detail.end_time <= end_date
+        ]
+        yield detail.charging_pile_id, detail.start_time, measures, [
+            detail.start_time >= lo, detail.end_time >= hi, detail.end_time <= end_date
+        ]
+
+    def _aggregate(self, start_date: datetime, end_date: datetime, pile_id: Optional[int],
+                   bucket: Optional[str] = None) -> Dict[tuple, list]:
+        """按 (充电桩,) 或 (桶, 充电桩) 合并三部分的聚合结果"""
+        totals: Dict[tuple, list] = {}
+        for pile_column, time_column, measures, conditions in self._sources(start_date, end_date):
+            keys = [pile_column]
+            if bucket is not None:
+                keys.insert(0, REPORT_BUCKETS[bucket](time_column))
+            query = self.db.query(*keys, *measures).filter(pile_column.isnot(None), *conditions)
+            if pile_id is not None:
+                query = query.filter(pile_column == pile_id)
+            for row in query.group_by(*keys):
+                key, values = tuple(row[:len(keys)]), row[len(keys):]
+                total = totals.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value or 0
+        return totals
+
+    @staticmethod
+    def _statistics(row) -> dict:
+        count, duration, amount, electricity_fee, service_fee, total_fee = row
+        return {
+            "charging_times": count,
+            "total_duration": float(duration),
+            "total_amount": float(amount),
+            "total_electricity_fee": float(electricity_fee),
+            "total_service_fee": float(service_fee),
+            "total_fee": float(total_fee)
+        }
+
+    def pile_statistics(self, start_date: datetime, end_date: datetime,
+                        pile_id: Optional[int] = None) -> Dict[int, dict]:
+        """按充电桩汇总，没有详单的充电桩补零；日期范围内没有任何详单时返回空字典"""
+        stats = {
+            key[0]: self._statistics(values)
+            for key, values in self._aggregate(start_date, end_date, pile_id).items()
+        }
+        if not stats:
+            return stats
+        if pile_id is None:
+            for (pile,) in self.db.query(ChargingPile.id):
+                stats.setdefault(pile, empty_statistics())
+        return stats
+
+    def bucket_statistics(self, start_date: datetime, end_date: datetime, bucket: str,
+                          pile_id: Optional[int] = None) -> Dict[str, Dict[int, dict]]:
+        """按日/周/月分桶再按充电桩汇总，键为桶起始日期（YYYY-MM-DD），只包含有详单的桶"""
+        if bucket not in REPORT_BUCKETS:
+            raise ValueError(f"不支持的分桶方式: {bucket}")
+        result: Dict[str, Dict[int, dict]] = {}
+        for (period, pile), values in sorted(self._aggregate(start_date, end_date, pile_id, bucket).items()):
+            result.setdefault(period, {})[pile] = self._statistics(values)
+        return result
+
+    def totals(self, start_date: datetime, end_date: datetime) -> dict:
+        """所有充电桩合计"""
+        total = empty_statistics()
+        for values in self._aggregate(start_date, end_date, None).values():
+            for field, value in self._statistics(values).items():
+                total[field] += value
+        return total
+
+    def request_breakdown(self) -> Dict[tuple, int]:
+        """排队中和充电中的请求数量，键为 (充电桩ID, 状态)，等候区请求的充电桩ID为None"""
+        rows = self.db.query(
+            ChargingRequest.charging_pile_id, ChargingRequest.status, func.count(ChargingRequest.id)
+        ).filter(
+            ChargingRequest.status.in_(("waiting", "charging"))
+        ).group_by(ChargingRequest.charging_pile_id, ChargingRequest.status)
+        return {(pile_id, status): count for pile_id, status, count in rows}
+
+    def waiting_requests(self) -> list:
+        """按提交时间排列的排队请求，连同用户名、所在充电桩模式和编号、车辆电池容量"""
+        return self.db.query(
+            ChargingRequest, User.username, ChargingPile.charging_mode, ChargingPile.pile_number,
+            Vehicle.battery_capacity
+        ).outerjoin(
+            User, User.id == ChargingRequest.user_id
+        ).outerjoin(
+            ChargingPile, ChargingPile.id == ChargingRequest.charging_pile_id
+        ).outerjoin(
+            Vehicle, Vehicle.id == ChargingRequest.vehicle_id
+        ).filter(
+            ChargingRequest.status == "waiting"
+        ).order_by(ChargingRequest.created_at).all()
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.orm import Session
+from ..models.models import ChargingDetail, ChargingHourlyRollup
+
+# 汇总表中的统计字段（与充电详单字段同名）
+ROLLUP_MEASURES = ("charging_duration", "charging_amount", "electricity_fee", "service_fee", "total_fee")
+
+# SQLite 中 DateTime 的存储格式，截断到整点
+_SQLITE_HOUR_FORMAT = "%Y-%m-%d %H:00:00.000000"
+
+
+def floor_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(moment: datetime) -> datetime:
+    hour = floor_hour(moment)
+    return hour if hour == moment else hour + timedelta(hours=1)
+
+
+class RollupService:
+    """
+    充电详单小时汇总
+    每条详单计入 (开始小时, 结束小时, 充电桩) 一行，结束充电时与详单在同一事务中增量更新；
+    报表按整点范围读取汇总行，只有首尾不完整的小时读取原始详单
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(self, detail: ChargingDetail):
+        """把一条新详单计入汇总（由调用方提交）"""
+        key = {
+            "start_hour": floor_hour(detail.start_time),
+            "end_hour": floor_hour(detail.end_time),
+            "charging_pile_id": detail.charging_pile_id,
+        }
+        rollup = self.db.get(ChargingHourlyRollup, key)
+        if rollup is None:
+            rollup = ChargingHourlyRollup(
+                **key, charging_times=0, **{measure: 0.0 for measure in ROLLUP_MEASURES}
+            )
+            self.db.add(rollup)
+        rollup.charging_times += 1
+        for measure in ROLLUP_MEASURES:
+            setattr(rollup, measure, getattr(rollup, measure) + float(getattr(detail, measure) or 0))
+        return rollup
+
+    def apply_deltas(self, deltas: Dict[Tuple[datetime, datetime, int], Dict[str, float]]):
+        """
+        把已计入汇总的详单的修改量（如重新计费的费用差额）加到对应汇总行，
+        键为 (开始小时, 结束小时, 充电桩ID)；按差额原地增减，不覆盖同时结束充电写入的增量（由调用方提交）
+        """
+        if not deltas:
+            return
+        measures = sorted({measure for values in deltas.values() for measure in values})
+        table = ChargingHourlyRollup.__table__
+        statement = update(table).where(
+            table.c.start_hour == bindparam("key_start_hour"),
+            table.c.end_hour == bindparam("key_end_hour"),
+            table.c.charging_pile_id == bindparam("key_pile_id")
+        ).values({measure: table.c[measure] + bindparam("delta_" + measure) for measure in measures})
+        self.db.execute(statement, [
+            {"key_start_hour": start_hour, "key_end_hour": end_hour, "key_pile_id": pile_id,
+             **{"delta_" + measure: values.get(measure, 0.0) for measure in measures}}
+            for (start_hour, end_hour, pile_id), values in deltas.items()
+        ])
+
+    def rebuild(self) -> int:
+        """按全部历史详单重建汇总表，返回汇总行数"""
+        start_hour = func.strftime(_SQLITE_HOUR_FORMAT, ChargingDetail.start_time)
+        end_hour = func.strftime(_SQLITE_HOUR_FORMAT, ChargingDetail.end_time)
+        grouped = self.db.query(
+            ChargingDetail.charging_pile_id, start_hour, end_hour, func.count(ChargingDetail.id),
+            *[func.coalesce(func.sum(getattr(ChargingDetail, measure)), 0.0) for measure in ROLLUP_MEASURES]
+        ).filter(
+            ChargingDetail.charging_pile_id.isnot(None),
+            ChargingDetail.start_time.isnot(None),
+            ChargingDetail.end_time.isnot(None)
+        ).group_by(ChargingDetail.charging_pile_id, start_hour, end_hour)
+        try:
+            self.db.query(ChargingHourlyRollup).delete()
+            self.db.execute(insert(ChargingHourlyRollup).from_select(
+                ["charging_pile_id", "start_hour", "end_hour", "charging_times", *ROLLUP_MEASURES],
+                grouped
+            ))
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return self.db.query(ChargingHourlyRollup).count()
+
+    def ensure_built(self) -> bool:
+        """汇总表为空但已有详单时（如升级后首次启动）重建，返回是否执行了重建"""
+        if self.db.query(ChargingHourlyRollup.charging_pile_id).first() is not None:
+            return False
+        if self.db.query(ChargingDetail.id).first() is None:
+            return False
+        count = self.rebuild()
+        print(f"已根据历史充电详单重建小时汇总: {count} 行")
+        return True
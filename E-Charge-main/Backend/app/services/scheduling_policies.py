@@ -0,0 +1,97 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from ..models.models import ChargingMode
+from .batch_dispatch import Assignment, PileSlot, _place, earliest_completion_key
+
+
+class SchedulingPolicy(ABC):
+    """
+    调度策略接口
+    pile_key 决定请求放到哪个充电桩（取键最小的有空位充电桩），子类必须实现；
+    queue_key 决定等候区请求的调度顺序（稳定排序，键相同时保持到达顺序）
+    """
+
+    name = ""
+
+    @abstractmethod
+    def pile_key(self, pile: PileSlot, amount: float) -> tuple:
+        ...
+
+    def queue_key(self, amount: float) -> tuple:
+        return ()
+
+    def order(self, jobs: List[Tuple[int, float]]) -> List[Tuple[int, float]]:
+        """按本策略的调度顺序排列 (请求ID, 充电量)"""
+        return sorted(jobs, key=lambda job: self.queue_key(job[1]))
+
+    def place(self, jobs: List[Tuple[int, float]], piles: List[PileSlot]) -> List[Assignment]:
+        """保持给定顺序，依次为请求选择充电桩"""
+        return _place(jobs, piles, self.pile_key)
+
+    def plan(self, jobs: List[Tuple[int, float]], piles: List[PileSlot]) -> List[Assignment]:
+        """按本策略排序后依次选择充电桩"""
+        return self.place(self.order(jobs), piles)
+
+    def select_pile(self, state, charging_mode: ChargingMode, amount: float) -> Optional[int]:
+        """为单个请求在充电站状态中选择充电桩，返回充电桩ID"""
+        best_id = None
+        best_key = None
+        for pile in state.pile_slots(charging_mode):
+            key = self.pile_key(pile, amount)
+            if best_key is None or key < best_key:
+                best_id, best_key = pile.pile_id, key
+        return best_id
+
+
+class FifoPolicy(SchedulingPolicy):
+    """先来先服务：按到达顺序调度，放到编号最小的有空位充电桩"""
+
+    name = "fifo"
+
+    def pile_key(self, pile: PileSlot, amount: float) -> tuple:
+        return (pile.pile_id,)
+
+
+class ShortestCompletionPolicy(SchedulingPolicy):
+    """完成时间最短：按到达顺序调度，放到等待时间+自己充电时间最短的充电桩（系统默认规则）"""
+
+    name = "shortest_completion"
+
+    def pile_key(self, pile: PileSlot, amount: float) -> tuple:
+        return earliest_completion_key(pile, amount)
+
+    def select_pile(self, state, charging_mode: ChargingMode, amount: float) -> Optional[int]:
+        # 使用充电站状态中的最早完成最小堆，不逐桩比较
+        pile = state.select_pile(charging_mode, amount)
+        return pile.id if pile is not None else None
+
+
+class ShortestJobFirstPolicy(ShortestCompletionPolicy):
+    """短作业优先：等候区中请求充电量小的先调度，选桩规则同完成时间最短"""
+
+    name = "sjf"
+
+    def queue_key(self, amount: float) -> tuple:
+        return (amount,)
+
+
+class LeastLoadedPolicy(SchedulingPolicy):
+    """负载最少：按到达顺序调度，放到排队车辆最少的充电桩，车辆数相同时取队列先充完的"""
+
+    name = "least_loaded"
+
+    def pile_key(self, pile: PileSlot, amount: float) -> tuple:
+        return -pile.slots, pile.ready_time, pile.pile_id
+
+
+SCHEDULING_POLICIES: Dict[str, SchedulingPolicy] = {
+    policy.name: policy for policy in (
+        FifoPolicy(), ShortestCompletionPolicy(), ShortestJobFirstPolicy(), LeastLoadedPolicy()
+    )
+}
+
+
+def get_scheduling_policy(name: str) -> SchedulingPolicy:
+    if name not in SCHEDULING_POLICIES:
+        raise ValueError(f"未知的调度策略: {name}，可选: {', '.join(SCHEDULING_POLICIES)}")
+    return SCHEDULING_POLICIES[name]
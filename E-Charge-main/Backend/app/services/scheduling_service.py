@@ -1,14 +1,114 @@
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 from sqlalchemy.orm import Session
-from ..models.models import ChargingRequest, ChargingPile, ChargingMode, ChargingPileStatus
+from ..models.models import ChargingRequest, ChargingPile, ChargingMode, ChargingPileStatus, ChargingDetail
 from ..core.config import settings
+from .station_state import StationState, station_state, ACTIVE_PILE_STATUSES
+from .batch_dispatch import DISPATCH_POLICIES, compare_policies
+from .scheduling_policies import SchedulingPolicy, get_scheduling_policy
+from .billing_service import BillingService
+from .rollup_service import RollupService
+from .pile_counters import record_charging
+
+
+def queue_number_key(queue_number: str) -> Tuple[str, int]:
+    """排队号码排序键：按前缀和数字部分排序（F2 排在 F10 之前）"""
+    prefix, digits = queue_number[:1], queue_number[1:]
+    return prefix, int(digits) if digits.isdigit() else 0
+
+
+# 以下调度规则只修改传入的对象（ChargingRequest/ChargingPile 或字段相同的对象）和内存状态，
+# 不访问数据库，由调度服务和充电站仿真共用
+
+def place_request(state: StationState, request, pile, now: datetime) -> bool:
+    """将请求放入充电桩队列，充电桩没有车辆在充电时直接开始充电，返回是否开始充电"""
+    started = state.piles[pile.id].charging_entry() is None
+    if started:
+        request.status = "charging"
+        request.started_at = now
+        pile.status = ChargingPileStatus.OCCUPIED
+    else:
+        # 已有车辆在充电，这辆车需要等待
+        request.status = "waiting"
+        request.started_at = None
+    request.charging_pile_id = pile.id
+    state.request_assigned(request)
+    state.pile_status_changed(pile)
+    return started
+
+
+def waiting_jobs(state: StationState, policy: SchedulingPolicy,
+                 charging_mode: ChargingMode) -> List[Tuple[int, float]]:
+    """本次可调度的等候区请求 (请求ID, 充电量)：按调度策略的顺序取前“空闲车位数”个"""
+    free_slots = state.free_slots(charging_mode)
+    if not free_slots:
+        return []
+    jobs = policy.order([(entry.request_id, entry.requested_amount)
+                         for entry in state.waiting_area[charging_mode].values()])
+    return jobs[:free_slots]
+
+
+def plan_dispatch(state: StationState, policy: SchedulingPolicy, charging_mode: ChargingMode,
+                  jobs: List[Tuple[int, float]], dispatch_policy: str) -> list:
+    """
+    为等候区请求选择充电桩：dispatch_policy 为 "fifo" 时按给定顺序由调度策略逐个选桩，
+    否则按批量调度策略（如 "spt"）联合分配
+    """
+    slots = state.pile_slots(charging_mode)
+    if dispatch_policy == "fifo":
+        return policy.place(jobs, slots)
+    return DISPATCH_POLICIES[dispatch_policy](jobs, slots)
+
+
+def settle_charging(started_at: datetime, end_time: datetime, requested_amount: float, power: float,
+                    billing: BillingService = None) -> Tuple[float, float, float, float, float]:
+    """
+    按实际充电时长结算：充电量为 功率 × 时长（不超过请求充电量）
+    返回 (充电时长, 充电量, 电费, 服务费, 总费用)
+    """
+    charging_duration = (end_time - started_at).total_seconds() / 3600
+    charging_amount = min(power * charging_duration, requested_amount)
+    electricity_fee, service_fee, total_fee = (billing or BillingService()).calculate_fee(
+        charging_amount, started_at, end_time
+    )
+    return charging_duration, charging_amount, electricity_fee, service_fee, total_fee
+
+
+def start_next_charging(state: StationState, pile, load_request: Callable[[int], object], now: datetime):
+    """
+    充电结束后让充电桩队列中第一辆等待的车开始充电，并更新充电桩状态
+    load_request 按请求ID取得请求对象；返回开始充电的请求，没有等待的车时返回None
+    """
+    pile_state = state.piles.get(pile.id)
+    queue = list(pile_state.queue.values()) if pile_state else []
+    # 按照入队顺序（即调度确定的充电顺序）
+    waiting_entries = [entry for entry in queue if entry.status == "waiting"]
+    next_request = None
+    if waiting_entries:
+        next_request = load_request(waiting_entries[0].request_id)
+        next_request.status = "charging"
+        next_request.started_at = now
+        pile.status = ChargingPileStatus.OCCUPIED
+        state.request_started(next_request)
+    elif not any(entry.status == "charging" for entry in queue):
+        # 没有等待的车辆且没有正在充电的车辆，充电桩可用
+        pile.status = ChargingPileStatus.AVAILABLE
+    else:
+        # 还有其他车辆在充电，保持占用状态
+        pile.status = ChargingPileStatus.OCCUPIED
+    state.pile_status_changed(pile)
+    return next_request
+
 
 class SchedulingService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, state: StationState = None, policy: SchedulingPolicy = None):
         self.db = db
-        self.fast_pile_power = 30  # 快充功率（度/小时）
-        self.trickle_pile_power = 7  # 慢充功率（度/小时）
+        # 常驻内存的充电站状态，选桩时不再逐桩查询数据库
+        self.state = state if state is not None else station_state
+        # 选桩及等候区排序策略
+        self.policy = policy if policy is not None else get_scheduling_policy(settings.SCHEDULING_POLICY)
+        self.fast_pile_power = settings.FAST_PILE_POWER  # 快充功率（度/小时）
+        self.trickle_pile_power = settings.TRICKLE_PILE_POWER  # 慢充功率（度/小时）
         # 充电桩排队队列长度
         self.charging_queue_len = settings.CHARGING_QUEUE_LEN
 
@@ -17,93 +117,130 @@ class SchedulingService:
         return amount / power
 
     def get_available_piles(self, charging_mode: ChargingMode) -> List[ChargingPile]:
-        """获取可用的充电桩"""
-        # 获取该充电模式下的所有充电桩
-        piles = self.db.query(ChargingPile).filter(
-            ChargingPile.charging_mode == charging_mode,
-            ChargingPile.status.in_([ChargingPileStatus.AVAILABLE, ChargingPileStatus.OCCUPIED])
-        ).all()
-        
-        # 筛选出队列未满的充电桩
-        available_piles = []
-        for pile in piles:
-            # 查询该充电桩当前排队的车辆数量（包括充电中和等待中的）
-            queue_count = self.db.query(ChargingRequest).filter(
-                ChargingRequest.charging_pile_id == pile.id,
-                ChargingRequest.status.in_(["charging", "waiting"])
-            ).count()
-            
-            # 如果排队数量小于队列长度上限，则视为可用
-            if queue_count < self.charging_queue_len:
-                available_piles.append(pile)
-        
-        return available_piles
+        """获取可用的充电桩（队列未满）"""
+        self.state.ensure_loaded(self.db)
+        pile_ids = [pile.id for pile in self.state.candidate_piles(charging_mode)]
+        if not pile_ids:
+            return []
+        return self.db.query(ChargingPile).filter(
+            ChargingPile.id.in_(pile_ids)
+        ).order_by(ChargingPile.id).all()
 
     def calculate_total_charging_time(self, request: ChargingRequest, pile: ChargingPile) -> float:
         """计算总充电时间（等待时间 + 充电时间）"""
-        # 获取当前充电桩队列中的请求，按创建时间排序，保证先来先充电
-        queue_requests = self.db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status.in_(["charging", "waiting"])
-        ).order_by(ChargingRequest.created_at).all()
+        self.state.ensure_loaded(self.db)
+        # 只有第一个车位可充电，所以等待时间是队列中所有车辆的充电时间总和
+        pile_state = self.state.piles[pile.id]
+        return pile_state.estimate_total_time(request.requested_amount)
 
-        # 计算等待时间
-        # 只有第一个车位可充电，所以等待时间是前面所有车辆的充电时间总和
-        wait_time = 0
-        for req in queue_requests:
-            wait_time += self.calculate_charging_time(req.requested_amount, pile.power)
+    def _place_request(self, request: ChargingRequest, pile: ChargingPile):
+        """将请求放入充电桩队列（只修改对象和内存状态，由调用方提交事务）"""
+        if place_request(self.state, request, pile, datetime.now()):
+            print(f"充电桩 {pile.pile_number} 状态更新为占用(OCCUPIED)")
 
-        # 计算自己的充电时间
-        charging_time = self.calculate_charging_time(request.requested_amount, pile.power)
-
-        # 返回完成充电所需总时长
-        return wait_time + charging_time
+    def _commit(self):
+        """提交事务，失败时回滚并从数据库重新加载内存状态"""
+        try:
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            self.state.load(self.db)
+            raise
 
     def assign_charging_pile(self, request: ChargingRequest) -> ChargingPile:
         """为充电请求分配充电桩"""
-        available_piles = self.get_available_piles(request.charging_mode)
-        
-        if not available_piles:
-            return None
-
-        # 计算每个可用充电桩的总充电时间（等待时间+自己充电时间）
-        pile_times = {}
-        for pile in available_piles:
-            total_time = self.calculate_total_charging_time(request, pile)
-            pile_times[pile] = total_time
-            print(f"充电桩 {pile.pile_number} 完成时间估计: {total_time}小时")
-
-        # 选择总充电时间最短的充电桩
-        best_pile = min(pile_times.items(), key=lambda x: x[1])[0]
-        print(f"选择充电桩 {best_pile.pile_number} (所需时长最短: {pile_times[best_pile]}小时)")
-        
-        # 查询充电桩当前队列中的请求数
-        queue_requests = self.db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == best_pile.id,
-            ChargingRequest.status.in_(["charging", "waiting"])
-        ).all()
-        
-        # 检查充电桩是否已有正在充电的请求
-        charging_requests = [req for req in queue_requests if req.status == "charging"]
-        
-        # 确定请求状态
-        if not charging_requests:
-            # 如果没有车辆在充电，这辆车可以直接充电
-            request.status = "charging"
-            request.started_at = datetime.now()
-            best_pile.status = ChargingPileStatus.OCCUPIED
-            self.db.commit()  # 立即提交状态更改
-            print(f"充电桩 {best_pile.pile_number} 状态更新为占用(OCCUPIED)")
-        else:
-            # 已有车辆在充电，这辆车需要等待
-            request.status = "waiting"
-            request.started_at = None
-        
-        # 分配充电桩ID
-        request.charging_pile_id = best_pile.id
-        self.db.commit()
-        
-        return best_pile
+        with self.state.lock:
+            self.state.ensure_loaded(self.db)
+            # 由调度策略在内存模型中选择充电桩（默认为总充电时间最短的充电桩）
+            pile_id = self.policy.select_pile(self.state, request.charging_mode, request.requested_amount)
+            if pile_id is None:
+                return None
+
+            pile_state = self.state.piles[pile_id]
+            best_pile = self.db.get(ChargingPile, pile_id)
+            print(f"选择充电桩 {best_pile.pile_number} ({self.policy.name}, 预计完成时长: "
+                  f"{pile_state.estimate_total_time(request.requested_amount)}小时)")
+
+            # 分配充电桩，状态变更一次性写入数据库
+            self._place_request(request, best_pile)
+            self._commit()
+
+            return best_pile
+
+    def _waiting_batch(self, charging_mode: ChargingMode) -> List[ChargingRequest]:
+        """
+        取出本次可调度的等候区请求：按调度策略的顺序（默认为到达顺序）取前“空闲车位数”个
+        已不在等待状态的过期条目会被移出内存等候区
+        """
+        request_ids = [request_id for request_id, _ in waiting_jobs(self.state, self.policy, charging_mode)]
+        if not request_ids:
+            return []
+        requests = {
+            request.id: request for request in self.db.query(ChargingRequest).filter(
+                ChargingRequest.id.in_(request_ids)
+            ).all()
+        }
+        batch = []
+        for request_id in request_ids:
+            request = requests.get(request_id)
+            if request is None or request.status not in ("waiting", "charging"):
+                # 内存状态已过期，移出等候区
+                self.state.discard(request_id)
+            elif request.charging_pile_id is not None:
+                self.state.request_assigned(request)
+            else:
+                batch.append(request)
+        return batch
+
+    def _plan_batch(self, charging_mode: ChargingMode, policy: str) -> Tuple[List[ChargingRequest], list]:
+        batch = self._waiting_batch(charging_mode)
+        if not batch:
+            return [], []
+        jobs = [(request.id, request.requested_amount) for request in batch]
+        return batch, plan_dispatch(self.state, self.policy, charging_mode, jobs, policy)
+
+    def dispatch_waiting_area(self, charging_mode: ChargingMode = None, policy: str = None) -> int:
+        """
+        将等候区的请求调入有空位的充电桩队列
+        policy 为 "fifo" 时按调度策略的顺序逐个选桩（默认策略下即按到达顺序分配到完成时间最早的
+        充电桩），为 "spt" 时对整批请求按最短处理时间优先联合分配；
+        同一批次的所有分配在一个事务中提交，返回调度的请求数
+        """
+        policy = policy or settings.DISPATCH_POLICY
+        modes = [charging_mode] if charging_mode else list(ChargingMode)
+        with self.state.lock:
+            self.state.ensure_loaded(self.db)
+
+            dispatched = 0
+            for mode in modes:
+                batch, plan = self._plan_batch(mode, policy)
+                if not plan:
+                    continue
+                requests = {request.id: request for request in batch}
+                piles = {pile.id: pile for pile in self.db.query(ChargingPile).filter(
+                    ChargingPile.id.in_({item.pile_id for item in plan})
+                ).all()}
+                for item in plan:
+                    request = requests[item.request_id]
+                    self._place_request(request, piles[item.pile_id])
+                    dispatched += 1
+                    print(f"等候区请求 {request.queue_number} 调度至充电桩 {piles[item.pile_id].pile_number}")
+
+            if dispatched:
+                self._commit()
+            return dispatched
+
+    def dispatch_batch(self, charging_mode: ChargingMode, policy: str = "spt") -> int:
+        """批量调度模式：联合分配该模式下所有可调度的等候区请求，默认使用SPT策略"""
+        return self.dispatch_waiting_area(charging_mode, policy)
+
+    def compare_dispatch_policies(self, charging_mode: ChargingMode) -> Dict[str, dict]:
+        """对当前等候区的同一批请求比较各调度策略（不修改数据），用于评估调度效果"""
+        with self.state.lock:
+            self.state.ensure_loaded(self.db)
+            batch = self._waiting_batch(charging_mode)
+            jobs = [(request.id, request.requested_amount) for request in batch]
+            return compare_policies(jobs, self.state.pile_slots(charging_mode))
 
     def allow_simultaneous_charging(self, user_id: int) -> bool:
         """检查是否允许用户同时使用多个充电桩"""
@@ -116,53 +253,165 @@ class SchedulingService:
         # 默认不允许同时充电
         return False
 
-    def handle_fault_pile(self, fault_pile: ChargingPile):
-        """处理故障充电桩"""
-        # 获取故障充电桩队列中的所有请求（充电中和等待中的）
-        queue_requests = self.db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == fault_pile.id,
-            ChargingRequest.status.in_(["charging", "waiting"])
-        ).all()
-
-        # 重新调度队列中的请求
-        for request in queue_requests:
-            new_pile = self.assign_charging_pile(request)
-            if new_pile:
-                request.charging_pile_id = new_pile.id
-                # 状态在assign_charging_pile方法中已设置
-                self.db.commit() 
+    def _reschedule(self, charging_mode: ChargingMode, request_ids: List[int]) -> Tuple[int, int]:
+        """
+        将一组已移出队列的请求按给定顺序，由调度策略重新选择充电桩
+        没有空位的请求优先回到等候区队首；只修改对象和内存状态，由调用方一次提交
+        返回 (重新分配数, 退回等候区数)
+        """
+        if not request_ids:
+            return 0, 0
+        requests = {
+            request.id: request for request in self.db.query(ChargingRequest).filter(
+                ChargingRequest.id.in_(request_ids)
+            ).all()
+        }
+        jobs = [(request_id, requests[request_id].requested_amount)
+                for request_id in request_ids if request_id in requests]
+        plan = self.policy.place(jobs, self.state.pile_slots(charging_mode))
+        piles = {pile.id: pile for pile in self.db.query(ChargingPile).filter(
+            ChargingPile.id.in_({item.pile_id for item in plan})
+        ).all()} if plan else {}
+
+        for item in plan:
+            self._place_request(requests[item.request_id], piles[item.pile_id])
+
+        # 没有空位的请求退回等候区队首，按原顺序排列
+        assigned = {item.request_id for item in plan}
+        requeued = [requests[request_id] for request_id, _ in jobs if request_id not in assigned]
+        for request in reversed(requeued):
+            request.status = "waiting"
+            request.started_at = None
+            request.charging_pile_id = None
+            self.state.request_requeued(request)
+        return len(plan), len(requeued)
+
+    def handle_fault_pile(self, fault_pile: ChargingPile, policy: str = None):
+        """
+        处理故障（或停用）充电桩
+        一次性取内存快照并整体重新调度，所有改动在一个事务中提交：
+        - priority：故障充电桩队列中的车辆优先调度到其他充电桩
+        - time_order：故障充电桩队列中的车辆与同模式其他充电桩中尚未开始充电的车辆合并，
+          按排队号码顺序重新调度
+        """
+        policy = policy or settings.FAULT_RESCHEDULE_POLICY
+        with self.state.lock:
+            self.state.ensure_loaded(self.db)
+            if fault_pile.status in ACTIVE_PILE_STATUSES:
+                fault_pile.status = ChargingPileStatus.FAULT
+            self.state.pile_status_changed(fault_pile)
+
+            # 故障充电桩队列中的所有请求（充电中和等待中的），保持原有顺序
+            request_ids = list(self.state.piles[fault_pile.id].queue)
+            if policy == "time_order":
+                # 合并同模式其他充电桩中尚未开始充电的请求，按排队号码排序
+                entries = list(self.state.piles[fault_pile.id].queue.values())
+                for pile_state in self.state.piles.values():
+                    if pile_state.id != fault_pile.id and pile_state.charging_mode == fault_pile.charging_mode:
+                        entries.extend(e for e in pile_state.queue.values() if e.status == "waiting")
+                entries.sort(key=lambda entry: queue_number_key(entry.queue_number))
+                request_ids = [entry.request_id for entry in entries]
+
+            for request_id in request_ids:
+                self.state.detach(request_id)
+            assigned, requeued = self._reschedule(fault_pile.charging_mode, request_ids)
+            self._commit()
+            print(f"充电桩 {fault_pile.pile_number} 故障调度({policy})：重新分配 {assigned} 辆，退回等候区 {requeued} 辆")
+            return assigned
+
+    def rebalance_on_recovery(self, pile: ChargingPile) -> int:
+        """
+        充电桩恢复后重新平衡队列：同模式其他充电桩中尚未开始充电的请求
+        按排队号码顺序重新分配（可能移到恢复的充电桩），一次提交
+        """
+        with self.state.lock:
+            self.state.ensure_loaded(self.db)
+            self.state.pile_status_changed(pile)
+            entries = []
+            for pile_state in self.state.piles.values():
+                if pile_state.charging_mode == pile.charging_mode and pile_state.is_active:
+                    entries.extend(e for e in pile_state.queue.values() if e.status == "waiting")
+            if not entries:
+                return 0
+            entries.sort(key=lambda entry: queue_number_key(entry.queue_number))
+            request_ids = [entry.request_id for entry in entries]
+            for request_id in request_ids:
+                self.state.detach(request_id)
+            assigned, _ = self._reschedule(pile.charging_mode, request_ids)
+            self._commit()
+            print(f"充电桩 {pile.pile_number} 恢复，重新平衡 {assigned} 辆排队车辆")
+            return assigned
+
+    def complete_charging(self, request: ChargingRequest, end_time: datetime = None) -> Optional[ChargingDetail]:
+        """
+        结束充电：按实际充电时长计费、生成充电详单、更新充电桩累计数据，并让下一辆车开始充电
+        用户手动结束和到时自动结束共用此流程；请求已不在充电状态时返回None
+        """
+        with self.state.lock:
+            # 以数据库中的最新状态为准，防止重复结束
+            self.db.refresh(request)
+            if request.status != "charging" or not request.started_at or not request.charging_pile:
+                return None
+
+            end_time = end_time or datetime.now()
+            charging_pile = request.charging_pile
+            request.completed_at = end_time
+            request.status = "completed"
+
+            # 按实际充电时长（小时）和充电桩功率计算充电量，使用计费服务计算费用
+            charging_duration, charging_amount, electricity_fee, service_fee, total_fee = settle_charging(
+                request.started_at, end_time, request.requested_amount, charging_pile.power
+            )
+
+            # 创建充电详单
+            charging_detail = ChargingDetail(
+                request_id=request.id,
+                charging_pile_id=charging_pile.id,
+                start_time=request.started_at,
+                end_time=end_time,
+                charging_amount=charging_amount,
+                charging_duration=charging_duration,
+                electricity_fee=electricity_fee,
+                service_fee=service_fee,
+                total_fee=total_fee
+            )
+
+            # 更新充电桩的累计充电数据（次数、时长、电量和各项费用）
+            record_charging(charging_pile, charging_detail)
+
+            # 保存数据，小时汇总与详单在同一事务中更新
+            self.db.add(charging_detail)
+            RollupService(self.db).record(charging_detail)
+            self.state.ensure_loaded(self.db)
+            self.state.request_finished(request)
+
+            # 让下一辆等待的车开始充电；结束充电与下一辆车开始充电一次提交，
+            # 不会出现充电桩空闲而队列中的车一直未开始充电
+            next_request = self._start_next_charging(charging_pile)
+            self._commit()
+            self._log_completion(charging_pile, next_request)
+            return charging_detail
+
+    def _start_next_charging(self, pile: ChargingPile) -> Optional[ChargingRequest]:
+        """让队列中第一辆等待的车开始充电（只修改对象和内存状态，由调用方提交事务）"""
+        return start_next_charging(
+            self.state, pile, lambda request_id: self.db.get(ChargingRequest, request_id), datetime.now()
+        )
 
     def handle_charging_completion(self, pile: ChargingPile):
         """处理充电完成后的状态更新"""
-        # 获取该充电桩等待队列中的车辆，按照创建时间排序
-        waiting_requests = self.db.query(ChargingRequest).filter(
-            ChargingRequest.charging_pile_id == pile.id,
-            ChargingRequest.status == "waiting"
-        ).order_by(ChargingRequest.created_at).all()
-        
-        if waiting_requests:
-            # 取队列中第一辆等待的车开始充电
-            next_request = waiting_requests[0]
-            next_request.status = "charging"
-            next_request.started_at = datetime.now()
-            # 确保充电桩状态为占用
-            pile.status = ChargingPileStatus.OCCUPIED
-            self.db.commit()
+        with self.state.lock:
+            self.state.ensure_loaded(self.db)
+            next_request = self._start_next_charging(pile)
+            self._commit()
+            self._log_completion(pile, next_request)
+
+    @staticmethod
+    def _log_completion(pile: ChargingPile, next_request: Optional[ChargingRequest]):
+        """输出充电结束后充电桩的状态"""
+        if next_request is not None:
             print(f"充电桩 {pile.pile_number} 开始为下一辆车 {next_request.queue_number} 充电，状态为占用")
+        elif pile.status == ChargingPileStatus.AVAILABLE:
+            print(f"充电桩 {pile.pile_number} 当前无车辆使用，状态设为可用")
         else:
-            # 检查是否还有其他正在充电的请求
-            charging_requests = self.db.query(ChargingRequest).filter(
-                ChargingRequest.charging_pile_id == pile.id,
-                ChargingRequest.status == "charging"
-            ).all()
-            
-            if not charging_requests:
-                # 如果没有等待的车辆且没有正在充电的车辆，将充电桩状态设为可用
-                pile.status = ChargingPileStatus.AVAILABLE
-                self.db.commit()
-                print(f"充电桩 {pile.pile_number} 当前无车辆使用，状态设为可用")
-            else:
-                # 如果还有其他车辆在充电，保持占用状态
-                pile.status = ChargingPileStatus.OCCUPIED
-                self.db.commit()
-                print(f"充电桩 {pile.pile_number} 仍有其他车辆在充电，保持占用状态") 
\ No newline at end of file
+            print(f"充电桩 {pile.pile_number} 仍有其他车辆在充电，保持占用状态")
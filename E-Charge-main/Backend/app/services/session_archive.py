@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import ChargingDetail, ChargingRequest, ChargingMode
+
+# 归档列及其类型；时间列精确到微秒
+ARCHIVE_COLUMNS = {
+    "detail_id": "int64",
+    "request_id": "int64",
+    "user_id": "int64",
+    "pile_id": "int64",
+    "charging_mode": "int8",  # 见 MODE_CODES
+    "created_at": "datetime64[us]",
+    "start_time": "datetime64[us]",
+    "end_time": "datetime64[us]",
+    "requested_amount": "float64",
+    "charging_amount": "float64",
+    "charging_duration": "float64",
+    "electricity_fee": "float64",
+    "service_fee": "float64",
+    "total_fee": "float64",
+}
+
+MODE_CODES = {ChargingMode.FAST: 0, ChargingMode.TRICKLE: 1}
+
+MANIFEST = "_manifest.json"
+
+
+class SessionArchive:
+    """
+    已完成充电会话的列式归档
+    目录结构为 <root>/<YYYY-MM>/<首个详单ID>-<最后详单ID>/<列名>.npy，按充电开始时间的月份分区；
+    每次归档只追加新的分段，不修改已有文件。清单文件记录已归档的最大详单ID，分段写完后
+    才更新清单，中断留下的多余分段在下次归档前删除。读取时按内存映射打开，不经过数据库。
+    已归档的详单被重新计费后，由 rewrite 按数据库重写所在月份的分区
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or settings.ARCHIVE_DIR
+
+    # ---- 清单 ----
+
+    def watermark(self) -> int:
+        """已归档的最大详单ID"""
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["last_detail_id"]
+
+    def _set_watermark(self, last_id: int):
+        path = os.path.join(self.root, MANIFEST)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_detail_id": last_id}, f)
+        os.replace(tmp_path, path)
+
+    # ---- 分段 ----
+
+    def months(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)) and not name.startswith(("_", ".")))
+
+    def segments(self, month: str) -> List[str]:
+        directory = os.path.join(self.root, month)
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                      if not name.startswith("."))
+
+    @staticmethod
+    def _segment_last_id(path: str) -> int:
+        return int(os.path.basename(path).split("-")[1])
+
+    def _remove_orphans(self, watermark: int):
+        """删除清单之后写入的分段和未完成的临时目录（上次归档或重写中断时留下的）"""
+        for name in os.listdir(self.root):
+            if name.startswith(".old-") and not os.path.exists(os.path.join(self.root, name[5:])):
+                # 重写月份分区时在两次改名之间中断：恢复原分区
+                os.replace(os.path.join(self.root, name), os.path.join(self.root, name[5:]))
+            elif name.startswith("."):
+                shutil.rmtree(os.path.join(self.root, name))
+        for month in self.months():
+            for segment in self.segments(month):
+                if self._segment_last_id(segment) > watermark:
+                    shutil.rmtree(segment)
+            for name in os.listdir(os.path.join(self.root, month)):
+                if name.startswith("."):
+                    shutil.rmtree(os.path.join(self.root, month, name))
+
+    @staticmethod
+    def _write_segment(directory: str, columns: Dict[str, np.ndarray]):
+        ids = columns["detail_id"]
+        name = f"{int(ids[0]):010d}-{int(ids[-1]):010d}"
+        tmp_path = os.path.join(directory, "." + name)
+        os.makedirs(tmp_path, exist_ok=True)
+        for column, values in columns.items():
+            np.save(os.path.join(tmp_path, column + ".npy"), values)
+        os.replace(tmp_path, os.path.join(directory, name))
+
+    # ---- 归档 ----
+
+    @staticmethod
+    def _to_columns(rows: list) -> Dict[str, np.ndarray]:
+        values = list(zip(*rows))
+        columns = {}
+        for index, (column, dtype) in enumerate(ARCHIVE_COLUMNS.items()):
+            data = values[index]
+            if column == "charging_mode":
+                data = [MODE_CODES.get(mode, -1) for mode in data]
+            elif dtype == "float64":
+                data = [value if value is not None else np.nan for value in data]
+            elif dtype == "int64":
+                data = [value if value is not None else -1 for value in data]
+            columns[column] = np.array(data, dtype=dtype)
+        return columns
+
+    @staticmethod
+    def _query(db):
+        return db.query(
+            ChargingDetail.id, ChargingDetail.request_id, ChargingRequest.user_id,
+            ChargingDetail.charging_pile_id, ChargingRequest.charging_mode, ChargingRequest.created_at,
+            ChargingDetail.start_time, ChargingDetail.end_time, ChargingRequest.requested_amount,
+            ChargingDetail.charging_amount, ChargingDetail.charging_duration,
+            ChargingDetail.electricity_fee, ChargingDetail.service_fee, ChargingDetail.total_fee
+        ).join(
+            ChargingRequest, ChargingRequest.id == ChargingDetail.request_id
+        ).filter(
+            ChargingDetail.start_time.isnot(None),
+            ChargingDetail.end_time.isnot(None)
+        )
+
+    def append(self, session_factory=SessionLocal, batch_size: int = None) -> int:
+        """
+        把上次归档之后新增的充电详单（关联请求）追加到归档，返回归档行数
+        按详单主键游标分批读取，每批按月份拆分写入新分段后推进清单
+        """
+        batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        os.makedirs(self.root, exist_ok=True)
+        last_id = self.watermark()
+        self._remove_orphans(last_id)
+        archived = 0
+        db = session_factory()
+        try:
+            query = self._query(db)
+            while True:
+                rows = query.filter(ChargingDetail.id > last_id).order_by(
+                    ChargingDetail.id).limit(batch_size).all()
+                if not rows:
+                    break
+                columns = self._to_columns(rows)
+                months = columns["start_time"].astype("datetime64[M]")
+                for month in np.unique(months):
+                    mask = months == month
+                    self._write_segment(os.path.join(self.root, str(month)),
+                                        {column: values[mask] for column, values in columns.items()})
+                last_id = int(columns["detail_id"][-1])
+                self._set_watermark(last_id)
+                archived += len(rows)
+        finally:
+            db.close()
+        return archived
+
+    def rewrite(self, months: Optional[Iterable[str]] = None, session_factory=SessionLocal,
+                batch_size: int = None) -> int:
+        """
+        按数据库当前数据重写指定月份（None 为全部月份）已归档的分区，返回写入行数
+        用于已归档详单的费用被重新计费修改之后。只重写清单以内的详单，清单不变；
+        每个月份先写到临时目录再替换，中断时原分区保持不变
+        """
+        batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        last_id = self.watermark()
+        if not last_id:
+            return 0
+        self._remove_orphans(last_id)
+        selected = self.months() if months is None else sorted(set(months) & set(self.months()))
+        written = 0
+        db = session_factory()
+        try:
+            for month in selected:
+                first = np.datetime64(month, "M")
+                query = self._query(db).filter(
+                    ChargingDetail.id <= last_id,
+                    ChargingDetail.start_time >= first.astype("datetime64[us]").item(),
+                    ChargingDetail.start_time < (first + 1).astype("datetime64[us]").item()
+                )
+                tmp_path = os.path.join(self.root, "." + month)
+                os.makedirs(tmp_path)
+                cursor = 0
+                while True:
+                    rows = query.filter(ChargingDetail.id > cursor).order_by(
+                        ChargingDetail.id).limit(batch_size).all()
+                    if not rows:
+                        break
+                    self._write_segment(tmp_path, self._to_columns(rows))
+                    cursor = rows[-1][0]
+                    written += len(rows)
+                # 原分区先移到临时名再删除，替换过程中断时由 _remove_orphans 清理
+                directory = os.path.join(self.root, month)
+                old_path = os.path.join(self.root, ".old-" + month)
+                os.replace(directory, old_path)
+                os.replace(tmp_path, directory)
+                shutil.rmtree(old_path)
+        finally:
+            db.close()
+        return written
+
+    # ---- 读取 ----
+
+    def iter_segments(self, names: Iterable[str] = None,
+                      months: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, Dict[str, np.ndarray]]]:
+        """逐个分段返回 (月份, 列)，列为内存映射数组，不复制到内存"""
+        names = list(names or ARCHIVE_COLUMNS)
+        selected = self.months() if months is None else [month for month in months if month in self.months()]
+        for month in selected:
+            for segment in self.segments(month):
+                yield month, {name: np.load(os.path.join(segment, name + ".npy"), mmap_mode="r")
+                              for name in names}
+
+    def load(self, names: Iterable[str] = None, months: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        读取指定月份的列；单个分段直接返回内存映射数组，多个分段时拼接（会复制到内存，
+        大范围的统计应使用 iter_segments 逐段计算）
+        """
+        names = list(names or ARCHIVE_COLUMNS)
+        parts = {name: [] for name in names}
+        for _, columns in self.iter_segments(names, months):
+            for name in names:
+                parts[name].append(columns[name])
+        result = {}
+        for name in names:
+            if not parts[name]:
+                result[name] = np.empty(0, dtype=ARCHIVE_COLUMNS[name])
+            elif len(parts[name]) == 1:
+                result[name] = parts[name][0]
+            else:
+                result[name] = np.concatenate(parts[name])
+        return result
@@ -0,0 +1,227 @@
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from ..core.config import settings
+from ..models.models import ChargingMode, ChargingPileStatus
+from .admission import AdmissionController
+from .billing_service import BillingService
+from .arrival_trace import Arrival, PileSpec, default_piles, percentile
+from .scheduling_policies import SchedulingPolicy, get_scheduling_policy
+from .scheduling_service import place_request, waiting_jobs, plan_dispatch, settle_charging, start_next_charging
+from .station_state import StationState
+
+# 事件类型：同一时刻先结束充电、再处理到达
+_FINISH, _ARRIVE = 0, 1
+
+
+class SimRequest:
+    """仿真中的充电请求，字段与 ChargingRequest 一致，可直接交给充电站状态模型"""
+
+    __slots__ = ("id", "user_id", "queue_number", "charging_mode", "requested_amount", "status",
+                 "created_at", "started_at", "completed_at", "charging_pile_id", "arrived", "assigned")
+
+    def __init__(self, request_id: int, arrival: Arrival, created_at: datetime):
+        self.id = request_id
+        self.user_id = request_id
+        self.queue_number = f"{'F' if arrival.charging_mode == ChargingMode.FAST else 'T'}{request_id}"
+        self.charging_mode = arrival.charging_mode
+        self.requested_amount = arrival.amount
+        self.status = "waiting"
+        self.created_at = created_at
+        self.started_at = None
+        self.completed_at = None
+        self.charging_pile_id = None
+        # 到达时刻、调入充电桩队列时刻（虚拟时钟，小时）
+        self.arrived = arrival.time
+        self.assigned = None
+
+
+class SimPile:
+    """仿真中的充电桩，字段与 ChargingPile 一致"""
+
+    __slots__ = ("id", "pile_number", "charging_mode", "status", "power", "busy", "revenue")
+
+    def __init__(self, spec: PileSpec):
+        self.id = spec.pile_id
+        self.pile_number = str(spec.pile_id)
+        self.charging_mode = spec.charging_mode
+        self.status = ChargingPileStatus.AVAILABLE
+        self.power = spec.power
+        # 累计充电时长（小时）和收入（元）
+        self.busy = 0.0
+        self.revenue = 0.0
+
+
+class StationSimulator:
+    """
+    充电站离散事件仿真
+    使用虚拟时钟按事件推进，复用线上的准入控制、充电站状态模型（最早完成索引）、调度策略、
+    计费服务，以及调度服务中的调度规则（入队、等候区调度、结算、下一辆车开始充电），
+    只是不经过HTTP和数据库事务。请求到达时进入等候区（已满则拒绝），有空位时调入充电桩队列；
+    充满后自动结束充电并计费，队列中的下一辆车开始充电
+    """
+
+    def __init__(self, piles: List[PileSpec] = None, queue_len: int = None,
+                 waiting_capacity: Optional[int] = None, policy: SchedulingPolicy = None,
+                 origin: datetime = None, bucket_hours: float = 24.0, dispatch_policy: str = None):
+        self.queue_len = queue_len if queue_len is not None else settings.CHARGING_QUEUE_LEN
+        self.policy = policy if policy is not None else get_scheduling_policy(settings.SCHEDULING_POLICY)
+        self.dispatch_policy = dispatch_policy or settings.DISPATCH_POLICY
+        self.origin = origin or datetime(2024, 1, 1)
+        self.bucket_hours = bucket_hours
+        self.billing = BillingService()
+
+        self.state = StationState(queue_len=self.queue_len)
+        self.piles: Dict[int, SimPile] = {}
+        for spec in (piles or default_piles()):
+            pile = self.piles[spec.pile_id] = SimPile(spec)
+            self.state.pile_status_changed(pile)
+        self.state.loaded = True
+        capacities = None
+        if waiting_capacity is not None:
+            capacities = {mode: waiting_capacity for mode in ChargingMode}
+        self.admission = AdmissionController(self.state, capacities)
+
+        self.now = 0.0
+        self._events = []
+        self._seq = 0
+        self._requests: Dict[int, SimRequest] = {}
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.served = 0
+        self.rejected = 0
+        self.waits: List[float] = []
+        self.area_waits: List[float] = []
+        # 每次等候区调度决策（排序和选桩）的耗时（微秒）
+        self.decisions: List[float] = []
+        # 等候区人数对时间的积分，用于计算平均等候区长度
+        self._area_integral = 0.0
+        self._area_size = 0
+        self._area_since = 0.0
+        self.max_area_size = 0
+        # 按时间桶累计的电费、服务费
+        self.revenue_buckets: Dict[int, List[float]] = {}
+
+    def clock(self, hours: float = None) -> datetime:
+        """虚拟时钟对应的时间"""
+        return self.origin + timedelta(hours=self.now if hours is None else hours)
+
+    def _push(self, at: float, kind: int, payload):
+        self._seq += 1
+        heapq.heappush(self._events, (at, kind, self._seq, payload))
+
+    def _track_area(self):
+        size = sum(self.state.waiting_area_count(mode) for mode in ChargingMode)
+        self._area_integral += self._area_size * (self.now - self._area_since)
+        self._area_since = self.now
+        self._area_size = size
+        self.max_area_size = max(self.max_area_size, size)
+
+    # ---- 事件处理 ----
+
+    def _started(self, request: SimRequest, pile: SimPile):
+        """请求开始充电：记录等待时间，登记预计充满时刻的结束事件"""
+        self.waits.append(self.now - request.arrived)
+        self._push(self.now + request.requested_amount / pile.power, _FINISH, request.id)
+
+    def _dispatch(self, charging_mode: ChargingMode):
+        """把等候区请求调入充电桩队列（与调度服务的等候区调度一致）"""
+        started = time.perf_counter()
+        jobs = waiting_jobs(self.state, self.policy, charging_mode)
+        if not jobs:
+            return
+        plan = plan_dispatch(self.state, self.policy, charging_mode, jobs, self.dispatch_policy)
+        self.decisions.append((time.perf_counter() - started) * 1e6)
+        for item in plan:
+            request = self._requests[item.request_id]
+            pile = self.piles[item.pile_id]
+            request.assigned = self.now
+            self.area_waits.append(self.now - request.arrived)
+            if place_request(self.state, request, pile, self.clock()):
+                self._started(request, pile)
+        self._track_area()
+
+    def _arrive(self, request_id: int, arrival: Arrival):
+        if not self.admission.try_reserve(arrival.charging_mode):
+            self.rejected += 1
+            return
+        request = self._requests[request_id] = SimRequest(request_id, arrival, self.clock())
+        self.admission.admit(request)
+        self._track_area()
+        self._dispatch(arrival.charging_mode)
+
+    def _finish(self, request_id: int):
+        """到达预计充满时刻：与调度服务结束充电相同的结算，再让队列中的下一辆车开始充电"""
+        request = self._requests.pop(request_id)
+        pile = self.piles[request.charging_pile_id]
+        end_time = self.clock()
+        duration, _, electricity_fee, service_fee, total_fee = settle_charging(
+            request.started_at, end_time, request.requested_amount, pile.power, self.billing
+        )
+        request.status = "completed"
+        request.completed_at = end_time
+        pile.busy += duration
+        pile.revenue += total_fee
+        bucket = self.revenue_buckets.setdefault(int(self.now // self.bucket_hours), [0.0, 0.0])
+        bucket[0] += electricity_fee
+        bucket[1] += service_fee
+        self.served += 1
+        self.state.request_finished(request)
+
+        next_request = start_next_charging(self.state, pile, self._requests.__getitem__, end_time)
+        if next_request is not None:
+            self._started(next_request, pile)
+        self._dispatch(pile.charging_mode)
+
+    def run(self, trace: List[Arrival]) -> dict:
+        """回放到达轨迹直到所有车辆充电结束，返回统计结果"""
+        for request_id, arrival in enumerate(trace, start=1):
+            self._push(arrival.time, _ARRIVE, (request_id, arrival))
+        while self._events:
+            at, kind, _, payload = heapq.heappop(self._events)
+            self.now = at
+            if kind == _FINISH:
+                self._finish(payload)
+            else:
+                self._arrive(*payload)
+        self._track_area()
+        return self.summary()
+
+    # ---- 统计 ----
+
+    def revenue_curve(self) -> List[dict]:
+        """按时间桶的收入及累计收入"""
+        curve = []
+        cumulative = 0.0
+        for bucket in range(max(self.revenue_buckets, default=-1) + 1):
+            electricity_fee, service_fee = self.revenue_buckets.get(bucket, (0.0, 0.0))
+            cumulative += electricity_fee + service_fee
+            curve.append({
+                "start_hour": bucket * self.bucket_hours,
+                "electricity_fee": electricity_fee,
+                "service_fee": service_fee,
+                "cumulative_fee": cumulative,
+            })
+        return curve
+
+    def summary(self) -> dict:
+        horizon = self.now
+        return {
+            "served": self.served,
+            "rejected": self.rejected,
+            "hours": horizon,
+            "throughput_per_hour": self.served / horizon if horizon else 0.0,
+            "mean_wait": sum(self.waits) / len(self.waits) if self.waits else 0.0,
+            "p50_wait": percentile(self.waits, 0.5),
+            "p95_wait": percentile(self.waits, 0.95),
+            "mean_waiting_area_wait": sum(self.area_waits) / len(self.area_waits) if self.area_waits else 0.0,
+            "mean_waiting_area_size": self._area_integral / horizon if horizon else 0.0,
+            "max_waiting_area_size": self.max_area_size,
+            "mean_decision_us": sum(self.decisions) / len(self.decisions) if self.decisions else 0.0,
+            "p95_decision_us": percentile(self.decisions, 0.95),
+            "utilisation": {pile.pile_number: pile.busy / horizon if horizon else 0.0
+                            for pile in self.piles.values()},
+            "revenue": sum(pile.revenue for pile in self.piles.values()),
+        }
@@ -0,0 +1,332 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set
+from sqlalchemy.orm import Session
+from ..models.models import ChargingRequest, ChargingPile, ChargingMode, ChargingPileStatus
+from ..core.config import settings
+from .pile_index import EarliestFinishIndex
+from .batch_dispatch import PileSlot
+
+# 可参与调度的充电桩状态
+ACTIVE_PILE_STATUSES = (ChargingPileStatus.AVAILABLE, ChargingPileStatus.OCCUPIED)
+# 充电桩上有车辆离开或状态变化时，在该充电桩排队的用户也受影响
+PILE_EVENTS = ("request_finished", "request_cancelled", "pile_status_changed")
+
+
+class QueueEntry:
+    """队列中的一个充电请求（内存快照）"""
+
+    __slots__ = ("request_id", "user_id", "queue_number", "charging_mode",
+                 "requested_amount", "status", "created_at", "started_at")
+
+    def __init__(self, request: ChargingRequest):
+        self.request_id = request.id
+        self.user_id = request.user_id
+        self.queue_number = request.queue_number
+        self.charging_mode = request.charging_mode
+        self.requested_amount = request.requested_amount or 0.0
+        self.status = request.status
+        self.created_at = request.created_at
+        self.started_at = request.started_at
+
+
+class PileState:
+    """单个充电桩的内存状态：排队队列及队列电量累计"""
+
+    def __init__(self, pile: ChargingPile):
+        self.id = pile.id
+        self.pile_number = pile.pile_number
+        self.charging_mode = pile.charging_mode
+        self.status = pile.status
+        self.power = pile.power
+        # 按进入队列的先后排列，充电中的请求在最前
+        self.queue: "OrderedDict[int, QueueEntry]" = OrderedDict()
+        # 队列中所有请求的请求充电量之和（度）
+        self.queued_amount = 0.0
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_PILE_STATUSES
+
+    @property
+    def queue_count(self) -> int:
+        return len(self.queue)
+
+    def remaining_slots(self, queue_len: int) -> int:
+        """队列剩余车位数"""
+        return max(0, queue_len - len(self.queue))
+
+    def charging_entry(self) -> Optional[QueueEntry]:
+        """正在充电的请求"""
+        for entry in self.queue.values():
+            if entry.status == "charging":
+                return entry
+        return None
+
+    def projected_drain_time(self) -> float:
+        """队列全部充完所需时间（小时）"""
+        return self.queued_amount / self.power
+
+    def estimate_total_time(self, amount: float) -> float:
+        """新请求排在队尾时的完成时间（等待时间 + 自己充电时间）"""
+        return (self.queued_amount + amount) / self.power
+
+    def push(self, entry: QueueEntry):
+        self.queue[entry.request_id] = entry
+        self.queued_amount += entry.requested_amount
+
+    def pop(self, request_id: int) -> Optional[QueueEntry]:
+        entry = self.queue.pop(request_id, None)
+        if entry is not None:
+            self.queued_amount -= entry.requested_amount
+            if not self.queue:
+                # 清除浮点累计误差
+                self.queued_amount = 0.0
+        return entry
+
+
+class StationState:
+    """
+    常驻进程的充电站状态模型
+    启动时从 charging_piles / charging_requests 加载，之后由调度服务在每次
+    创建、分配、开始、结束、取消和故障等状态变化时同步更新，调度选桩不再逐桩查询数据库
+    """
+
+    def __init__(self, queue_len: Optional[int] = None):
+        # 请求处理函数运行在线程池中，所有读写都需持有该锁
+        self.lock = threading.RLock()
+        self.queue_len = queue_len if queue_len is not None else settings.CHARGING_QUEUE_LEN
+        self.piles: Dict[int, PileState] = {}
+        # 等候区（未分配充电桩的等待请求），按到达顺序排列
+        self.waiting_area: Dict[ChargingMode, "OrderedDict[int, QueueEntry]"] = {
+            mode: OrderedDict() for mode in ChargingMode
+        }
+        # 请求ID -> 所在充电桩ID（在等候区时为None）
+        self._locations: Dict[int, Optional[int]] = {}
+        # 按充电模式的“最早完成”充电桩最小堆
+        self.index = EarliestFinishIndex(self.queue_len)
+        # 状态变化监听器 listener(event, data)，在持锁状态下同步调用，必须非阻塞
+        self._listeners: List[Callable[[str, dict], None]] = []
+        self.loaded = False
+        # 状态版本号，每次状态变化加一，用于缓存只读快照和生成 ETag
+        self.version = 0
+        # 重新加载次数，以及按用户的版本号（用户自己的请求或其排队的充电桩变化时加一），
+        # 重新加载后按用户的版本号清零
+        self.generation = 0
+        self.user_versions: Dict[int, int] = {}
+
+    def subscribe(self, listener: Callable[[str, dict], None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, dict], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, event: str, **data):
+        self.version += 1
+        users = self.affected_users(event, data)
+        if users is None:
+            self.generation += 1
+            self.user_versions = {}
+        else:
+            for user_id in users:
+                self.user_versions[user_id] = self.user_versions.get(user_id, 0) + 1
+        for listener in list(self._listeners):
+            try:
+                listener(event, data)
+            except Exception as e:
+                print(f"充电站状态监听器处理 {event} 失败: {e}")
+
+    def load(self, db: Session):
+        """从数据库加载充电桩及未完成的充电请求"""
+        piles = db.query(ChargingPile).all()
+        requests = db.query(ChargingRequest).filter(
+            ChargingRequest.status.in_(["charging", "waiting"])
+        ).order_by(ChargingRequest.created_at, ChargingRequest.id).all()
+
+        with self.lock:
+            self.piles = {pile.id: PileState(pile) for pile in piles}
+            self.waiting_area = {mode: OrderedDict() for mode in ChargingMode}
+            self._locations = {}
+            # 充电中的请求排在各自队列最前
+            ordered = sorted(requests, key=lambda r: 0 if r.status == "charging" else 1)
+            for request in ordered:
+                self._place(QueueEntry(request), request.charging_pile_id)
+            self.index.rebuild(self.piles.values())
+            self.loaded = True
+            self._emit("loaded")
+
+    def ensure_loaded(self, db: Session):
+        if not self.loaded:
+            self.load(db)
+
+    def reset(self):
+        with self.lock:
+            self.piles = {}
+            self.waiting_area = {mode: OrderedDict() for mode in ChargingMode}
+            self._locations = {}
+            self.index.clear()
+            self.loaded = False
+            self.version += 1
+            self.generation += 1
+            self.user_versions = {}
+
+    def _place(self, entry: QueueEntry, pile_id: Optional[int]):
+        pile = self.piles.get(pile_id) if pile_id is not None else None
+        if pile is None:
+            self.waiting_area[entry.charging_mode][entry.request_id] = entry
+            self._locations[entry.request_id] = None
+        else:
+            pile.push(entry)
+            self._locations[entry.request_id] = pile.id
+            self.index.update(pile)
+
+    def _remove(self, request_id: int) -> Optional[QueueEntry]:
+        if request_id not in self._locations:
+            return None
+        pile_id = self._locations.pop(request_id)
+        if pile_id is None:
+            for area in self.waiting_area.values():
+                entry = area.pop(request_id, None)
+                if entry is not None:
+                    return entry
+            return None
+        pile = self.piles[pile_id]
+        entry = pile.pop(request_id)
+        self.index.update(pile)
+        return entry
+
+    # ---- 状态迁移 ----
+
+    def request_created(self, request: ChargingRequest):
+        """新请求进入等候区"""
+        with self.lock:
+            self._remove(request.id)
+            self._place(QueueEntry(request), None)
+            self._emit("request_created", request_id=request.id, user_id=request.user_id)
+
+    def request_assigned(self, request: ChargingRequest):
+        """请求被分配（或重新分配）到充电桩"""
+        with self.lock:
+            self._remove(request.id)
+            self._place(QueueEntry(request), request.charging_pile_id)
+            self._emit("request_assigned", request_id=request.id, user_id=request.user_id,
+                       pile_id=request.charging_pile_id)
+
+    def request_started(self, request: ChargingRequest):
+        """请求开始充电"""
+        with self.lock:
+            pile = self.piles.get(self._locations.get(request.id))
+            if pile is None or request.id not in pile.queue:
+                self.request_assigned(request)
+                return
+            entry = pile.queue[request.id]
+            entry.status = request.status
+            entry.started_at = request.started_at
+            pile.queue.move_to_end(request.id, last=False)
+            self._emit("request_started", request_id=request.id, user_id=request.user_id, pile_id=pile.id)
+
+    def request_finished(self, request: ChargingRequest):
+        """请求充电结束，离开队列"""
+        with self.lock:
+            pile_id = self._locations.get(request.id)
+            self._remove(request.id)
+            self._emit("request_finished", request_id=request.id, user_id=request.user_id, pile_id=pile_id)
+
+    def request_cancelled(self, request: ChargingRequest):
+        """请求被取消，离开等候区或充电桩队列"""
+        with self.lock:
+            pile_id = self._locations.get(request.id)
+            self._remove(request.id)
+            self._emit("request_cancelled", request_id=request.id, user_id=request.user_id, pile_id=pile_id)
+
+    def request_requeued(self, request: ChargingRequest):
+        """请求退回等候区队首（故障调度时没有空位的车辆优先）"""
+        with self.lock:
+            self._remove(request.id)
+            self._place(QueueEntry(request), None)
+            self.waiting_area[request.charging_mode].move_to_end(request.id, last=False)
+            self._emit("request_requeued", request_id=request.id, user_id=request.user_id)
+
+    def detach(self, request_id: int):
+        """重新调度前将请求暂时移出队列"""
+        with self.lock:
+            self._remove(request_id)
+
+    def discard(self, request_id: int):
+        """移除已不在数据库未完成状态中的请求"""
+        with self.lock:
+            self._remove(request_id)
+
+    def pile_status_changed(self, pile: ChargingPile):
+        """充电桩状态变化（占用/空闲/故障/关闭等）"""
+        with self.lock:
+            state = self.piles.get(pile.id)
+            if state is None:
+                state = self.piles[pile.id] = PileState(pile)
+            else:
+                state.status = pile.status
+                state.power = pile.power
+            # 故障/关闭的充电桩立即移出索引，恢复后重新加入
+            self.index.update(state)
+            self._emit("pile_status_changed", pile_id=pile.id, status=state.status)
+
+    # ---- 查询 ----
+
+    def affected_users(self, event: str, data: dict) -> Optional[Set[int]]:
+        """状态事件影响的用户，None 表示所有用户（重新加载）"""
+        if event == "loaded":
+            return None
+        users = set()
+        if data.get("user_id") is not None:
+            users.add(data["user_id"])
+        pile = self.piles.get(data.get("pile_id"))
+        if event in PILE_EVENTS and pile is not None:
+            users.update(entry.user_id for entry in pile.queue.values())
+        return users
+
+    def user_version(self, user_id: int) -> str:
+        """按用户的版本号（包含重新加载次数）"""
+        with self.lock:
+            return f"{self.generation}.{self.user_versions.get(user_id, 0)}"
+
+    def location_of(self, request_id: int) -> Optional[int]:
+        with self.lock:
+            return self._locations.get(request_id)
+
+    def candidate_piles(self, charging_mode: ChargingMode) -> List[PileState]:
+        """该模式下可用且队列未满的充电桩"""
+        with self.lock:
+            return [
+                pile for pile in self.piles.values()
+                if pile.charging_mode == charging_mode
+                and pile.is_active
+                and pile.remaining_slots(self.queue_len) > 0
+            ]
+
+    def select_pile(self, charging_mode: ChargingMode, amount: float) -> Optional[PileState]:
+        """选择完成充电总时长（等待时间+自己充电时间）最短的充电桩"""
+        with self.lock:
+            pile_id = self.index.best(charging_mode, amount)
+            return self.piles[pile_id] if pile_id is not None else None
+
+    def free_slots(self, charging_mode: ChargingMode) -> int:
+        """该模式下可用充电桩的剩余车位总数"""
+        with self.lock:
+            return self.index.free_slots(charging_mode)
+
+    def pile_slots(self, charging_mode: ChargingMode) -> List[PileSlot]:
+        """该模式下有空位的充电桩快照（供批量调度使用）"""
+        with self.lock:
+            return [
+                PileSlot(pile.id, pile.power, pile.projected_drain_time(),
+                         pile.remaining_slots(self.queue_len))
+                for pile in self.candidate_piles(charging_mode)
+            ]
+
+    def waiting_area_count(self, charging_mode: ChargingMode) -> int:
+        with self.lock:
+            return len(self.waiting_area[charging_mode])
+
+
+station_state = StationState()
@@ -0,0 +1,341 @@
+import json
+import threading
+from bisect import bisect_right
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ..core.config import settings
+
+MINUTES_PER_DAY = 24 * 60
+# numpy datetime64[D] 的 0 对应的 date 序数
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# 默认分时时段：谷时 23:00-次日7:00，平时 7:00-10:00、15:00-18:00、21:00-23:00，峰时 10:00-15:00、18:00-21:00
+DEFAULT_PERIODS = (["valley"] * 7 + ["normal"] * 3 + ["peak"] * 5 + ["normal"] * 3
+                   + ["peak"] * 3 + ["normal"] * 2 + ["valley"])
+DEFAULT_RATES = {"peak": 1.0, "normal": 0.7, "valley": 0.4}
+DEFAULT_SERVICE_FEE_RATE = 0.8
+# 未配置电价版本时默认方案的生效时间
+DEFAULT_EFFECTIVE_FROM = datetime(2000, 1, 1)
+
+
+class CompiledTariff:
+    """
+    预编译的分时电价表
+    按一天中的每分钟记录电价，并预先计算“从零点到每分钟开始”的累计电价（元·秒/度）
+    和全天累计值；任意区间 [start, end) 的电价积分只需两次查表，电费 = 电量 × 积分 / 时长
+    电价只在整点切换，因此同一分钟内电价不变
+    """
+
+    __slots__ = ("minute_rates", "prefix", "day_total", "_rates_array", "_prefix_array")
+
+    def __init__(self, hourly_rates: List[float]):
+        if len(hourly_rates) != 24:
+            raise ValueError("分时电价表需要24个小时的电价")
+        self.minute_rates: List[float] = [hourly_rates[minute // 60] for minute in range(MINUTES_PER_DAY)]
+        self.prefix: List[float] = [0.0] * (MINUTES_PER_DAY + 1)
+        for minute, rate in enumerate(self.minute_rates):
+            self.prefix[minute + 1] = self.prefix[minute] + rate * 60
+        self.day_total = self.prefix[MINUTES_PER_DAY]
+        # 批量计算使用的数组形式
+        self._rates_array = np.array(self.minute_rates)
+        self._prefix_array = np.array(self.prefix)
+
+    def rate_at(self, moment: datetime) -> float:
+        return self.minute_rates[moment.hour * 60 + moment.minute]
+
+    def _since_midnight(self, moment: datetime) -> Tuple[float, float]:
+        """当天零点到该时刻的累计电价（元·秒/度），分为整分钟部分和分钟内部分返回"""
+        minute = moment.hour * 60 + moment.minute
+        return self.prefix[minute], self.minute_rates[minute] * (moment.second + moment.microsecond / 1e6)
+
+    def integral(self, start: datetime, end: datetime) -> float:
+        """区间 [start, end) 内电价对时间的积分（元·秒/度），跨天时加上整天的累计值"""
+        days = end.toordinal() - start.toordinal()
+        end_minutes, end_seconds = self._since_midnight(end)
+        start_minutes, start_seconds = self._since_midnight(start)
+        # 先分别相减再相加，避免短区间的两个大数相减损失精度
+        return days * self.day_total + (end_minutes - start_minutes) + (end_seconds - start_seconds)
+
+    def electricity_fee(self, charging_amount: float, start_time: datetime, end_time: datetime) -> float:
+        """按充电时长均匀分摊电量计算电费；区间为空时按开始时刻的电价计算"""
+        if start_time >= end_time:
+            return charging_amount * self.rate_at(start_time)
+        return charging_amount * self.integral(start_time, end_time) / (end_time - start_time).total_seconds()
+
+
+@lru_cache(maxsize=32)
+def compile_tariff(hourly_rates: Tuple[float, ...]) -> CompiledTariff:
+    """相同电价表共用一个编译结果"""
+    return CompiledTariff(list(hourly_rates))
+
+
+class TariffSchedule:
+    """
+    一个版本的电价方案
+    rates 为各时段电价（元/度），periods 为一天24个小时各自所属的时段，
+    weekend_periods 为周六、周日的时段划分（不设置时与工作日相同），
+    seasons 为按月份覆盖部分时段电价的季节方案，如 [{"months": [7, 8], "rates": {"peak": 1.2}}]
+    """
+
+    def __init__(self, effective_from: datetime, rates: Dict[str, float], periods: List[str],
+                 service_fee_rate: float, weekend_periods: Optional[List[str]] = None,
+                 seasons: Optional[List[dict]] = None):
+        self.effective_from = effective_from
+        self.rates = dict(rates)
+        self.periods = list(periods)
+        self.service_fee_rate = service_fee_rate
+        self.weekend_periods = list(weekend_periods) if weekend_periods else None
+        self.seasons = [{"months": sorted(season["months"]), "rates": dict(season["rates"])}
+                        for season in (seasons or [])]
+        self._validate()
+
+    def _validate(self):
+        if any(rate < 0 for rate in self.rates.values()) or self.service_fee_rate < 0:
+            raise ValueError("电价和服务费单价不能为负数")
+        for periods in (self.periods, self.weekend_periods):
+            if periods is None:
+                continue
+            if len(periods) != 24:
+                raise ValueError("时段划分需要覆盖24个小时")
+            unknown = set(periods) - set(self.rates)
+            if unknown:
+                raise ValueError(f"时段 {', '.join(sorted(unknown))} 未设置电价")
+        seen = set()
+        for season in self.seasons:
+            months = set(season["months"])
+            if not months or not months <= set(range(1, 13)) or months & seen:
+                raise ValueError("季节方案的月份必须在1-12之间且互不重叠")
+            seen |= months
+            if set(season["rates"]) - set(self.rates):
+                raise ValueError("季节方案只能覆盖已有时段的电价")
+
+    @classmethod
+    def default(cls, effective_from: datetime = DEFAULT_EFFECTIVE_FROM) -> "TariffSchedule":
+        return cls(effective_from, DEFAULT_RATES, DEFAULT_PERIODS, DEFAULT_SERVICE_FEE_RATE)
+
+    @classmethod
+    def from_json(cls, effective_from: datetime, service_fee_rate: float, data: str) -> "TariffSchedule":
+        schedule = json.loads(data)
+        return cls(effective_from, schedule["rates"], schedule["periods"], service_fee_rate,
+                   schedule.get("weekend_periods"), schedule.get("seasons"))
+
+    def to_json(self) -> str:
+        """电价方案（不含生效时间和服务费）的JSON表示，存入数据库"""
+        return json.dumps({
+            "rates": self.rates,
+            "periods": self.periods,
+            "weekend_periods": self.weekend_periods,
+            "seasons": self.seasons,
+        }, sort_keys=True, ensure_ascii=False)
+
+    def key(self) -> str:
+        """编译缓存键：计费结果只取决于电价方案和服务费单价"""
+        return json.dumps([self.to_json(), self.service_fee_rate])
+
+    def hourly_rates(self, month: int, weekend: bool) -> Tuple[float, ...]:
+        """某月份工作日或周末的24小时电价"""
+        rates = dict(self.rates)
+        for season in self.seasons:
+            if month in season["months"]:
+                rates.update(season["rates"])
+        periods = self.weekend_periods if weekend and self.weekend_periods else self.periods
+        return tuple(rates[period] for period in periods)
+
+
+class CompiledSchedule:
+    """
+    编译后的电价方案
+    每种不同的日电价（季节 × 工作日/周末）编译为一个 CompiledTariff；另按日期序数维护
+    “每天使用哪个日电价”和“到每天零点的累计电价”两张表（按需向后扩展），
+    任意区间的电价积分 = 两端的日累计值之差 + 两端当天零点起的累计值之差，均为查表。
+    编译结果在线程池的各请求间共用：日期表扩展时生成新表整体替换，计费使用取到的那一份，不会读到扩展中的表
+    """
+
+    def __init__(self, schedule: TariffSchedule):
+        self.service_fee_rate = schedule.service_fee_rate
+        self.profiles: List[CompiledTariff] = []
+        index: Dict[Tuple[float, ...], int] = {}
+        # 月份(1-12) × 是否周末 -> 日电价编号
+        self._month_profile = [[0, 0] for _ in range(13)]
+        for month in range(1, 13):
+            for weekend in (0, 1):
+                hourly = schedule.hourly_rates(month, bool(weekend))
+                if hourly not in index:
+                    index[hourly] = len(self.profiles)
+                    self.profiles.append(compile_tariff(hourly))
+                self._month_profile[month][weekend] = index[hourly]
+        self._prefix = np.vstack([profile._prefix_array for profile in self.profiles])
+        self._rates = np.vstack([profile._rates_array for profile in self.profiles])
+        # 日期表 (起始日期序数, 每天的日电价编号, 到每天零点的累计电价)，只整体替换，不原地修改
+        self._days: Optional[Tuple[int, List[int], List[float]]] = None
+        self._lock = threading.Lock()
+
+    def _profile_of_day(self, ordinal: int) -> int:
+        day = date.fromordinal(ordinal)
+        return self._month_profile[day.month][1 if day.weekday() >= 5 else 0]
+
+    def _day_table(self, first: int, last: int) -> Tuple[int, List[int], List[float]]:
+        """返回覆盖 [first, last] 的日期表"""
+        days = self._days
+        if days is not None and days[0] <= first and days[0] + len(days[1]) > last:
+            return days
+        with self._lock:
+            days = self._days
+            if days is None or first < days[0]:
+                # 向前扩展时重建（生效时间之前的日期只会在查询默认方案时出现），并覆盖原有的日期
+                origin, day_profile, day_cumulative = first, [], [0.0]
+                if days is not None:
+                    last = max(last, days[0] + len(days[1]) - 1)
+            else:
+                origin, day_profile, day_cumulative = days[0], list(days[1]), list(days[2])
+            while origin + len(day_profile) <= last:
+                profile = self._profile_of_day(origin + len(day_profile))
+                day_profile.append(profile)
+                day_cumulative.append(day_cumulative[-1] + self.profiles[profile].day_total)
+            days = self._days = (origin, day_profile, day_cumulative)
+        return days
+
+    def rate_at(self, moment: datetime) -> float:
+        ordinal = moment.toordinal()
+        return self.profiles[self._profile_of_day(ordinal)].rate_at(moment)
+
+    def integral(self, start: datetime, end: datetime) -> float:
+        """区间 [start, end) 内电价对时间的积分（元·秒/度）"""
+        first, last = start.toordinal(), end.toordinal()
+        origin, day_profile, day_cumulative = self._day_table(first, last)
+        first -= origin
+        last -= origin
+        end_minutes, end_seconds = self.profiles[day_profile[last]]._since_midnight(end)
+        start_minutes, start_seconds = self.profiles[day_profile[first]]._since_midnight(start)
+        return ((day_cumulative[last] - day_cumulative[first])
+                + (end_minutes - start_minutes) + (end_seconds - start_seconds))
+
+    def _since_midnight_array(self, moments: np.ndarray, origin: int,
+                              day_profile: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """批量计算各时刻当天零点起的累计电价（整分钟部分、分钟内部分），同时返回日期表下标"""
+        days = moments.astype("datetime64[D]")
+        offsets = days.astype(np.int64) + _EPOCH_ORDINAL - origin
+        profiles = day_profile[offsets]
+        micros = (moments - days).astype(np.int64)
+        minutes = micros // 60_000_000
+        seconds = (micros - minutes * 60_000_000) / 1e6
+        return self._prefix[profiles, minutes], self._rates[profiles, minutes] * seconds, offsets
+
+    def integral_array(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """批量计算电价积分，starts/ends 为 datetime64[us] 数组"""
+        if len(starts) == 0:
+            return np.zeros(0)
+        first = int(starts.min().astype("datetime64[D]").astype(np.int64)) + _EPOCH_ORDINAL
+        last = int(ends.max().astype("datetime64[D]").astype(np.int64)) + _EPOCH_ORDINAL
+        origin, day_profile, day_cumulative = self._day_table(first, last)
+        day_profile = np.asarray(day_profile)
+        start_minutes, start_seconds, start_offsets = self._since_midnight_array(starts, origin, day_profile)
+        end_minutes, end_seconds, end_offsets = self._since_midnight_array(ends, origin, day_profile)
+        cumulative = np.asarray(day_cumulative)
+        return ((cumulative[end_offsets] - cumulative[start_offsets])
+                + (end_minutes - start_minutes) + (end_seconds - start_seconds))
+
+    def rate_at_array(self, moments: np.ndarray) -> np.ndarray:
+        if len(moments) == 0:
+            return np.zeros(0)
+        first = int(moments.min().astype("datetime64[D]").astype(np.int64)) + _EPOCH_ORDINAL
+        last = int(moments.max().astype("datetime64[D]").astype(np.int64)) + _EPOCH_ORDINAL
+        origin, day_profile, _ = self._day_table(first, last)
+        days = moments.astype("datetime64[D]")
+        offsets = days.astype(np.int64) + _EPOCH_ORDINAL - origin
+        minutes = ((moments - days).astype(np.int64) // 60_000_000).astype(np.int64)
+        return self._rates[np.asarray(day_profile)[offsets], minutes]
+
+
+@lru_cache(maxsize=settings.TARIFF_CACHE_SIZE)
+def compile_schedule(key: str) -> CompiledSchedule:
+    """按电价方案编译计费器，每个版本只编译一次（LRU缓存）"""
+    schedule_json, service_fee_rate = json.loads(key)
+    return CompiledSchedule(TariffSchedule.from_json(DEFAULT_EFFECTIVE_FROM, service_fee_rate, schedule_json))
+
+
+class TariffTimeline:
+    """
+    按生效时间排列的电价版本
+    充电区间跨越版本切换时刻时按各版本分段计算电价积分和服务费，再按时长均匀分摊电量；
+    第一个版本之前的时间按第一个版本计费
+    """
+
+    def __init__(self, versions: List[Tuple[datetime, CompiledSchedule]]):
+        if not versions:
+            raise ValueError("至少需要一个电价版本")
+        versions = sorted(versions, key=lambda version: version[0])
+        self.starts = [effective_from for effective_from, _ in versions]
+        self.schedules = [schedule for _, schedule in versions]
+        self._edges = np.array(self.starts, dtype="datetime64[us]")
+
+    @classmethod
+    def single(cls, schedule: TariffSchedule) -> "TariffTimeline":
+        return cls([(schedule.effective_from, compile_schedule(schedule.key()))])
+
+    def _index(self, moment: datetime) -> int:
+        return max(0, bisect_right(self.starts, moment) - 1)
+
+    def schedule_at(self, moment: datetime) -> CompiledSchedule:
+        return self.schedules[self._index(moment)]
+
+    def fee(self, charging_amount: float, start_time: datetime, end_time: datetime) -> Tuple[float, float]:
+        """返回 (电费, 服务费)；区间为空时按开始时刻的电价和服务费单价计算"""
+        index = self._index(start_time)
+        if start_time >= end_time:
+            schedule = self.schedules[index]
+            return (charging_amount * schedule.rate_at(start_time),
+                    charging_amount * schedule.service_fee_rate)
+        integral = 0.0
+        service = 0.0
+        piece_start = start_time
+        while True:
+            schedule = self.schedules[index]
+            piece_end = end_time
+            if index + 1 < len(self.starts) and self.starts[index + 1] < end_time:
+                piece_end = self.starts[index + 1]
+            integral += schedule.integral(piece_start, piece_end)
+            service += schedule.service_fee_rate * (piece_end - piece_start).total_seconds()
+            if piece_end >= end_time:
+                break
+            piece_start = piece_end
+            index += 1
+        duration = (end_time - start_time).total_seconds()
+        return charging_amount * integral / duration, charging_amount * service / duration
+
+    def fees(self, charging_amounts, start_times, end_times) -> Tuple[np.ndarray, np.ndarray]:
+        """批量计算 (电费数组, 服务费数组)，规则与 fee 相同，按版本逐个做数组运算"""
+        amounts = np.asarray(charging_amounts, dtype=np.float64)
+        starts = np.asarray(start_times, dtype="datetime64[us]")
+        ends = np.asarray(end_times, dtype="datetime64[us]")
+        durations = (ends - starts).astype(np.int64) / 1e6
+        integral = np.zeros(len(amounts))
+        service = np.zeros(len(amounts))
+        empty_rates = np.zeros(len(amounts))
+        empty_service = np.zeros(len(amounts))
+        empty = durations <= 0
+        for index, schedule in enumerate(self.schedules):
+            lower = self._edges[index] if index > 0 else None
+            upper = self._edges[index + 1] if index + 1 < len(self.schedules) else None
+            piece_starts = starts if lower is None else np.maximum(starts, lower)
+            piece_ends = ends if upper is None else np.minimum(ends, upper)
+            mask = (piece_ends > piece_starts) & ~empty
+            if mask.any():
+                integral[mask] += schedule.integral_array(piece_starts[mask], piece_ends[mask])
+                service[mask] += schedule.service_fee_rate * (
+                    (piece_ends[mask] - piece_starts[mask]).astype(np.int64) / 1e6)
+            # 空区间按开始时刻所在版本计算
+            in_version = empty.copy()
+            if lower is not None:
+                in_version &= starts >= lower
+            if upper is not None:
+                in_version &= starts < upper
+            if in_version.any():
+                empty_rates[in_version] = schedule.rate_at_array(starts[in_version])
+                empty_service[in_version] = schedule.service_fee_rate
+        safe = np.where(empty, 1.0, durations)
+        electricity_fees = np.where(empty, amounts * empty_rates, amounts * integral / safe)
+        service_fees = np.where(empty, amounts * empty_service, amounts * service / safe)
+        return electricity_fees, service_fees
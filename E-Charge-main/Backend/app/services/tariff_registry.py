@@ -0,0 +1,67 @@
+import threading
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from ..models.models import TariffVersion
+from .tariff import TariffSchedule, TariffTimeline, compile_schedule
+
+
+class TariffRegistry:
+    """
+    电价版本注册表
+    启动时从 tariff_versions 表加载全部版本，每个版本的电价方案编译一次（LRU缓存），
+    计费时按生效时间查找版本；新增版本后重新加载，无需重新部署
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.versions: List[TariffSchedule] = []
+        self.timeline: Optional[TariffTimeline] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.timeline is not None
+
+    def load(self, db: Session):
+        rows = db.query(TariffVersion).order_by(TariffVersion.effective_from).all()
+        self.set_versions([TariffSchedule.from_json(row.effective_from, row.service_fee_rate, row.schedule)
+                           for row in rows])
+
+    def set_versions(self, versions: List[TariffSchedule]):
+        """替换全部电价版本（版本按生效时间排序）"""
+        versions = sorted(versions, key=lambda version: version.effective_from)
+        timeline = TariffTimeline([(version.effective_from, compile_schedule(version.key()))
+                                   for version in versions]) if versions else None
+        with self._lock:
+            self.versions = versions
+            self.timeline = timeline
+
+    def reset(self):
+        with self._lock:
+            self.versions = []
+            self.timeline = None
+
+    def add_version(self, db: Session, schedule: TariffSchedule, description: str = None) -> TariffVersion:
+        """新增电价版本并重新加载"""
+        version = TariffVersion(
+            effective_from=schedule.effective_from,
+            service_fee_rate=schedule.service_fee_rate,
+            schedule=schedule.to_json(),
+            description=description,
+            created_at=datetime.now()
+        )
+        db.add(version)
+        db.commit()
+        db.refresh(version)
+        self.load(db)
+        return version
+
+    def ensure_default(self, db: Session):
+        """没有任何电价版本时写入默认方案"""
+        if db.query(TariffVersion).count() == 0:
+            self.add_version(db, TariffSchedule.default(), "默认分时电价")
+        else:
+            self.load(db)
+
+
+tariff_registry = TariffRegistry()
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Dict, Iterable, Optional
+from .station_state import StationState, station_state
+
+
+class UserNotifier:
+    """
+    按用户的状态变化通知
+    订阅充电站状态模型：用户自己的请求发生变化，或其排队的充电桩有车辆离开/状态变化时，
+    该用户的版本号加一并唤醒等待中的长轮询请求。等待者只是事件循环中挂起的协程，
+    不占用线程池线程和数据库连接
+    """
+
+    def __init__(self, state: StationState = None):
+        self.state = state if state is not None else station_state
+        # 用户ID -> 版本号，只在事件循环中修改
+        self._versions: Dict[int, int] = {}
+        # 用户ID -> (等待事件, 等待者数量)
+        self._waiters: Dict[int, list] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.state.subscribe(self._on_state_event)
+
+    def stop(self):
+        self.state.unsubscribe(self._on_state_event)
+        self._loop = None
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    @property
+    def waiting_count(self) -> int:
+        return sum(count for _, count in self._waiters.values())
+
+    def _on_state_event(self, event: str, data: dict):
+        # 在请求处理线程中持锁调用：只收集受影响的用户，唤醒交给事件循环
+        if self._loop is None or self._loop.is_closed():
+            return
+        # 重新加载后 users 为 None，所有用户的状态都可能变化
+        users = self.state.affected_users(event, data)
+        self._loop.call_soon_threadsafe(self.notify, users)
+
+    def notify(self, users: Optional[Iterable[int]] = None):
+        """在事件循环中增加用户版本号并唤醒其等待者，users 为 None 时通知所有用户"""
+        if users is None:
+            users = set(self._versions) | set(self._waiters)
+        for user_id in users:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            waiter = self._waiters.get(user_id)
+            if waiter is not None:
+                waiter[0].set()
+
+    async def wait(self, user_id: int, version: int, timeout: float) -> bool:
+        """
+        等待用户版本号不再等于 version，最多等待 timeout 秒
+        返回是否发生了变化
+        """
+        if self.version(user_id) != version:
+            return True
+        waiter = self._waiters.get(user_id)
+        if waiter is None or waiter[0].is_set():
+            waiter = self._waiters[user_id] = [asyncio.Event(), 0]
+        waiter[1] += 1
+        try:
+            await asyncio.wait_for(waiter[0].wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self.version(user_id) != version
+        finally:
+            waiter[1] -= 1
+            if waiter[1] == 0 and self._waiters.get(user_id) is waiter:
+                del self._waiters[user_id]
+
+
+user_notifier = UserNotifier()
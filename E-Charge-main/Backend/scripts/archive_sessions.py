@@ -0,0 +1,62 @@
+"""
+已完成充电会话的列式归档与离线分析
+把新增的充电详单（关联充电请求）按月追加到 NumPy 列文件，分析时只读取归档文件，不访问线上数据库。
+建议用定时任务周期执行归档
+运行方法:
+  python scripts/archive_sessions.py                 # 追加归档新增的充电会话
+  python scripts/archive_sessions.py --report        # 读取归档输出收入、利用率和等待时间分布
+  可选 --dir 目录 指定归档目录（默认读取 ARCHIVE_DIR 配置）
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from Backend.app.services.session_archive import SessionArchive
+from Backend.app.services.archive_analytics import ArchiveAnalytics
+
+
+def archive(session_archive):
+    started = time.perf_counter()
+    count = session_archive.append()
+    print(f"归档完成: 新增 {count} 条充电会话, 已归档至详单ID {session_archive.watermark()}, "
+          f"耗时 {time.perf_counter() - started:.2f}秒")
+
+
+def report(session_archive):
+    analytics = ArchiveAnalytics(session_archive)
+    print("按月收入:")
+    for month, item in analytics.revenue().items():
+        print(f"  {month}: {item['charging_times']} 次, {item['charging_amount']:.2f} 度, "
+              f"电费 {item['electricity_fee']:.2f} 元, 服务费 {item['service_fee']:.2f} 元, "
+              f"合计 {item['total_fee']:.2f} 元")
+    print("充电桩利用率:")
+    for pile_id, item in analytics.utilisation().items():
+        print(f"  充电桩 {pile_id}: {item['charging_times']} 次, {item['busy_hours']:.2f} 小时, "
+              f"利用率 {item['utilisation']:.1%}")
+    print("等待时间分布（分钟）:")
+    for mode, item in analytics.wait_distribution().items():
+        quantiles = ", ".join(f"p{float(q) * 100:g} {value:.1f}" for q, value in item["quantiles"].items())
+        print(f"  {mode}: {item['count']} 次, 平均 {item['mean']:.1f}, {quantiles}")
+        print("    " + ", ".join(f"{bucket}: {count}" for bucket, count in item["histogram"].items()))
+
+
+def main():
+    directory = None
+    if "--dir" in sys.argv:
+        directory = sys.argv[sys.argv.index("--dir") + 1]
+    session_archive = SessionArchive(directory)
+    if "--report" in sys.argv:
+        report(session_archive)
+    else:
+        archive(session_archive)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+批量计费基准测试
+随机生成充电会话，比较逐条调用 BillingService.calculate_fee 与向量化的 calculate_fees 的耗时，
+并检查两者结果一致
+运行方法: python scripts/bench_batch_billing.py [会话数...]   # 默认 10000 100000 1000000
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+import numpy as np
+from Backend.app.services.billing_service import BillingService
+
+
+def random_sessions(count: int, rng: np.random.Generator):
+    """一年内随机开始、时长0到10小时的充电会话"""
+    base = np.datetime64("2024-01-01T00:00:00", "us")
+    starts = base + rng.integers(0, 365 * 24 * 3600 * 10**6, count).astype("timedelta64[us]")
+    ends = starts + rng.integers(0, 10 * 3600 * 10**6, count).astype("timedelta64[us]")
+    amounts = rng.uniform(1, 100, count)
+    return amounts, starts, ends
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10**4, 10**5, 10**6]
+    billing = BillingService()
+    rng = np.random.default_rng(2024)
+    for count in sizes:
+        amounts, starts, ends = random_sessions(count, rng)
+
+        started = time.perf_counter()
+        start_list = starts.astype(object)
+        end_list = ends.astype(object)
+        scalar = [billing.calculate_fee(amount, start, end)[2]
+                  for amount, start, end in zip(amounts.tolist(), start_list, end_list)]
+        scalar_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, _, totals = billing.calculate_fees(amounts, starts, ends)
+        batch_elapsed = time.perf_counter() - started
+
+        error = float(np.max(np.abs(totals - np.array(scalar))))
+        print(f"{count:>8} 条: 逐条 {scalar_elapsed:.3f}秒, 批量 {batch_elapsed:.3f}秒, "
+              f"加速 {scalar_elapsed / batch_elapsed:.0f}倍, 最大差异 {error:.2e} 元")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+排队号码分配并发基准测试
+多个线程同时创建充电请求，比较原“查询最后一个号码再加一”的方式与序列分配器：
+统计吞吐量以及因号码重复导致的唯一索引冲突次数
+运行方法: python scripts/bench_queue_numbers.py [线程数] [每线程请求数]
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+from Backend.app.models import Base
+from Backend.app.models.models import ChargingRequest, ChargingMode
+from Backend.app.services.queue_numbers import QueueNumberAllocator
+
+
+def legacy_next_number(db, charging_mode):
+    """原实现：查询该模式最新的请求，解析号码后加一"""
+    last_request = db.query(ChargingRequest).filter(
+        ChargingRequest.charging_mode == charging_mode
+    ).order_by(ChargingRequest.id.desc()).first()
+    number = int(last_request.queue_number[1:]) + 1 if last_request else 1
+    return f"F{number}"
+
+
+def run(name, session_factory, next_number, threads, per_thread):
+    conflicts = [0]
+    lock = threading.Lock()
+
+    def worker():
+        db = session_factory()
+        try:
+            for _ in range(per_thread):
+                db.add(ChargingRequest(
+                    user_id=1, vehicle_id=1,
+                    queue_number=next_number(db),
+                    charging_mode=ChargingMode.FAST,
+                    requested_amount=10.0, status="waiting",
+                    created_at=datetime.now()
+                ))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    with lock:
+                        conflicts[0] += 1
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = session_factory()
+    numbers = [row[0] for row in db.query(ChargingRequest.queue_number).all()]
+    db.close()
+    total = threads * per_thread
+    print(f"{name}: 提交 {total} 个请求, 成功 {len(numbers)}, 唯一索引冲突 {conflicts[0]}, "
+          f"重复号码 {len(numbers) - len(set(numbers))}, 耗时 {elapsed:.2f}秒 ({total / elapsed:.0f} 次/秒)")
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("legacy", "sequence"):
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, name + '.db')}",
+                                   connect_args={"check_same_thread": False, "timeout": 30})
+            Base.metadata.create_all(bind=engine)
+            session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            if name == "legacy":
+                next_number = lambda db: legacy_next_number(db, ChargingMode.FAST)
+            else:
+                allocator = QueueNumberAllocator(session_factory)
+                next_number = lambda db: allocator.next_number(ChargingMode.FAST)
+            run(name, session_factory, next_number, threads, per_thread)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
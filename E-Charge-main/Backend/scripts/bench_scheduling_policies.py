@@ -0,0 +1,55 @@
+"""
+调度策略基准测试
+用同一条到达轨迹回放各调度策略（fifo、shortest_completion、sjf、least_loaded），
+输出平均/95分位等待时间、充电桩利用率和调度决策耗时
+运行方法:
+  python scripts/bench_scheduling_policies.py [车辆数] [每小时到达数] [随机种子]   # 合成泊松到达轨迹
+  python scripts/bench_scheduling_policies.py recorded                              # 回放当前目录数据库中的历史请求
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from Backend.app.services.policy_harness import (
+    synthetic_trace, recorded_trace, recorded_piles, default_piles, compare_scheduling_policies
+)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "recorded":
+        from Backend.app.core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            trace = recorded_trace(db)
+            piles = recorded_piles(db)
+        finally:
+            db.close()
+        print(f"回放历史请求 {len(trace)} 个, 充电桩 {len(piles)} 个")
+    else:
+        count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+        rate = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+        seed = int(sys.argv[3]) if len(sys.argv) > 3 else 2024
+        trace = synthetic_trace(count, rate, seed)
+        piles = default_piles()
+        print(f"合成轨迹: {count} 辆车, 每小时到达 {rate} 辆, 充电桩 {len(piles)} 个")
+    if not trace:
+        print("没有可回放的请求")
+        return
+
+    results = compare_scheduling_policies(trace, piles)
+    print(f"{'策略':<20}{'服务':>8}{'拒绝':>8}{'平均等待(分)':>14}{'P95等待(分)':>14}"
+          f"{'利用率':>10}{'决策均值(us)':>14}{'决策P95(us)':>14}")
+    for name, result in results.items():
+        print(f"{name:<20}{result['served']:>8}{result['rejected']:>8}"
+              f"{result['mean_wait'] * 60:>14.1f}{result['p95_wait'] * 60:>14.1f}"
+              f"{result['utilisation']:>10.1%}{result['mean_decision_us']:>14.1f}{result['p95_decision_us']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+检查充电桩累计数据
+按充电详单重新计算各充电桩的累计充电次数、时长、电量和费用，与充电桩表中的累计字段比较
+运行方法:
+  python scripts/check_pile_counters.py          # 只输出不一致项
+  python scripts/check_pile_counters.py --fix    # 按充电详单修正
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from Backend.app.core.database import SessionLocal, engine, add_missing_columns
+from Backend.app.models import Base
+from Backend.app.services.pile_counters import PileCounterChecker
+
+
+def main():
+    fix = "--fix" in sys.argv
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine, Base.metadata)
+    db = SessionLocal()
+    try:
+        mismatches = PileCounterChecker(db).check(fix=fix)
+    finally:
+        db.close()
+
+    if not mismatches:
+        print("充电桩累计数据与充电详单一致")
+        return
+    for item in mismatches:
+        print(f"充电桩 {item['pile_number']} {item['field']}: 累计 {item['stored']}, 详单 {item['expected']}")
+    print(f"共 {len(mismatches)} 项不一致" + ("，已修正" if fix else "，使用 --fix 修正"))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ sys.path.append(root_dir)
 
 from Backend.app.core.database import SessionLocal, engine
 from Backend.app.models.models import ChargingRequest, ChargingDetail, ChargingPile, ChargingPileStatus
+from Backend.app.services.pile_counters import PILE_COUNTERS
 from sqlalchemy import text
 
 def clear_charging_data():
@@ -32,6 +33,10 @@ def clear_charging_data():
         else:
             print("表 'charging_details' 不存在，跳过")
         
+        if "charging_hourly_rollups" in tables:
+            db.execute(text("DELETE FROM charging_hourly_rollups"))
+            print("充电详单小时汇总已清除")
+        
         print("正在清除充电请求...")
         if "charging_requests" in tables:
             db.execute(text("DELETE FROM charging_requests"))
@@ -45,6 +50,10 @@ def clear_charging_data():
             charging_piles = db.query(ChargingPile).all()
             for pile in charging_piles:
                 pile.status = ChargingPileStatus.AVAILABLE
+                # 详单已清除，累计数据一并清零
+                pile.total_charging_times = 0
+                for counter in PILE_COUNTERS:
+                    setattr(pile, counter, 0.0)
             print(f"已重置 {len(charging_piles)} 个充电桩状态")
         else:
             print("表 'charging_piles' 不存在，跳过")
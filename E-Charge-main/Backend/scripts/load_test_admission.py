@@ -0,0 +1,88 @@
+"""
+等候区准入并发压测
+关闭所有充电桩（请求只能留在等候区），大量用户同时提交充电请求，
+检查等候区中的请求数始终不超过容量，被拒绝的请求返回“等候区已满”
+运行方法: python scripts/load_test_admission.py [并发请求数] [线程数]
+"""
+
+import sys
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+# 数据库文件使用相对路径，切换到临时目录避免影响正式数据
+os.chdir(tempfile.mkdtemp())
+
+from fastapi.testclient import TestClient
+from Backend.app.main import app
+from Backend.app.core.config import settings
+from Backend.app.core.database import SessionLocal
+from Backend.app.core.security import create_access_token
+from Backend.app.models.models import User, ChargingPile, ChargingRequest, ChargingMode, ChargingPileStatus
+from Backend.app.services.station_state import station_state
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    with TestClient(app) as client:
+        db = SessionLocal()
+        try:
+            # 关闭所有充电桩，新请求不会被调出等候区
+            for pile in db.query(ChargingPile).all():
+                pile.status = ChargingPileStatus.CLOSED
+            users = [User(username=f"load{i}", hashed_password="x", is_active=True, is_admin=False)
+                     for i in range(total)]
+            db.add_all(users)
+            db.commit()
+            station_state.load(db)
+            tokens = [create_access_token({"sub": user.username}) for user in users]
+        finally:
+            db.close()
+
+        def submit(i):
+            response = client.post(
+                "/api/charging/requests",
+                json={"vehicle_id": 1,
+                      "charging_mode": "fast" if i % 2 == 0 else "trickle",
+                      "requested_amount": 10},
+                headers={"Authorization": f"Bearer {tokens[i]}"}
+            )
+            return response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            codes = list(pool.map(submit, range(total)))
+        elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    try:
+        ok = True
+        for mode, capacity in ((ChargingMode.FAST, settings.FAST_QUEUE_CAPACITY),
+                               (ChargingMode.TRICKLE, settings.TRICKLE_QUEUE_CAPACITY)):
+            waiting = db.query(ChargingRequest).filter(
+                ChargingRequest.charging_mode == mode,
+                ChargingRequest.status == "waiting",
+                ChargingRequest.charging_pile_id.is_(None)
+            ).count()
+            print(f"{mode.value}: 等候区 {waiting} / 容量 {capacity}")
+            ok = ok and waiting <= capacity
+    finally:
+        db.close()
+
+    print(f"提交 {total} 个请求, 接受 {codes.count(200)}, 拒绝 {codes.count(400)}, "
+          f"其他 {total - codes.count(200) - codes.count(400)}, 耗时 {elapsed:.2f}秒")
+    print("等候区容量检查通过" if ok else "等候区超出容量!")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
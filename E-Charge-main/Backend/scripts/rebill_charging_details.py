@@ -0,0 +1,65 @@
+"""
+历史充电详单重新计费
+电价或计费规则调整后，按当前电价版本重新计算 charging_details 的电费、服务费和总费用。
+分批处理、每批一个事务，中断后再次运行会从检查点继续；小时汇总和充电桩累计费用在每批事务中
+按费用差额更新，可在服务运行时执行；完成后重写会话归档（ARCHIVE_DIR）中费用有变化的月份
+运行方法:
+  python scripts/rebill_charging_details.py --dry-run     # 试运行：只输出差异报告，不修改数据
+  python scripts/rebill_charging_details.py               # 执行回填（从上次中断处继续）
+  python scripts/rebill_charging_details.py --restart     # 忽略检查点，从头开始
+  可选 --chunk 数量 设置每批行数
+"""
+
+import sys
+import os
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from Backend.app.core.database import SessionLocal, engine
+from Backend.app.models import Base
+from Backend.app.services.rebilling import RebillingJob
+from Backend.app.services.tariff_registry import tariff_registry
+
+
+def print_progress(report):
+    print(f"  已处理 {report.processed} 行 (至ID {report.last_id}), 需修改 {report.changed} 行, "
+          f"{report.rows_per_second:.0f} 行/秒")
+
+
+def main():
+    dry_run = "--dry-run" in sys.argv
+    restart = "--restart" in sys.argv
+    chunk_size = None
+    if "--chunk" in sys.argv:
+        chunk_size = int(sys.argv[sys.argv.index("--chunk") + 1])
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        # 使用数据库中的电价版本计费
+        tariff_registry.load(db)
+    finally:
+        db.close()
+
+    job = RebillingJob(chunk_size=chunk_size, dry_run=dry_run, progress=print_progress)
+    if restart and not dry_run:
+        job.reset()
+    print("试运行（不修改数据）" if dry_run else "开始重新计费")
+    report = job.run()
+
+    print(f"完成: 处理 {report.processed} 行, {'需修改' if dry_run else '已修改'} {report.changed} 行, "
+          f"耗时 {report.elapsed:.2f}秒 ({report.rows_per_second:.0f} 行/秒)")
+    print(f"总费用: 原 {report.old_total:.2f} 元 -> 新 {report.new_total:.2f} 元 "
+          f"(差额 {report.new_total - report.old_total:+.2f} 元)")
+    if report.samples:
+        print("差异样例 (详单ID: 原总费用 -> 新总费用):")
+        for detail_id, old_fee, new_fee in report.samples:
+            print(f"  {detail_id}: {old_fee:.2f} -> {new_fee:.2f}")
+
+
+if __name__ == "__main__":
+    main()
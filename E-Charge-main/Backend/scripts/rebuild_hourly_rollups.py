@@ -0,0 +1,34 @@
+"""
+重建充电详单小时汇总
+直接修改过 charging_details 或汇总数据不一致时，按全部历史详单重新生成 charging_hourly_rollups
+运行方法: python scripts/rebuild_hourly_rollups.py
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from Backend.app.core.database import SessionLocal, engine
+from Backend.app.models import Base
+from Backend.app.services.rollup_service import RollupService
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = RollupService(db).rebuild()
+        print(f"重建完成: {count} 行汇总, 耗时 {time.perf_counter() - started:.2f}秒")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
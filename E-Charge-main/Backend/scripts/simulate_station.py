@@ -0,0 +1,62 @@
+"""
+充电站离散事件仿真
+用虚拟时钟回放合成到达轨迹，复用线上的调度策略、调度服务的调度规则、充电站状态模型和计费服务，
+输出排队统计、充电桩利用率和每日收入曲线，可用于评估站点规模和调度改动
+充电桩数量、队列长度、等候区容量、等候区调度方式（DISPATCH_POLICY）等参数与服务端一致，通过环境变量设置。
+等候区容量与服务端准入控制相同，按模式取 FAST_QUEUE_CAPACITY / TRICKLE_QUEUE_CAPACITY，
+设置 WAITING_AREA_SIZE 时两种模式都取该值，例如:
+  CHARGING_QUEUE_LEN=3 WAITING_AREA_SIZE=10 TRICKLE_CHARGING_PILE_NUM=3 python scripts/simulate_station.py
+  CHARGING_QUEUE_LEN=3 FAST_QUEUE_CAPACITY=8 TRICKLE_QUEUE_CAPACITY=4 python scripts/simulate_station.py
+运行方法: python scripts/simulate_station.py [车辆数] [每小时到达数] [调度策略] [随机种子]
+"""
+
+import sys
+import os
+import time
+
+# 添加项目根目录到 Python 路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+root_dir = os.path.dirname(parent_dir)
+sys.path.append(root_dir)
+
+from Backend.app.core.config import settings
+from Backend.app.models.models import ChargingMode
+from Backend.app.services.policy_harness import synthetic_trace
+from Backend.app.services.scheduling_policies import get_scheduling_policy
+from Backend.app.services.simulator import StationSimulator
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 1.5
+    policy = sys.argv[3] if len(sys.argv) > 3 else settings.SCHEDULING_POLICY
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 2024
+
+    trace = synthetic_trace(count, rate, seed)
+    simulator = StationSimulator(policy=get_scheduling_policy(policy))
+    started = time.perf_counter()
+    result = simulator.run(trace)
+    elapsed = time.perf_counter() - started
+
+    print(f"快充桩 {settings.FAST_CHARGING_PILE_NUM} 个, 慢充桩 {settings.TRICKLE_CHARGING_PILE_NUM} 个, "
+          f"队列长度 {simulator.queue_len}, 等候区容量 快充 {simulator.admission.capacity(ChargingMode.FAST)} / "
+          f"慢充 {simulator.admission.capacity(ChargingMode.TRICKLE)}, 调度策略 {policy}")
+    print(f"到达 {count} 辆, 服务 {result['served']} 辆, 拒绝 {result['rejected']} 辆, "
+          f"仿真 {result['hours'] / 24:.1f} 天, 耗时 {elapsed:.2f}秒 ({count / elapsed:.0f} 辆/秒)")
+    print(f"吞吐量 {result['throughput_per_hour']:.2f} 辆/小时")
+    print(f"等待时间(分钟): 平均 {result['mean_wait'] * 60:.1f}, 中位 {result['p50_wait'] * 60:.1f}, "
+          f"P95 {result['p95_wait'] * 60:.1f}; 等候区平均停留 {result['mean_waiting_area_wait'] * 60:.1f}")
+    print(f"等候区平均人数 {result['mean_waiting_area_size']:.2f}, 最多 {result['max_waiting_area_size']}")
+    print("充电桩利用率: " + ", ".join(f"{pile} {value:.1%}" for pile, value in result["utilisation"].items()))
+    print(f"总收入 {result['revenue']:.2f} 元")
+
+    curve = simulator.revenue_curve()
+    print("每日收入（前7天）:")
+    for point in curve[:7]:
+        print(f"  第{int(point['start_hour'] // 24) + 1}天: 电费 {point['electricity_fee']:.2f}, "
+              f"服务费 {point['service_fee']:.2f}, 累计 {point['cumulative_fee']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.models import Base
+from app.models.models import User, Vehicle, ChargingPile, ChargingRequest, ChargingMode, ChargingPileStatus
+
+
+@pytest.fixture
+def db_engine():
+    """内存数据库，每个测试独立"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(db_engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def station(db):
+    """创建2个快充桩(A、B)和3个慢充桩(C、D、E)以及一个普通用户"""
+    for number, mode, power in [("A", ChargingMode.FAST, 30.0), ("B", ChargingMode.FAST, 30.0),
+                                ("C", ChargingMode.TRICKLE, 7.0), ("D", ChargingMode.TRICKLE, 7.0),
+                                ("E", ChargingMode.TRICKLE, 7.0)]:
+        db.add(ChargingPile(pile_number=number, charging_mode=mode,
+                            status=ChargingPileStatus.AVAILABLE, power=power,
+                            total_charging_times=0, total_charging_duration=0.0,
+                            total_charging_amount=0.0))
+    user = User(username="user", hashed_password="x", is_active=True, is_admin=False)
+    db.add(user)
+    db.commit()
+    db.add(Vehicle(user_id=user.id, battery_capacity=60.0, current_battery=30.0))
+    db.commit()
+    return user
+
+
+def make_request(db, user, mode, amount, number, created_at=None, status="waiting", pile_id=None,
+                 started_at=None):
+    """直接在数据库中创建一个充电请求"""
+    request = ChargingRequest(
+        user_id=user.id,
+        vehicle_id=1,
+        queue_number=number,
+        charging_mode=mode,
+        requested_amount=amount,
+        status=status,
+        created_at=created_at or datetime.now(),
+        started_at=started_at,
+        charging_pile_id=pile_id
+    )
+    db.add(request)
+    db.commit()
+    return request
+
+
+def minutes_ago(minutes):
+    return datetime.now() - timedelta(minutes=minutes)
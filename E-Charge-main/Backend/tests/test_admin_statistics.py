@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import event
+from app.models.models import ChargingPile, ChargingDetail, ChargingMode, ChargingPileStatus
+from app.routers.admin import get_admin_statistics
+from app.services.pile_counters import record_charging
+from app.services.rollup_service import RollupService
+from conftest import make_request, minutes_ago
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_load(db, user, piles, requests, offset):
+    for i in range(piles):
+        db.add(ChargingPile(pile_number=f"X{offset + i}", charging_mode=ChargingMode.TRICKLE,
+                            status=ChargingPileStatus.AVAILABLE, power=7.0, total_charging_times=0,
+                            total_charging_duration=0.0, total_charging_amount=0.0))
+    db.commit()
+    for i in range(requests):
+        make_request(db, user, ChargingMode.FAST, 10.0, f"F{offset + i}", minutes_ago(30 + i),
+                     pile_id=1 if i % 2 else None)
+
+
+def test_statistics_values(db, station):
+    now = datetime.now()
+    # 今日零点开始、当前结束，计入今日收入
+    detail = ChargingDetail(request_id=1, charging_pile_id=2, start_time=datetime.combine(now.date(), datetime.min.time()),
+                            end_time=now, charging_amount=15.0, charging_duration=0.5,
+                            electricity_fee=10.0, service_fee=12.0, total_fee=22.0)
+    db.add(detail)
+    RollupService(db).record(detail)
+    record_charging(db.get(ChargingPile, 2), detail)
+    db.commit()
+    make_request(db, station, ChargingMode.FAST, 20.0, "F1", minutes_ago(90), pile_id=1)
+    make_request(db, station, ChargingMode.FAST, 30.0, "F2", minutes_ago(5), status="charging", pile_id=2)
+    make_request(db, station, ChargingMode.TRICKLE, 5.0, "T1", minutes_ago(10))
+
+    result = get_admin_statistics(db=db, current_user=None)
+    assert result["totalPiles"] == 5 and result["activePiles"] == 5
+    assert result["totalQueuedCars"] == 2
+    assert result["totalRevenue"] == 22.0
+    piles = {pile["id"]: pile for pile in result["chargingPiles"]}
+    assert piles[1]["queueCount"] == 1 and not piles[1]["isOccupied"]
+    assert piles[2]["isOccupied"] and piles[2]["totalCharges"] == 1 and piles[2]["totalEnergy"] == 15.0
+    assert piles[2]["totalHours"] == 0.5 and piles[1]["totalCharges"] == 0
+    assert [car["pileName"] for car in result["waitingCars"]] == ["快充桩 A", "未分配"]
+    assert result["waitingCars"][0]["userId"] == "user"
+    assert result["waitingCars"][0]["batteryCapacity"] == 60.0
+    assert result["waitingCars"][0]["queueTime"] == "1小时30分钟"
+
+
+def test_statistics_query_count_is_constant(db, db_engine, station):
+    add_load(db, station, piles=2, requests=3, offset=100)
+    with count_queries(db_engine) as small:
+        small_result = get_admin_statistics(db=db, current_user=None)
+    db.expire_all()
+
+    add_load(db, station, piles=20, requests=40, offset=200)
+    with count_queries(db_engine) as large:
+        large_result = get_admin_statistics(db=db, current_user=None)
+
+    assert len(large_result["chargingPiles"]) == len(small_result["chargingPiles"]) + 20
+    assert len(large_result["waitingCars"]) == len(small_result["waitingCars"]) + 40
+    assert len(large) == len(small)
+    assert len(large) <= 8
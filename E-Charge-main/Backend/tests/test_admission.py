@@ -0,0 +1,58 @@
+import threading
+from app.models.models import ChargingMode, ChargingPileStatus, ChargingPile
+from app.services.admission import AdmissionController
+from app.services.station_state import StationState
+from app.core.config import settings
+from conftest import make_request
+
+
+def test_reserve_never_exceeds_capacity_under_contention(db, station):
+    state = StationState()
+    state.load(db)
+    controller = AdmissionController(state)
+    capacity = controller.capacity(ChargingMode.FAST)
+    granted = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(16)
+
+    def worker():
+        barrier.wait()
+        for _ in range(20):
+            if controller.try_reserve(ChargingMode.FAST):
+                with lock:
+                    granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == capacity
+    assert controller.occupancy(ChargingMode.FAST) == capacity
+    # 慢充等候区不受影响
+    assert controller.try_reserve(ChargingMode.TRICKLE)
+
+
+def test_admit_and_release(db, station):
+    for pile in db.query(ChargingPile).all():
+        pile.status = ChargingPileStatus.FAULT
+    db.commit()
+    state = StationState()
+    state.load(db)
+    controller = AdmissionController(state)
+
+    assert controller.try_reserve(ChargingMode.FAST)
+    request = make_request(db, station, ChargingMode.FAST, 10.0, "F1")
+    controller.admit(request)
+    assert state.waiting_area_count(ChargingMode.FAST) == 1
+    assert controller.occupancy(ChargingMode.FAST) == 1
+
+    # 创建失败的请求归还名额
+    assert controller.try_reserve(ChargingMode.FAST)
+    controller.release(ChargingMode.FAST)
+    assert controller.occupancy(ChargingMode.FAST) == 1
+
+    # 等候区中已有的请求计入容量
+    for i in range(settings.FAST_QUEUE_CAPACITY - 1):
+        assert controller.try_reserve(ChargingMode.FAST)
+    assert not controller.try_reserve(ChargingMode.FAST)
@@ -0,0 +1,53 @@
+import random
+from sqlalchemy import event
+from app.models.models import ChargingPile, ChargingMode, ChargingPileStatus
+from app.services.batch_dispatch import PileSlot, plan_fifo, plan_spt, total_completion_time
+from app.services.station_state import StationState
+from app.services.scheduling_service import SchedulingService
+from conftest import make_request, minutes_ago
+
+
+def test_spt_not_worse_than_fifo_on_identical_piles():
+    """相同功率且空闲的充电桩上，SPT的总完成时间不劣于按到达顺序贪心"""
+    rng = random.Random(1)
+    for _ in range(200):
+        piles = [PileSlot(i, 30.0, 0.0, 2) for i in range(1, rng.randint(2, 5))]
+        jobs = [(i, rng.uniform(1, 60)) for i in range(rng.randint(1, 2 * len(piles)))]
+        assert total_completion_time(plan_spt(jobs, piles)) <= total_completion_time(plan_fifo(jobs, piles)) + 1e-9
+
+
+def test_plans_respect_slot_limits():
+    piles = [PileSlot(1, 30.0, 1.0, 1), PileSlot(2, 30.0, 0.0, 2)]
+    jobs = [(1, 30.0), (2, 30.0), (3, 30.0), (4, 30.0)]
+    for plan in (plan_fifo(jobs, piles), plan_spt(jobs, piles)):
+        assert len(plan) == 3
+        assert sum(1 for item in plan if item.pile_id == 1) == 1
+    # 原快照未被修改
+    assert piles[0].slots == 1 and piles[1].ready_time == 0.0
+
+
+def test_dispatch_batch_commits_once_and_orders_queue(db, db_engine, station):
+    """批量调度：一次提交，充电桩队列按SPT顺序排列"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    pile = db.get(ChargingPile, 2)
+    pile.status = ChargingPileStatus.CLOSED
+    db.commit()
+    state.pile_status_changed(pile)
+
+    long_request = make_request(db, station, ChargingMode.FAST, 60.0, "F1", minutes_ago(3))
+    short_request = make_request(db, station, ChargingMode.FAST, 6.0, "F2", minutes_ago(2))
+    for request in (long_request, short_request):
+        state.request_created(request)
+
+    comparison = service.compare_dispatch_policies(ChargingMode.FAST)
+    assert comparison["spt"]["total_completion_time"] < comparison["fifo"]["total_completion_time"]
+
+    commits = []
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    assert service.dispatch_batch(ChargingMode.FAST) == 2
+    assert len(commits) == 1
+    assert short_request.status == "charging"
+    assert long_request.status == "waiting"
+    assert list(state.piles[1].queue) == [short_request.id, long_request.id]
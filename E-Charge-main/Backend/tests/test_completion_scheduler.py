@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy.orm import sessionmaker
+from app.models.models import ChargingPile, ChargingRequest, ChargingDetail, ChargingMode
+from app.services.completion_scheduler import HashedTimingWheel, CompletionScheduler
+from app.services.station_state import StationState
+from app.services.scheduling_service import SchedulingService
+from conftest import make_request, minutes_ago
+
+
+def test_timing_wheel_expiry_and_cancel():
+    wheel = HashedTimingWheel(tick=1.0, wheel_size=8)
+    wheel.schedule("a", 3.5)
+    wheel.schedule("b", 20.0)   # 超过一圈
+    wheel.schedule("c", 5.0)
+    wheel.cancel("c")
+    assert wheel.advance(2.0) == []
+    assert wheel.advance(4.0) == ["a"]
+    assert wheel.advance(19.0) == []
+    assert wheel.advance(100.0) == ["b"]
+    assert len(wheel) == 0
+    # 已过期的定时器在下一个刻度触发
+    wheel.schedule("d", 50.0)
+    assert wheel.advance(101.0) == ["d"]
+
+
+def test_scheduler_completes_through_billing_path(db, db_engine, station):
+    """到期的充电请求按预计充满时刻结束，生成详单并让下一辆车开始充电"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    first = make_request(db, station, ChargingMode.FAST, 15.0, "F1", minutes_ago(60))
+    service.assign_charging_pile(first)
+    second = make_request(db, station, ChargingMode.FAST, 30.0, "F2", minutes_ago(50))
+    service.assign_charging_pile(second)
+    third = make_request(db, station, ChargingMode.FAST, 30.0, "F3", minutes_ago(40))
+    service.assign_charging_pile(third)
+    assert third.charging_pile_id == 1 and third.status == "waiting"
+
+    # F1 在40分钟前开始充电，15度/30度每小时 = 30分钟后已充满
+    first.started_at = minutes_ago(40)
+    db.commit()
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    scheduler = CompletionScheduler(session_factory, state, tick=1.0)
+    scheduler.rebuild()
+    assert len(scheduler.wheel) == 2
+
+    expired = scheduler.wheel.advance(datetime.now().timestamp())
+    assert expired == [first.id]
+    assert scheduler.complete(expired) == 1
+
+    db.expire_all()
+    detail = db.query(ChargingDetail).filter(ChargingDetail.request_id == first.id).one()
+    assert abs(detail.charging_amount - 15.0) < 1e-6
+    assert abs(detail.charging_duration - 0.5) < 1e-6
+    assert detail.end_time == first.started_at + timedelta(minutes=30)
+    assert db.get(ChargingRequest, first.id).status == "completed"
+    assert db.get(ChargingRequest, third.id).status == "charging"
+    assert db.get(ChargingPile, 1).total_charging_times == 1
+    # 已结束的请求再次到期不会重复计费
+    assert scheduler.complete([first.id]) == 0
+
+
+def test_scheduler_tracks_state_events(db, db_engine, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    scheduler = CompletionScheduler(session_factory, state, tick=1.0)
+    state.subscribe(scheduler._on_state_event)
+
+    service = SchedulingService(db, state)
+    request = make_request(db, station, ChargingMode.TRICKLE, 7.0, "T1")
+    service.assign_charging_pile(request)
+    assert len(scheduler.wheel) == 1
+
+    service.complete_charging(request)
+    assert len(scheduler.wheel) == 0
+
+
+def test_rebuild_keeps_timers_scheduled_meanwhile(db, db_engine, station):
+    """重建查询数据库之后、换上新时间轮之前开始充电的请求不会丢失定时器"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    charging = make_request(db, station, ChargingMode.FAST, 30.0, "F1")
+    service.assign_charging_pile(charging)
+    started = []
+
+    def racing_factory():
+        session = session_factory()
+        close = session.close
+
+        def close_and_start():
+            close()
+            if not started:
+                request = make_request(db, station, ChargingMode.TRICKLE, 7.0, "T1")
+                service.assign_charging_pile(request)
+                started.append(request.id)
+        session.close = close_and_start
+        return session
+
+    scheduler = CompletionScheduler(racing_factory, state, tick=1.0)
+    state.subscribe(scheduler._on_state_event)
+    scheduler.rebuild()
+    assert db.get(ChargingRequest, started[0]).status == "charging"
+    assert len(scheduler.wheel) == 2
+
+
+def test_failed_rebuild_is_logged(db, station, capsys):
+    def broken_factory():
+        raise RuntimeError("database unavailable")
+
+    scheduler = CompletionScheduler(broken_factory, StationState(queue_len=2), tick=1.0)
+
+    async def scenario():
+        scheduler._loop = asyncio.get_running_loop()
+        scheduler._start_rebuild()
+        await asyncio.gather(*scheduler._rebuilds)
+
+    asyncio.run(scenario())
+    assert "重建自动结束充电定时器失败: database unavailable" in capsys.readouterr().out
+    assert scheduler._changes is None
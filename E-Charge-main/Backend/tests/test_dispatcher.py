@@ -0,0 +1,106 @@
+import asyncio
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.models.models import ChargingPile, ChargingRequest, ChargingMode, ChargingPileStatus
+from app.services.station_state import StationState
+from app.services.scheduling_service import SchedulingService
+from app.services.dispatcher import WaitingAreaDispatcher
+from conftest import make_request, minutes_ago
+
+
+def fill_fast_piles(db, user, service):
+    """占满两个快充桩的队列（每桩2个车位）"""
+    requests = []
+    for i in range(1, 5):
+        request = make_request(db, user, ChargingMode.FAST, 10.0, f"F{i}", minutes_ago(30 - i))
+        service.assign_charging_pile(request)
+        requests.append(request)
+    return requests
+
+
+def test_dispatch_waiting_area_fifo_single_commit(db, db_engine, station):
+    """等候区按到达顺序调度，整批一次提交"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    queued = fill_fast_piles(db, station, service)
+
+    waiting = []
+    for i in range(5, 9):
+        request = make_request(db, station, ChargingMode.FAST, 10.0, f"F{i}", minutes_ago(30 - i))
+        state.request_created(request)
+        waiting.append(request)
+    assert service.dispatch_waiting_area() == 0
+
+    # 两辆车充电结束，释放两个车位
+    for request in queued[:2]:
+        request.status = "completed"
+        db.commit()
+        state.request_finished(request)
+        service.handle_charging_completion(db.get(ChargingPile, request.charging_pile_id))
+
+    commits = []
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    assert service.dispatch_waiting_area() == 2
+    assert len(commits) == 1
+
+    db.expire_all()
+    assigned = [r.queue_number for r in db.query(ChargingRequest).filter(
+        ChargingRequest.queue_number.in_(["F5", "F6", "F7", "F8"]),
+        ChargingRequest.charging_pile_id.isnot(None)
+    )]
+    assert sorted(assigned) == ["F5", "F6"]
+    assert list(state.waiting_area[ChargingMode.FAST]) == [waiting[2].id, waiting[3].id]
+
+
+def test_dispatcher_wakes_on_completion(db, db_engine, station):
+    """充电完成事件唤醒后台调度器"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    queued = fill_fast_piles(db, station, service)
+    waiting = make_request(db, station, ChargingMode.FAST, 10.0, "F5")
+    state.request_created(waiting)
+    waiting_id = waiting.id
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+    dispatcher = WaitingAreaDispatcher(session_factory, state, interval=60)
+
+    async def scenario():
+        dispatcher.start()
+        try:
+            request = queued[0]
+            request.status = "completed"
+            db.commit()
+            state.request_finished(request)
+            service.handle_charging_completion(db.get(ChargingPile, request.charging_pile_id))
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if state.location_of(waiting_id) is not None:
+                    break
+        finally:
+            await dispatcher.stop()
+
+    asyncio.run(scenario())
+    db.expire_all()
+    assert db.get(ChargingRequest, waiting_id).charging_pile_id == 1
+
+
+def test_dispatch_skips_closed_piles(db, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    for pile in db.query(ChargingPile).filter(ChargingPile.charging_mode == ChargingMode.TRICKLE):
+        pile.status = ChargingPileStatus.CLOSED
+        state.pile_status_changed(pile)
+    db.commit()
+    request = make_request(db, station, ChargingMode.TRICKLE, 7.0, "T1")
+    state.request_created(request)
+    assert service.dispatch_waiting_area() == 0
+
+    pile = db.get(ChargingPile, 3)
+    pile.status = ChargingPileStatus.AVAILABLE
+    db.commit()
+    state.pile_status_changed(pile)
+    assert service.dispatch_waiting_area() == 1
+    assert request.status == "charging"
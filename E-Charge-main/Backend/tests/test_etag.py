@@ -0,0 +1,99 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.core.database import get_db
+from app.core.security import create_access_token
+from app.models.models import User, ChargingPile, ChargingMode, ChargingPileStatus
+from app.routers import admin, charging
+from app.services.station_state import station_state
+from conftest import make_request
+
+
+@pytest.fixture
+def client(db_engine, db, station):
+    db.add(User(username="admin", hashed_password="x", is_active=True, is_admin=True))
+    db.commit()
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(charging.router, prefix="/api/charging")
+    app.include_router(admin.router, prefix="/api/admin")
+    app.dependency_overrides[get_db] = override_get_db
+    station_state.reset()
+    yield TestClient(app)
+    station_state.reset()
+
+
+def auth(user: User) -> dict:
+    token = create_access_token({"sub": user.username, "uid": user.id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def count_queries(engine):
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return queries
+
+
+def test_not_modified_without_database(client, db_engine, db):
+    admin_user = db.query(User).filter(User.username == "admin").first()
+    first = client.get("/api/admin/piles", headers=auth(admin_user))
+    assert first.status_code == 200 and first.headers["ETag"].startswith('W/"admin-piles-')
+
+    queries = count_queries(db_engine)
+    second = client.get("/api/admin/piles", headers={**auth(admin_user), "If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304 and second.content == b""
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert queries == []
+
+    # 充电桩状态变化后版本号增加，返回新数据
+    pile = db.get(ChargingPile, 1)
+    pile.status = ChargingPileStatus.FAULT
+    db.commit()
+    station_state.pile_status_changed(pile)
+    third = client.get("/api/admin/piles", headers={**auth(admin_user), "If-None-Match": first.headers["ETag"]})
+    assert third.status_code == 200 and third.headers["ETag"] != first.headers["ETag"]
+    assert next(p for p in third.json() if p["id"] == 1)["status"] == "fault"
+
+
+def test_etag_bound_to_user(client, db, station):
+    """其他用户拿着管理员的 ETag 不会得到 304，仍需通过权限检查"""
+    admin_user = db.query(User).filter(User.username == "admin").first()
+    etag = client.get("/api/admin/piles", headers=auth(admin_user)).headers["ETag"]
+    response = client.get("/api/admin/piles", headers={**auth(station), "If-None-Match": etag})
+    assert response.status_code == 403
+
+
+def test_public_queue_status(client):
+    first = client.get("/api/charging/queue/status")
+    assert first.status_code == 200
+    # 首次请求加载了充电站状态，版本号变化
+    second = client.get("/api/charging/queue/status")
+    third = client.get("/api/charging/queue/status", headers={"If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 304
+
+
+def test_per_user_version(client, db, station):
+    """只有影响该用户的状态变化才会使其 ETag 失效"""
+    other = User(username="other", hashed_password="x", is_active=True, is_admin=False)
+    db.add(other)
+    db.commit()
+    first = client.get("/api/charging/requests", headers=auth(station))
+    assert first.status_code == 200
+    etag = {"If-None-Match": first.headers["ETag"]}
+
+    station_state.request_created(make_request(db, other, ChargingMode.FAST, 10.0, "F1"))
+    assert client.get("/api/charging/requests", headers={**auth(station), **etag}).status_code == 304
+
+    station_state.request_created(make_request(db, station, ChargingMode.FAST, 10.0, "F2"))
+    response = client.get("/api/charging/requests", headers={**auth(station), **etag})
+    assert response.status_code == 200 and len(response.json()) == 1
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from app.models.models import ChargingMode
+from app.services.event_hub import EventHub
+from app.services.station_state import StationState
+from app.services.scheduling_service import SchedulingService
+from conftest import make_request
+
+
+def parse(message: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in message.decode("utf-8").strip().split("\n"))
+    fields["data"] = json.loads(fields["data"])
+    return fields
+
+
+def test_events_fan_out_and_user_messages(db, station):
+    """每个状态事件推送给所有连接，与用户请求相关的事件另推送给该用户"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    hub = EventHub(state, max_pending=16)
+
+    async def scenario():
+        hub.start()
+        owner = hub.subscribe(station.id)
+        others = [hub.subscribe(station.id + 100 + i) for i in range(3)]
+        request = make_request(db, station, ChargingMode.FAST, 10.0, "F1")
+        state.request_created(request)
+        SchedulingService(db, state).assign_charging_pile(request)
+        # 监听器通过 call_soon_threadsafe 交给事件循环分发
+        await asyncio.sleep(0)
+        hub.stop()
+        return owner, others
+
+    owner, others = asyncio.run(scenario())
+    station_events = []
+    while not others[0].queue.empty():
+        station_events.append(parse(others[0].queue.get_nowait()))
+    names = [event["event"] for event in station_events]
+    assert names[0] == "request_created" and "request_assigned" in names
+    assert all("user_id" not in event["data"] for event in station_events)
+    assert [int(event["id"]) for event in station_events] == sorted(int(event["id"]) for event in station_events)
+    # 其他连接收到同一份已编码的消息
+    assert all(other.queue.qsize() == len(station_events) for other in others[1:])
+
+    owner_events = []
+    while not owner.queue.empty():
+        owner_events.append(parse(owner.queue.get_nowait()))
+    personal = [event for event in owner_events if event["event"] == "my_request"]
+    # 充电桩状态变化不属于某个用户，只推送全站事件
+    request_events = [name for name in names if name.startswith("request_")]
+    assert len(owner_events) == len(station_events) + len(request_events)
+    assert [event["data"]["event"] for event in personal] == request_events
+
+
+def test_lagging_subscriber_gets_resync(db, station):
+    """积压超过上限的连接不再接收消息，收到 resync 后结束"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    hub = EventHub(state, max_pending=2)
+
+    async def scenario():
+        hub.start()
+        subscription = hub.subscribe()
+        for i in range(3):
+            hub.publish(f"event: e{i}\n\n".encode("utf-8"))
+        assert subscription.lagging
+        messages = [message async for message in hub.stream(subscription, keepalive=0.01)]
+        hub.stop()
+        return messages
+
+    messages = asyncio.run(scenario())
+    assert parse(messages[0])["event"] == "hello"
+    assert parse(messages[-1])["event"] == "resync"
+    assert hub.subscriber_count == 0
+
+
+def test_idle_stream_sends_keepalive():
+    state = StationState(queue_len=2)
+    hub = EventHub(state, max_pending=4)
+
+    async def scenario():
+        subscription = hub.subscribe(1)
+        stream = hub.stream(subscription, keepalive=0.01)
+        first = await stream.__anext__()
+        second = await stream.__anext__()
+        await stream.aclose()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert parse(first)["event"] == "hello"
+    assert second == b": keepalive\n\n"
+    assert hub.subscriber_count == 0
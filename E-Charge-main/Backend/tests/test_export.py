@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from app.models.models import ChargingDetail, ChargingMode
+from app.services.export_service import DetailExporter, EXPORT_COLUMNS
+from conftest import make_request, minutes_ago
+
+
+def add_sessions(db, user, count):
+    for i in range(count):
+        request = make_request(db, user, ChargingMode.FAST, 10.0, f"F{i + 1}", minutes_ago(120),
+                               status="completed", pile_id=1 + i % 2)
+        db.add(ChargingDetail(request_id=request.id, charging_pile_id=request.charging_pile_id,
+                              start_time=minutes_ago(60), end_time=minutes_ago(40), charging_amount=10.0,
+                              charging_duration=1 / 3, electricity_fee=7.0, service_fee=8.0, total_fee=15.0 + i))
+    db.commit()
+
+
+def make_exporter(db_engine, **kwargs):
+    return DetailExporter(sessionmaker(bind=db_engine), **kwargs)
+
+
+def test_csv_export_in_keyset_batches(db, db_engine, station):
+    add_sessions(db, station, 25)
+    exporter = make_exporter(db_engine, batch_size=10)
+    assert [len(rows) for rows in exporter.batches()] == [10, 10, 5]
+
+    chunks = list(exporter.csv())
+    assert len(chunks) == 4
+    rows = list(csv.DictReader(io.StringIO("".join(chunks).lstrip("\ufeff"))))
+    assert len(rows) == 25
+    assert [int(row["detail_id"]) for row in rows] == list(range(1, 26))
+    assert rows[0]["username"] == "user" and rows[0]["pile_number"] == "A"
+    assert rows[0]["charging_mode"] == "fast"
+    assert sum(float(row["total_fee"]) for row in rows) == sum(15.0 + i for i in range(25))
+
+
+def test_ndjson_export_with_filters(db, db_engine, station):
+    add_sessions(db, station, 12)
+    lines = "".join(make_exporter(db_engine, batch_size=5, pile_id=2).ndjson()).splitlines()
+    records = [json.loads(line) for line in lines]
+    assert len(records) == 6
+    assert all(record["pile_id"] == 2 and record["pile_number"] == "B" for record in records)
+    assert set(records[0]) == set(EXPORT_COLUMNS)
+    assert "".join(make_exporter(db_engine, user_id=station.id + 1).ndjson()) == ""
+
+
+def test_csv_header_is_sent_before_querying(db_engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        stream = make_exporter(db_engine).csv()
+        header = next(stream)
+        assert header.lstrip("\ufeff").strip() == ",".join(EXPORT_COLUMNS)
+        assert statements == []
+        stream.close()
+    finally:
+        event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
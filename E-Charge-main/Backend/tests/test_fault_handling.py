@@ -0,0 +1,88 @@
+from sqlalchemy import event
+from app.models.models import ChargingPile, ChargingRequest, ChargingMode, ChargingPileStatus
+from app.services.station_state import StationState
+from app.services.scheduling_service import SchedulingService
+from conftest import make_request, minutes_ago
+
+
+def setup_trickle_queues(db, user, queue_len=3):
+    """C、D、E三个慢充桩各排两辆车"""
+    state = StationState(queue_len=queue_len)
+    state.load(db)
+    service = SchedulingService(db, state)
+    requests = []
+    for i in range(1, 7):
+        request = make_request(db, user, ChargingMode.TRICKLE, 7.0, f"T{i}", minutes_ago(60 - i))
+        service.assign_charging_pile(request)
+        requests.append(request)
+    return state, service, requests
+
+
+def test_priority_policy_single_commit(db, db_engine, station):
+    """优先级调度：故障桩的车辆优先重新分配，整体一次提交"""
+    state, service, requests = setup_trickle_queues(db, station)
+    fault_pile = db.get(ChargingPile, 3)
+    on_fault = [r.id for r in requests if r.charging_pile_id == 3]
+    assert len(on_fault) == 2
+
+    commits = []
+    event.listen(db_engine, "commit", lambda conn: commits.append(1))
+    fault_pile.status = ChargingPileStatus.FAULT
+    assert service.handle_fault_pile(fault_pile, "priority") == 2
+    assert len(commits) == 1
+
+    db.expire_all()
+    assert state.piles[3].queue_count == 0
+    for request_id in on_fault:
+        request = db.get(ChargingRequest, request_id)
+        assert request.charging_pile_id in (4, 5)
+        assert request.status == "waiting"
+    assert sorted(p.queue_count for p in state.piles.values() if p.id in (4, 5)) == [3, 3]
+
+
+def test_fault_requeues_overflow_to_waiting_area_head(db, station):
+    """其他充电桩没有空位时，故障桩的车辆回到等候区队首"""
+    state, service, requests = setup_trickle_queues(db, station, queue_len=2)
+    newcomer = make_request(db, station, ChargingMode.TRICKLE, 7.0, "T7")
+    state.request_created(newcomer)
+
+    fault_pile = db.get(ChargingPile, 3)
+    fault_pile.status = ChargingPileStatus.FAULT
+    assert service.handle_fault_pile(fault_pile, "priority") == 0
+    waiting = list(state.waiting_area[ChargingMode.TRICKLE])
+    assert waiting[-1] == newcomer.id
+    assert [db.get(ChargingRequest, rid).queue_number for rid in waiting[:2]] == ["T1", "T4"]
+
+
+def test_time_order_policy_merges_by_queue_number(db, station):
+    """时间顺序调度：与其他充电桩未开始充电的车辆按排队号码合并后重新分配"""
+    state, service, requests = setup_trickle_queues(db, station)
+    fault_pile = db.get(ChargingPile, 4)
+    fault_pile.status = ChargingPileStatus.FAULT
+    service.handle_fault_pile(fault_pile, "time_order")
+
+    db.expire_all()
+    # 充电中的车辆(C、E桩)不受影响
+    for request in requests:
+        request = db.get(ChargingRequest, request.id)
+        if request.queue_number in ("T1", "T3"):
+            assert request.status == "charging"
+    # 按排队号码依次分配：T2(原D桩充电中)、T4、T5、T6
+    assigned = [e.queue_number for p in (state.piles[3], state.piles[5]) for e in p.queue.values()]
+    assert sorted(assigned) == ["T1", "T2", "T3", "T4", "T5", "T6"]
+    assert state.piles[4].queue_count == 0
+
+
+def test_recovery_rebalances_waiting_cars(db, station):
+    """充电桩恢复后，其他充电桩中尚未开始充电的车辆重新平衡"""
+    state, service, requests = setup_trickle_queues(db, station)
+    fault_pile = db.get(ChargingPile, 5)
+    fault_pile.status = ChargingPileStatus.FAULT
+    service.handle_fault_pile(fault_pile, "priority")
+    assert state.piles[5].queue_count == 0
+
+    fault_pile.status = ChargingPileStatus.AVAILABLE
+    db.commit()
+    assert service.rebalance_on_recovery(fault_pile) > 0
+    assert state.piles[5].charging_entry() is not None
+    assert db.get(ChargingPile, 5).status == ChargingPileStatus.OCCUPIED
@@ -0,0 +1,67 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import StaticPool
+from app.core.database import add_missing_columns
+from app.models import Base
+from app.models.models import ChargingPile, ChargingDetail, ChargingMode
+from app.services.pile_counters import PileCounterChecker
+from app.services.scheduling_service import SchedulingService
+from app.services.station_state import StationState
+from conftest import make_request, minutes_ago
+
+
+def test_complete_charging_maintains_counters(db, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    details = []
+    for number, started in [("F1", 40), ("F2", 20)]:
+        request = make_request(db, station, ChargingMode.FAST, 30.0, number, minutes_ago(60))
+        service.assign_charging_pile(request)
+        request.started_at = minutes_ago(started)
+        db.commit()
+        details.append(service.complete_charging(request))
+
+    pile = db.get(ChargingPile, details[0].charging_pile_id)
+    own = [detail for detail in details if detail.charging_pile_id == pile.id]
+    assert pile.total_charging_times == len(own)
+    assert abs(pile.total_revenue - sum(detail.total_fee for detail in own)) < 1e-9
+    assert abs(pile.total_service_fee - sum(detail.service_fee for detail in own)) < 1e-9
+    assert PileCounterChecker(db).check() == []
+
+
+def test_checker_reports_and_fixes_drift(db, station):
+    db.add(ChargingDetail(request_id=1, charging_pile_id=3, start_time=minutes_ago(60), end_time=minutes_ago(0),
+                          charging_amount=7.0, charging_duration=1.0, electricity_fee=4.9,
+                          service_fee=5.6, total_fee=10.5))
+    db.commit()
+    mismatches = PileCounterChecker(db).check()
+    assert {item["field"] for item in mismatches} == {
+        "total_charging_times", "total_charging_duration", "total_charging_amount",
+        "total_electricity_fee", "total_service_fee", "total_revenue"
+    }
+    assert all(item["pile_id"] == 3 for item in mismatches)
+
+    PileCounterChecker(db).check(fix=True)
+    pile = db.get(ChargingPile, 3)
+    assert (pile.total_charging_times, pile.total_revenue) == (1, 10.5)
+    assert PileCounterChecker(db).check() == []
+
+
+def test_add_missing_columns_upgrades_old_table():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE charging_piles (id INTEGER PRIMARY KEY, pile_number VARCHAR, "
+                          "charging_mode VARCHAR, status VARCHAR, power FLOAT, total_charging_times INTEGER, "
+                          "total_charging_duration FLOAT, total_charging_amount FLOAT)"))
+        conn.execute(text("INSERT INTO charging_piles VALUES (1, 'A', 'FAST', 'AVAILABLE', 30.0, 2, 1.0, 30.0)"))
+    Base.metadata.create_all(bind=engine)
+
+    added = add_missing_columns(engine, Base.metadata)
+    assert set(added) == {("charging_piles", "total_electricity_fee"), ("charging_piles", "total_service_fee"),
+                          ("charging_piles", "total_revenue")}
+    columns = {column["name"] for column in inspect(engine).get_columns("charging_piles")}
+    assert {"total_revenue", "total_service_fee", "total_electricity_fee"} <= columns
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT total_revenue FROM charging_piles")).scalar() == 0.0
+    # 再次执行不重复添加
+    assert add_missing_columns(engine, Base.metadata) == []
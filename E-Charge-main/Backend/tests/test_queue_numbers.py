@@ -0,0 +1,41 @@
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models import Base
+from app.models.models import ChargingMode
+from app.services.queue_numbers import QueueNumberAllocator
+from conftest import make_request
+
+
+def test_seeds_from_existing_requests(db, db_engine, station):
+    make_request(db, station, ChargingMode.FAST, 10.0, "F9")
+    make_request(db, station, ChargingMode.FAST, 10.0, "F10")
+    session_factory = sessionmaker(bind=db_engine)
+    allocator = QueueNumberAllocator(session_factory, block_size=3)
+    assert [allocator.next_number(ChargingMode.FAST) for _ in range(4)] == ["F11", "F12", "F13", "F14"]
+    assert allocator.next_number(ChargingMode.TRICKLE) == "T1"
+
+
+def test_no_duplicates_under_parallel_load(tmp_path):
+    """多个分配器（模拟多个进程）并发分配时号码不重复"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'seq.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    allocators = [QueueNumberAllocator(session_factory, block_size=5) for _ in range(3)]
+    numbers = []
+    lock = threading.Lock()
+
+    def worker(allocator):
+        local = [allocator.next_number(ChargingMode.FAST) for _ in range(100)]
+        with lock:
+            numbers.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(allocators[i % 3],)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(numbers) == 1200
+    assert len(set(numbers)) == 1200
+    engine.dispose()
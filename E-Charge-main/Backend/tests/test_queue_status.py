@@ -0,0 +1,92 @@
+from sqlalchemy import event
+from app.models.models import ChargingPile, ChargingRequest, ChargingMode, ChargingPileStatus
+from app.services.queue_status import QueueStatusView
+from app.services.reconciler import StateReconciler
+from app.services.scheduling_service import SchedulingService
+from app.services.station_state import StationState
+from conftest import make_request, minutes_ago
+
+
+def record_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_snapshot_is_read_only_and_cached(db, db_engine, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    for i, amount in enumerate([10.0, 20.0, 30.0, 40.0, 50.0]):
+        request = make_request(db, station, ChargingMode.FAST, amount, f"F{i + 1}", minutes_ago(50 - i))
+        state.request_created(request)
+        service.assign_charging_pile(request)
+    view = QueueStatusView(state)
+
+    statements = record_statements(db_engine)
+    first = view.snapshot(db)
+    assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    assert len(statements) == 1
+
+    assert first["fast_charging"] == 2
+    assert first["fast_waiting_queue"] == 2 and first["fast_waiting_area"] == 1
+    assert first["fast_waiting"] == 3
+    assert [pile["status"] for pile in first["fast_piles"]] == ["occupied", "occupied"]
+    assert first["fast_piles"][0]["current_vehicle"]["user_name"] == "user"
+    assert first["trickle_waiting"] == 0 and first["trickle_charging"] == 0
+    assert [pile["number"] for pile in first["trickle_piles"]] == ["C", "D", "E"]
+
+    # 状态未变化时直接返回缓存，不访问数据库
+    statements.clear()
+    assert view.snapshot(db) is first
+    assert statements == []
+
+    request = db.query(ChargingRequest).filter(ChargingRequest.queue_number == "F1").one()
+    service.complete_charging(request)
+    second = view.snapshot(db)
+    assert second is not first
+    assert second["fast_waiting"] == 2
+
+
+def test_reconciler_repairs_inconsistent_state(db, station):
+    make_request(db, station, ChargingMode.FAST, 10.0, "F1", minutes_ago(30), status="charging")
+    make_request(db, station, ChargingMode.FAST, 10.0, "F2", minutes_ago(20), status="charging", pile_id=1,
+                 started_at=minutes_ago(20))
+    make_request(db, station, ChargingMode.FAST, 10.0, "F3", minutes_ago(10), status="charging", pile_id=1,
+                 started_at=minutes_ago(10))
+    db.get(ChargingPile, 2).status = ChargingPileStatus.OCCUPIED
+    db.commit()
+    state = StationState(queue_len=2)
+    state.load(db)
+
+    reconciler = StateReconciler(state=state)
+    assert reconciler.reconcile(db) == {"orphaned_charging": 1, "duplicate_charging": 1,
+                                        "pile_marked_occupied": 1, "pile_marked_available": 1}
+    db.expire_all()
+    statuses = {request.queue_number: request.status for request in db.query(ChargingRequest).all()}
+    assert statuses == {"F1": "waiting", "F2": "charging", "F3": "waiting"}
+    assert db.get(ChargingPile, 1).status == ChargingPileStatus.OCCUPIED
+    assert db.get(ChargingPile, 2).status == ChargingPileStatus.AVAILABLE
+    assert state.piles[1].charging_entry().queue_number == "F2"
+    # 已一致时不再修改，修复次数累计在计数器中
+    assert not any(reconciler.reconcile(db).values())
+    assert reconciler.counters["runs"] == 2
+    assert reconciler.counters["duplicate_charging"] == 1
+
+
+def test_reconciler_handles_missing_and_faulty_piles(db, station):
+    make_request(db, station, ChargingMode.FAST, 10.0, "F1", minutes_ago(30), status="charging", pile_id=99)
+    make_request(db, station, ChargingMode.TRICKLE, 10.0, "T1", minutes_ago(20), status="charging", pile_id=3)
+    db.get(ChargingPile, 3).status = ChargingPileStatus.FAULT
+    db.commit()
+    state = StationState(queue_len=2)
+    state.load(db)
+
+    repairs = StateReconciler(state=state).reconcile(db)
+    assert repairs["orphaned_charging"] == 1 and repairs["pile_marked_occupied"] == 0
+    db.expire_all()
+    orphan = db.query(ChargingRequest).filter(ChargingRequest.queue_number == "F1").one()
+    assert (orphan.status, orphan.charging_pile_id) == ("waiting", None)
+    assert db.get(ChargingPile, 3).status == ChargingPileStatus.FAULT
+    assert orphan.id in state.waiting_area[ChargingMode.FAST]
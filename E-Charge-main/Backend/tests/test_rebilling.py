@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.models import ChargingDetail, ChargingPile, BackfillCheckpoint, ChargingHourlyRollup
+from app.core.config import settings
+from app.services.billing_service import BillingService
+from app.services.rebilling import RebillingJob
+from app.services.pile_counters import PileCounterChecker, record_charging
+from app.services.rollup_service import RollupService
+from app.services.tariff_registry import TariffRegistry
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    # 重新计费完成后会重写会话归档，测试中使用临时目录
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path / "archive"))
+
+
+def add_details(db, count, first=0, pile_id=1):
+    """生成按旧规则（服务费单价0.5元）计费的详单，与结束充电时一样计入小时汇总和充电桩累计数据"""
+    start = datetime(2024, 5, 1, 8)
+    pile = db.get(ChargingPile, pile_id)
+    for i in range(first, first + count):
+        begin = start + timedelta(minutes=37 * i)
+        end = begin + timedelta(minutes=45)
+        detail = ChargingDetail(request_id=i + 1, charging_pile_id=pile_id, start_time=begin, end_time=end,
+                                charging_amount=10.0, charging_duration=0.75,
+                                electricity_fee=1.0, service_fee=5.0, total_fee=6.0)
+        db.add(detail)
+        RollupService(db).record(detail)
+        record_charging(pile, detail)
+        db.flush()
+    db.commit()
+
+
+def assert_derived_consistent(db):
+    """小时汇总和充电桩累计费用与详单一致"""
+    db.expire_all()
+    rollup_total = sum(row.total_fee for row in db.query(ChargingHourlyRollup).all())
+    assert rollup_total == pytest.approx(sum(detail.total_fee for detail in db.query(ChargingDetail).all()))
+    assert PileCounterChecker(db).check() == []
+
+
+def make_job(db_engine, **kwargs):
+    # 未加载电价版本的注册表：按默认电价计费
+    return RebillingJob(sessionmaker(bind=db_engine), BillingService(TariffRegistry()), **kwargs)
+
+
+def test_dry_run_reports_without_writing(db, db_engine, station):
+    add_details(db, 25)
+    report = make_job(db_engine, chunk_size=10, dry_run=True, sample_limit=5).run()
+    assert report.processed == 25
+    assert report.changed == 25
+    assert len(report.samples) == 5
+    assert report.old_total == pytest.approx(150.0)
+    db.expire_all()
+    assert {detail.total_fee for detail in db.query(ChargingDetail).all()} == {6.0}
+    assert db.get(BackfillCheckpoint, "rebill_charging_details") is None
+
+
+def test_backfill_updates_fees_and_checkpoints(db, db_engine, station):
+    add_details(db, 25)
+    billing = BillingService(TariffRegistry())
+    report = make_job(db_engine, chunk_size=10).run()
+    assert report.processed == 25 and report.changed == 25
+    db.expire_all()
+    for detail in db.query(ChargingDetail).all():
+        expected = billing.calculate_fee(detail.charging_amount, detail.start_time, detail.end_time)
+        assert (detail.electricity_fee, detail.service_fee, detail.total_fee) == pytest.approx(expected)
+    checkpoint = db.get(BackfillCheckpoint, "rebill_charging_details")
+    assert checkpoint.processed == 25 and checkpoint.completed_at is not None
+    # 小时汇总和充电桩累计费用按费用差额更新
+    assert_derived_consistent(db)
+
+    # 再次运行：费用已一致，不再修改
+    assert make_job(db_engine, chunk_size=10).run().changed == 0
+
+
+def test_resume_after_interruption(db, db_engine, station):
+    add_details(db, 25)
+    job = make_job(db_engine, chunk_size=10)
+    original = job.billing.calculate_fees
+    calls = []
+
+    def failing(*args):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("中断")
+        return original(*args)
+
+    job.billing.calculate_fees = failing
+    with pytest.raises(RuntimeError):
+        job.run()
+    checkpoint = db.get(BackfillCheckpoint, "rebill_charging_details")
+    assert checkpoint.last_id == 10 and checkpoint.completed_at is None
+
+    # 第二批的事务已回滚，从ID 10之后继续
+    report = make_job(db_engine, chunk_size=10).run()
+    assert report.processed == 15
+    db.expire_all()
+    checkpoint = db.get(BackfillCheckpoint, "rebill_charging_details")
+    assert checkpoint.processed == 25 and checkpoint.completed_at is not None
+    # 回滚的批次没有留下费用差额，小时汇总和充电桩累计费用与详单一致
+    assert_derived_consistent(db)
+    assert all(detail.total_fee != 6.0 for detail in db.query(ChargingDetail).all())
+
+
+def test_sessions_finishing_during_backfill_are_kept(db, db_engine, station):
+    """回填期间结束的充电（同时计入汇总和累计数据）不会丢失或重复计入"""
+    add_details(db, 25)
+    finished = []
+
+    def finish_session(report):
+        # 每批提交后有一辆车结束充电，落在已处理和未处理的小时里
+        if len(finished) < 2:
+            add_details(db, 1, first=100 + len(finished) * 12)
+            finished.append(1)
+
+    report = make_job(db_engine, chunk_size=10, progress=finish_session).run()
+    assert report.processed == 27
+    assert_derived_consistent(db)
+    assert db.get(ChargingPile, 1).total_charging_times == 27
@@ -0,0 +1,154 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app.models.models import ChargingDetail, ChargingPile, ChargingHourlyRollup, ChargingMode
+from app.services.report_service import ReportService
+from app.services.rollup_service import RollupService
+from app.services.scheduling_service import SchedulingService
+from app.services.station_state import StationState
+from conftest import make_request, minutes_ago
+
+
+def add_details(db, count, seed=0):
+    rng = random.Random(seed)
+    # 只在前3个充电桩上生成详单，其余充电桩应补零
+    piles = [pile.id for pile in db.query(ChargingPile).order_by(ChargingPile.id).all()][:3]
+    origin = datetime(2024, 3, 1)
+    for i in range(count):
+        begin = origin + timedelta(hours=rng.uniform(0, 24 * 60))
+        duration = rng.uniform(0.1, 3.0)
+        electricity_fee = rng.uniform(1, 30)
+        service_fee = rng.uniform(1, 10)
+        db.add(ChargingDetail(request_id=i + 1, charging_pile_id=rng.choice(piles), start_time=begin,
+                              end_time=begin + timedelta(hours=duration), charging_amount=rng.uniform(5, 60),
+                              charging_duration=duration, electricity_fee=electricity_fee,
+                              service_fee=service_fee, total_fee=electricity_fee + service_fee))
+    db.commit()
+    RollupService(db).rebuild()
+
+
+def python_totals(db, start, end, key=lambda detail: detail.charging_pile_id):
+    totals = {}
+    for detail in db.query(ChargingDetail).all():
+        if detail.start_time >= start and detail.end_time <= end:
+            stats = totals.setdefault(key(detail), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += detail.charging_amount
+            stats[2] += detail.total_fee
+    return totals
+
+
+def test_pile_statistics_match_python_sum(db, station):
+    add_details(db, 300)
+    start, end = datetime(2024, 3, 10), datetime(2024, 4, 10)
+    stats = ReportService(db).pile_statistics(start, end)
+    expected = python_totals(db, start, end)
+    # 所有充电桩都有统计，没有详单的补零
+    assert set(stats) == {pile.id for pile in db.query(ChargingPile).all()}
+    for pile_id, item in stats.items():
+        count, amount, fee = expected.get(pile_id, [0, 0.0, 0.0])
+        assert item["charging_times"] == count
+        assert item["total_amount"] == pytest.approx(amount)
+        assert item["total_fee"] == pytest.approx(fee)
+
+
+def test_unaligned_ranges_combine_rollups_and_edges(db, station):
+    add_details(db, 300, seed=2)
+    rng = random.Random(3)
+    service = ReportService(db)
+    for _ in range(20):
+        start = datetime(2024, 3, 1) + timedelta(minutes=rng.uniform(0, 60 * 24 * 60))
+        end = start + timedelta(minutes=rng.choice([rng.uniform(1, 120), rng.uniform(0, 60 * 24 * 30)]))
+        expected = python_totals(db, start, end)
+        totals = service.totals(start, end)
+        assert totals["charging_times"] == sum(count for count, _, _ in expected.values())
+        assert totals["total_fee"] == pytest.approx(sum(fee for _, _, fee in expected.values()))
+
+
+def test_incremental_rollup_matches_rebuild(db, station):
+    add_details(db, 100, seed=4)
+    rebuilt = {(row.charging_pile_id, row.start_hour, row.end_hour): (row.charging_times, row.total_fee)
+               for row in db.query(ChargingHourlyRollup).all()}
+    db.query(ChargingHourlyRollup).delete()
+    db.commit()
+    service = RollupService(db)
+    for detail in db.query(ChargingDetail).order_by(ChargingDetail.id).all():
+        service.record(detail)
+        db.commit()
+    incremental = {(row.charging_pile_id, row.start_hour, row.end_hour): (row.charging_times, row.total_fee)
+                   for row in db.query(ChargingHourlyRollup).all()}
+    assert set(incremental) == set(rebuilt)
+    for key, (count, fee) in rebuilt.items():
+        assert incremental[key][0] == count
+        assert incremental[key][1] == pytest.approx(fee)
+
+
+def test_pile_filter_and_empty_range(db, station):
+    add_details(db, 50)
+    pile_id = db.query(ChargingPile).filter(ChargingPile.pile_number == "A").one().id
+    stats = ReportService(db).pile_statistics(datetime(2024, 3, 1), datetime(2024, 6, 1), pile_id)
+    assert set(stats) == {pile_id}
+    assert ReportService(db).pile_statistics(datetime(2023, 1, 1), datetime(2023, 2, 1)) == {}
+
+
+@pytest.mark.parametrize("bucket, key", [
+    ("day", lambda d: d.start_time.strftime("%Y-%m-%d")),
+    ("week", lambda d: (d.start_time - timedelta(days=d.start_time.weekday())).strftime("%Y-%m-%d")),
+    ("month", lambda d: d.start_time.strftime("%Y-%m-01")),
+])
+def test_bucket_statistics(db, station, bucket, key):
+    add_details(db, 200, seed=1)
+    start, end = datetime(2024, 3, 1), datetime(2024, 5, 1)
+    buckets = ReportService(db).bucket_statistics(start, end, bucket)
+    expected = python_totals(db, start, end, key=lambda d: (key(d), d.charging_pile_id))
+    actual = {(period, pile_id): item for period, piles in buckets.items() for pile_id, item in piles.items()}
+    assert set(actual) == set(expected)
+    for group, (count, amount, fee) in expected.items():
+        assert actual[group]["charging_times"] == count
+        assert actual[group]["total_fee"] == pytest.approx(fee)
+
+
+def test_unknown_bucket(db):
+    with pytest.raises(ValueError):
+        ReportService(db).bucket_statistics(datetime(2024, 1, 1), datetime(2024, 2, 1), "year")
+
+
+def test_complete_charging_updates_rollup(db, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    request = make_request(db, station, ChargingMode.FAST, 15.0, "F1", minutes_ago(60))
+    service.assign_charging_pile(request)
+    request.started_at = minutes_ago(20)
+    db.commit()
+    detail = service.complete_charging(request)
+
+    rollup = db.query(ChargingHourlyRollup).one()
+    assert (rollup.charging_pile_id, rollup.charging_times) == (detail.charging_pile_id, 1)
+    assert rollup.start_hour == detail.start_time.replace(minute=0, second=0, microsecond=0)
+    assert rollup.total_fee == pytest.approx(detail.total_fee)
+    totals = ReportService(db).totals(detail.start_time - timedelta(days=1), detail.end_time + timedelta(days=1))
+    assert totals["charging_times"] == 1 and totals["total_fee"] == pytest.approx(detail.total_fee)
+
+
+def test_rollup_range_query_uses_index(db, db_engine, station):
+    """按时间范围读取汇总行走以开始小时开头的主键范围查找，不扫描整张汇总表"""
+    add_details(db, 200)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "charging_hourly_rollups" in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db_engine, "before_cursor_execute", capture)
+    try:
+        ReportService(db).pile_statistics(datetime(2024, 3, 10), datetime(2024, 3, 12))
+    finally:
+        event.remove(db_engine, "before_cursor_execute", capture)
+    assert statements
+    for statement, parameters in statements:
+        plan = " ".join(row[-1] for row in db.connection().exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters))
+        assert "SEARCH charging_hourly_rollups" in plan and "start_hour>?" in plan
+        assert "SCAN charging_hourly_rollups" not in plan
@@ -0,0 +1,81 @@
+import pytest
+from app.core.config import settings
+from app.models.models import ChargingPile, ChargingMode, ChargingPileStatus
+from app.services.batch_dispatch import PileSlot, plan_fifo
+from app.services.scheduling_policies import SCHEDULING_POLICIES, SchedulingPolicy, get_scheduling_policy
+from app.services.policy_harness import PileSpec, synthetic_trace, replay, compare_scheduling_policies
+from app.services.station_state import StationState
+from app.services.scheduling_service import SchedulingService
+from conftest import make_request, minutes_ago
+
+
+def test_policies_choose_piles_differently():
+    # 充电桩1只剩1个车位但队列最快充完；充电桩2、3各剩2个车位，充电桩3先充完
+    piles = [PileSlot(1, 30.0, 0.1, 1), PileSlot(2, 30.0, 1.0, 2), PileSlot(3, 30.0, 0.5, 2)]
+    jobs = [(1, 30.0)]
+    assert get_scheduling_policy("fifo").plan(jobs, piles)[0].pile_id == 1
+    assert get_scheduling_policy("shortest_completion").plan(jobs, piles)[0].pile_id == 1
+    assert get_scheduling_policy("least_loaded").plan(jobs, piles)[0].pile_id == 3
+
+
+def test_policy_must_define_pile_key():
+    class Incomplete(SchedulingPolicy):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_shortest_completion_matches_legacy_greedy():
+    piles = [PileSlot(1, 30.0, 0.5, 2), PileSlot(2, 30.0, 0.0, 2)]
+    jobs = [(1, 40.0), (2, 5.0), (3, 20.0)]
+    expected = [(item.request_id, item.pile_id) for item in plan_fifo(jobs, piles)]
+    plan = get_scheduling_policy("shortest_completion").plan(jobs, piles)
+    assert [(item.request_id, item.pile_id) for item in plan] == expected
+    # 短作业优先先调度充电量小的请求
+    assert [item.request_id for item in get_scheduling_policy("sjf").plan(jobs, piles)] == [2, 3, 1]
+
+
+def test_service_uses_configured_policy(db, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    pile = db.get(ChargingPile, 2)
+    pile.status = ChargingPileStatus.CLOSED
+    db.commit()
+    state.pile_status_changed(pile)
+    # 快充桩A上有一辆车在充电，等候区中先到的大请求和后到的小请求
+    make_request(db, station, ChargingMode.FAST, 30.0, "F1", minutes_ago(5), "charging", 1, minutes_ago(5))
+    large = make_request(db, station, ChargingMode.FAST, 50.0, "F2", minutes_ago(3))
+    small = make_request(db, station, ChargingMode.FAST, 5.0, "F3", minutes_ago(2))
+    state.load(db)
+
+    SchedulingService(db, state, get_scheduling_policy("sjf")).dispatch_waiting_area(ChargingMode.FAST)
+    db.refresh(large)
+    db.refresh(small)
+    assert small.charging_pile_id == 1
+    assert large.charging_pile_id is None
+    assert list(state.waiting_area[ChargingMode.FAST]) == [large.id]
+
+
+def test_replay_reports_metrics():
+    piles = [PileSpec(1, ChargingMode.FAST, 30.0), PileSpec(2, ChargingMode.TRICKLE, 7.0)]
+    trace = synthetic_trace(500, 0.5, seed=3)
+    result = replay(trace, get_scheduling_policy("shortest_completion"), piles, queue_len=2, waiting_capacity=10)
+    assert result["served"] + result["rejected"] == 500
+    assert 0 < result["utilisation"] <= 1
+    assert result["p95_wait"] >= result["mean_wait"] >= 0
+
+    results = compare_scheduling_policies(trace, piles, queue_len=2, waiting_capacity=10)
+    assert set(results) == set(SCHEDULING_POLICIES)
+
+
+def test_replay_uses_admission_capacities(monkeypatch):
+    """未指定等候区容量时与线上准入控制一致，按模式取容量配置"""
+    monkeypatch.setattr(settings, "FAST_QUEUE_CAPACITY", 0)
+    piles = [PileSpec(1, ChargingMode.FAST, 30.0), PileSpec(2, ChargingMode.TRICKLE, 7.0)]
+    trace = synthetic_trace(200, 0.5, seed=5)
+    result = replay(trace, get_scheduling_policy("fifo"), piles, queue_len=2)
+    fast = sum(1 for arrival in trace if arrival.charging_mode == ChargingMode.FAST)
+    assert result["rejected"] >= fast
+    assert result["served"] + result["rejected"] == 200
+    assert result["mean_decision_us"] > 0
@@ -0,0 +1,130 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from sqlalchemy.orm import sessionmaker
+from app.models.models import ChargingDetail, ChargingMode
+from app.services.archive_analytics import ArchiveAnalytics
+from app.services.billing_service import BillingService
+from app.services.rebilling import RebillingJob
+from app.services.session_archive import SessionArchive
+from app.services.tariff_registry import TariffRegistry
+from conftest import make_request
+
+
+def add_sessions(db, user, count, first=1):
+    """每天一个会话，从2024年1月20日开始，跨越多个月"""
+    for i in range(first, first + count):
+        created = datetime(2024, 1, 20, 8) + timedelta(days=i)
+        start = created + timedelta(minutes=10 * (i % 4))
+        mode = ChargingMode.FAST if i % 2 else ChargingMode.TRICKLE
+        request = make_request(db, user, mode, 20.0, f"R{i}", created, status="completed", pile_id=1 + i % 3)
+        db.add(ChargingDetail(request_id=request.id, charging_pile_id=request.charging_pile_id,
+                              start_time=start, end_time=start + timedelta(hours=2), charging_amount=14.0,
+                              charging_duration=2.0, electricity_fee=10.0, service_fee=11.2, total_fee=21.2))
+    db.commit()
+
+
+def test_append_partitions_by_month_and_is_incremental(db, db_engine, station, tmp_path):
+    add_sessions(db, station, 30)
+    archive = SessionArchive(str(tmp_path))
+    session_factory = sessionmaker(bind=db_engine)
+    assert archive.append(session_factory, batch_size=7) == 30
+    assert archive.months() == ["2024-01", "2024-02"]
+    assert archive.watermark() == 30
+    # 没有新数据时不写入分段
+    segments = sum(len(archive.segments(month)) for month in archive.months())
+    assert archive.append(session_factory) == 0
+    assert sum(len(archive.segments(month)) for month in archive.months()) == segments
+
+    add_sessions(db, station, 20, first=31)
+    assert archive.append(session_factory, batch_size=7) == 20
+    assert archive.months() == ["2024-01", "2024-02", "2024-03"]
+    columns = archive.load(["detail_id", "start_time"])
+    assert sorted(columns["detail_id"].tolist()) == list(range(1, 51))
+    assert columns["start_time"].dtype == np.dtype("datetime64[us]")
+    assert len(archive.load(["detail_id"], ["2024-02"])["detail_id"]) == 29
+
+
+def test_single_segment_is_memory_mapped(db, db_engine, station, tmp_path):
+    add_sessions(db, station, 3)
+    archive = SessionArchive(str(tmp_path))
+    archive.append(sessionmaker(bind=db_engine))
+    assert isinstance(archive.load(["total_fee"])["total_fee"], np.memmap)
+
+
+def test_interrupted_segments_are_discarded(db, db_engine, station, tmp_path):
+    add_sessions(db, station, 5)
+    archive = SessionArchive(str(tmp_path))
+    session_factory = sessionmaker(bind=db_engine)
+    archive.append(session_factory)
+    # 模拟中断：写入了清单之后的分段和未完成的临时目录
+    os.makedirs(tmp_path / "2024-01" / "0000000006-0000000009")
+    os.makedirs(tmp_path / "2024-01" / ".0000000010-0000000012")
+    add_sessions(db, station, 4, first=6)
+    assert archive.append(session_factory) == 4
+    assert sorted(archive.load(["detail_id"])["detail_id"].tolist()) == list(range(1, 10))
+
+    # 模拟重写月份分区时在两次改名之间中断：原分区被恢复
+    os.replace(tmp_path / "2024-01", tmp_path / ".old-2024-01")
+    os.makedirs(tmp_path / ".2024-01")
+    assert archive.append(session_factory) == 0
+    assert sorted(archive.load(["detail_id"])["detail_id"].tolist()) == list(range(1, 10))
+    assert sorted(os.listdir(tmp_path)) == ["2024-01", "_manifest.json"]
+
+
+def test_rebilling_rewrites_changed_months(db, db_engine, station, tmp_path):
+    add_sessions(db, station, 30)
+    archive = SessionArchive(str(tmp_path))
+    session_factory = sessionmaker(bind=db_engine)
+    archive.append(session_factory, batch_size=7)
+
+    def detail_totals():
+        db.expire_all()
+        totals = {}
+        for detail in db.query(ChargingDetail).all():
+            month = detail.start_time.strftime("%Y-%m")
+            totals[month] = totals.get(month, 0.0) + detail.total_fee
+        return totals
+
+    job = RebillingJob(session_factory, BillingService(TariffRegistry()), chunk_size=10, archive=archive)
+    assert job.run().changed == 30
+    revenue = ArchiveAnalytics(archive).revenue()
+    assert {month: item["total_fee"] for month, item in revenue.items()} == pytest.approx(detail_totals())
+    assert revenue["2024-01"]["charging_times"] == 11 and revenue["2024-02"]["charging_times"] == 19
+    # 重写后月份内的分段按批合并（行数不超过一批时只有一个分段）
+    assert len(archive.segments("2024-02")) == 1
+    assert archive.watermark() == 30
+
+    # 只有2月的详单费用变化时只重写2月分区
+    january = os.stat(tmp_path / "2024-01").st_ino
+    db.query(ChargingDetail).filter(ChargingDetail.id == 20).update({"total_fee": 0.0})
+    db.commit()
+    assert job.run(resume=False).changed == 1
+    assert os.stat(tmp_path / "2024-01").st_ino == january
+    revenue = ArchiveAnalytics(archive).revenue()
+    assert {month: item["total_fee"] for month, item in revenue.items()} == pytest.approx(detail_totals())
+
+
+def test_analytics(db, db_engine, station, tmp_path):
+    add_sessions(db, station, 30)
+    archive = SessionArchive(str(tmp_path))
+    archive.append(sessionmaker(bind=db_engine), batch_size=10)
+    analytics = ArchiveAnalytics(archive)
+
+    revenue = analytics.revenue()
+    assert revenue["2024-01"]["charging_times"] == 11 and revenue["2024-02"]["charging_times"] == 19
+    assert revenue["2024-02"]["total_fee"] == pytest.approx(19 * 21.2)
+
+    utilisation = analytics.utilisation()
+    assert sum(item["charging_times"] for item in utilisation.values()) == 30
+    assert utilisation[1]["busy_hours"] == pytest.approx(20.0)
+    span = (30 - 1) * 24 + 2 + (30 % 4 - 1 % 4) * 10 / 60
+    assert utilisation[1]["utilisation"] == pytest.approx(20.0 / span)
+
+    waits = analytics.wait_distribution()
+    assert waits["fast"]["count"] == 15 and waits["trickle"]["count"] == 15
+    expected = np.array([10 * (i % 4) for i in range(1, 31) if i % 2], dtype=float)
+    assert waits["fast"]["mean"] == pytest.approx(expected.mean())
+    assert waits["fast"]["quantiles"]["0.5"] == pytest.approx(np.quantile(expected, 0.5))
+    assert sum(waits["fast"]["histogram"].values()) == 15
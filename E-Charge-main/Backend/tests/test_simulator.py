@@ -0,0 +1,43 @@
+import pytest
+from app.models.models import ChargingMode, ChargingPileStatus
+from app.services.policy_harness import Arrival, PileSpec, synthetic_trace
+from app.services.simulator import StationSimulator
+
+
+def test_single_pile_timeline():
+    """1个快充桩、队列长度2、等候区容量1：第二辆车在充电桩后排队，第三辆进入等候区，第四辆被拒绝"""
+    simulator = StationSimulator([PileSpec(1, ChargingMode.FAST, 30.0)], queue_len=2, waiting_capacity=1)
+    trace = [Arrival(0.0, ChargingMode.FAST, 30.0), Arrival(0.1, ChargingMode.FAST, 15.0),
+             Arrival(0.2, ChargingMode.FAST, 15.0), Arrival(0.3, ChargingMode.FAST, 15.0)]
+    result = simulator.run(trace)
+
+    assert result["served"] == 3
+    assert result["rejected"] == 1
+    assert simulator.waits == pytest.approx([0.0, 0.9, 1.3])
+    assert result["hours"] == pytest.approx(2.0)
+    assert result["utilisation"]["1"] == pytest.approx(1.0)
+    assert result["max_waiting_area_size"] == 1
+    # 收入曲线与各充电桩收入一致，服务费为0.8元/度
+    curve = simulator.revenue_curve()
+    assert curve[-1]["cumulative_fee"] == pytest.approx(result["revenue"])
+    assert sum(point["service_fee"] for point in curve) == pytest.approx(60.0 * 0.8)
+    # 与调度服务相同的结束充电规则：队列清空后充电桩恢复可用
+    assert simulator.piles[1].status == ChargingPileStatus.AVAILABLE
+
+
+def test_synthetic_run_accounts_for_every_arrival():
+    simulator = StationSimulator(queue_len=2, waiting_capacity=6)
+    result = simulator.run(synthetic_trace(3000, 1.5, seed=7))
+    assert result["served"] + result["rejected"] == 3000
+    assert all(0 <= value <= 1 + 1e-9 for value in result["utilisation"].values())
+    # 仿真结束后所有队列均已清空
+    assert all(not pile.queue for pile in simulator.state.piles.values())
+    assert result["p95_wait"] >= result["p50_wait"]
+
+
+def test_batch_dispatch_policy():
+    """等候区可按调度服务的批量调度策略（SPT）调入充电桩队列"""
+    simulator = StationSimulator(queue_len=2, waiting_capacity=6, dispatch_policy="spt")
+    result = simulator.run(synthetic_trace(500, 1.5, seed=3))
+    assert result["served"] + result["rejected"] == 500
+    assert all(not pile.queue for pile in simulator.state.piles.values())
@@ -0,0 +1,223 @@
+import pytest
+from sqlalchemy import event
+from app.models.models import ChargingPile, ChargingRequest, ChargingMode, ChargingPileStatus
+from app.services.station_state import StationState
+from app.services.scheduling_policies import get_scheduling_policy
+from app.services.scheduling_service import SchedulingService
+from conftest import make_request, minutes_ago
+
+
+def count_queries(engine):
+    """统计执行的SQL语句数量"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def test_load_builds_queues_and_waiting_area(db, station):
+    """启动加载：充电桩队列、排队电量和等候区"""
+    make_request(db, station, ChargingMode.FAST, 30.0, "F1", minutes_ago(10), "charging", 1, minutes_ago(5))
+    make_request(db, station, ChargingMode.FAST, 15.0, "F2", minutes_ago(8), "waiting", 1)
+    make_request(db, station, ChargingMode.FAST, 10.0, "F3", minutes_ago(6), "waiting")
+    make_request(db, station, ChargingMode.TRICKLE, 7.0, "T1", minutes_ago(4), "completed", 3)
+
+    state = StationState(queue_len=2)
+    state.load(db)
+
+    pile_a = state.piles[1]
+    assert list(pile_a.queue) == [1, 2]
+    assert pile_a.queued_amount == 45.0
+    assert pile_a.charging_entry().queue_number == "F1"
+    assert list(state.waiting_area[ChargingMode.FAST]) == [3]
+    assert state.waiting_area_count(ChargingMode.TRICKLE) == 0
+    # A桩队列已满，只剩B桩可选
+    assert [pile.id for pile in state.candidate_piles(ChargingMode.FAST)] == [2]
+
+
+def test_assign_selects_shortest_total_time(db, station):
+    """选桩规则与原实现一致：等待时间+自己充电时间最短"""
+    state = StationState(queue_len=2)
+    service = SchedulingService(db, state)
+
+    first = make_request(db, station, ChargingMode.TRICKLE, 14.0, "T1")
+    assert service.assign_charging_pile(first).pile_number == "C"
+    assert first.status == "charging"
+
+    second = make_request(db, station, ChargingMode.TRICKLE, 7.0, "T2")
+    assert service.assign_charging_pile(second).pile_number == "D"
+
+    third = make_request(db, station, ChargingMode.TRICKLE, 3.5, "T3")
+    assert service.assign_charging_pile(third).pile_number == "E"
+
+    # E桩排队电量最少，第四辆车排在E桩后等待
+    fourth = make_request(db, station, ChargingMode.TRICKLE, 1.0, "T4")
+    assert service.assign_charging_pile(fourth).pile_number == "E"
+    assert fourth.status == "waiting"
+    assert state.piles[5].queued_amount == 4.5
+    assert db.get(ChargingPile, 5).status == ChargingPileStatus.OCCUPIED
+
+
+def test_assign_query_count_independent_of_pile_count(db, db_engine, station):
+    """选桩不再逐桩查询：SQL语句数量与充电桩数量无关"""
+    for i in range(50):
+        db.add(ChargingPile(pile_number=f"X{i}", charging_mode=ChargingMode.FAST,
+                            status=ChargingPileStatus.AVAILABLE, power=30.0))
+    db.commit()
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    request = make_request(db, station, ChargingMode.FAST, 10.0, "F1")
+
+    statements = count_queries(db_engine)
+    assert service.assign_charging_pile(request) is not None
+    assert len(statements) <= 6
+
+
+def test_completion_and_cancel_keep_state_in_sync(db, station):
+    """完成充电后队首车辆开始充电，取消后离开队列"""
+    state = StationState(queue_len=3)
+    service = SchedulingService(db, state)
+    db.query(ChargingPile).filter(ChargingPile.pile_number == "B").update(
+        {ChargingPile.status: ChargingPileStatus.CLOSED})
+    db.commit()
+
+    requests = [make_request(db, station, ChargingMode.FAST, 10.0, f"F{i}", minutes_ago(10 - i))
+                for i in range(1, 4)]
+    for request in requests:
+        service.assign_charging_pile(request)
+    assert [e.status for e in state.piles[1].queue.values()] == ["charging", "waiting", "waiting"]
+
+    # 取消第三辆
+    requests[2].status = "cancelled"
+    db.commit()
+    state.request_cancelled(requests[2])
+    assert state.piles[1].queued_amount == 20.0
+
+    # 第一辆充电结束
+    requests[0].status = "completed"
+    db.commit()
+    state.request_finished(requests[0])
+    pile = db.get(ChargingPile, 1)
+    service.handle_charging_completion(pile)
+    assert db.get(ChargingRequest, requests[1].id).status == "charging"
+    assert state.piles[1].charging_entry().request_id == requests[1].id
+
+    # 第二辆也结束，充电桩空闲
+    requests[1].status = "completed"
+    db.commit()
+    state.request_finished(requests[1])
+    service.handle_charging_completion(pile)
+    assert pile.status == ChargingPileStatus.AVAILABLE
+    assert state.piles[1].queue_count == 0
+    assert state.piles[1].status == ChargingPileStatus.AVAILABLE
+
+
+def test_fault_pile_drops_out_of_candidates(db, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    pile = db.get(ChargingPile, 1)
+    pile.status = ChargingPileStatus.FAULT
+    db.commit()
+    state.pile_status_changed(pile)
+    assert [p.pile_number for p in state.candidate_piles(ChargingMode.FAST)] == ["B"]
+
+
+def test_index_tracks_slots_and_status_changes(db, station):
+    """最早完成索引：剩余车位、队列已满和充电桩状态变化"""
+    state = StationState(queue_len=2)
+    state.load(db)
+    service = SchedulingService(db, state)
+    assert state.free_slots(ChargingMode.FAST) == 4
+
+    for i, amount in enumerate([30.0, 10.0, 5.0], start=1):
+        service.assign_charging_pile(make_request(db, station, ChargingMode.FAST, amount, f"F{i}"))
+    # A: 30度，B: 10+5度 -> B队列已满
+    assert state.index.remaining_slots(2) == 0
+    assert state.free_slots(ChargingMode.FAST) == 1
+    assert state.select_pile(ChargingMode.FAST, 1.0).pile_number == "A"
+
+    # A桩故障后立即移出索引
+    pile = db.get(ChargingPile, 1)
+    pile.status = ChargingPileStatus.FAULT
+    db.commit()
+    state.pile_status_changed(pile)
+    assert state.select_pile(ChargingMode.FAST, 1.0) is None
+    assert state.free_slots(ChargingMode.FAST) == 0
+
+    # 恢复后重新加入
+    pile.status = ChargingPileStatus.OCCUPIED
+    db.commit()
+    state.pile_status_changed(pile)
+    assert state.select_pile(ChargingMode.FAST, 1.0).pile_number == "A"
+
+
+def test_index_matches_full_scan(db, station):
+    """随机操作序列下，堆索引的选择与全量扫描一致"""
+    import random
+    rng = random.Random(7)
+    for i in range(20):
+        db.add(ChargingPile(pile_number=f"X{i}", charging_mode=ChargingMode.TRICKLE,
+                            status=ChargingPileStatus.AVAILABLE, power=rng.choice([7.0, 11.0, 22.0])))
+    db.commit()
+    state = StationState(queue_len=3)
+    state.load(db)
+    service = SchedulingService(db, state)
+    active = []
+    for i in range(300):
+        if active and rng.random() < 0.4:
+            request = active.pop(rng.randrange(len(active)))
+            request.status = "completed"
+            db.commit()
+            state.request_finished(request)
+            continue
+        amount = rng.uniform(1, 40)
+        candidates = state.candidate_piles(ChargingMode.TRICKLE)
+        expected = min(candidates, key=lambda p: ((p.queued_amount + amount) / p.power, p.id), default=None)
+        request = make_request(db, station, ChargingMode.TRICKLE, amount, f"T{i}")
+        pile = service.assign_charging_pile(request)
+        if expected is None:
+            assert pile is None
+        else:
+            assert pile.id == expected.id
+            active.append(request)
+
+
+def test_complete_charging_starts_next_car_in_same_transaction(db, station, monkeypatch):
+    """结束充电与下一辆车开始充电一次提交；提交失败时两者都不生效"""
+    state = StationState(queue_len=3)
+    state.load(db)
+    # 先来先服务：两辆车都排在充电桩1
+    service = SchedulingService(db, state, get_scheduling_policy("fifo"))
+    first, second = [make_request(db, station, ChargingMode.FAST, 10.0, f"F{i}", minutes_ago(10 - i))
+                     for i in range(1, 3)]
+    for request in (first, second):
+        service.assign_charging_pile(request)
+
+    commit = db.commit
+
+    def failing_commit():
+        raise RuntimeError("提交失败")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        service.complete_charging(first)
+    monkeypatch.setattr(db, "commit", commit)
+    assert db.get(ChargingRequest, first.id).status == "charging"
+    assert db.get(ChargingRequest, second.id).status == "waiting"
+    assert state.piles[1].charging_entry().request_id == first.id
+
+    commits = []
+
+    def counting_commit():
+        commits.append(1)
+        commit()
+
+    monkeypatch.setattr(db, "commit", counting_commit)
+    assert service.complete_charging(first) is not None
+    assert len(commits) == 1
+    assert db.get(ChargingRequest, second.id).status == "charging"
+    assert state.piles[1].charging_entry().request_id == second.id
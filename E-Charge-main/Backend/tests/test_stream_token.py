@@ -0,0 +1,33 @@
+from app.core.config import settings
+from app.core.security import decode_access_token, decode_stream_token, get_user_by_stream_token
+from test_etag import client, auth
+
+
+def stream_token(client, user) -> str:
+    response = client.post("/api/charging/stream/token", headers=auth(user))
+    assert response.status_code == 200
+    assert response.json()["expires_in"] == settings.STREAM_TOKEN_EXPIRE_SECONDS
+    return response.json()["token"]
+
+
+def test_stream_token_only_opens_stream(client, db, station):
+    token = stream_token(client, station)
+    assert decode_stream_token(token)["uid"] == station.id
+    assert get_user_by_stream_token(token, db).id == station.id
+    # 连接令牌不能当作访问令牌
+    assert decode_access_token(token) is None
+    assert client.get("/api/charging/details", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_stream_rejects_access_token_in_url(client, station):
+    access_token = auth(station)["Authorization"].split(" ", 1)[1]
+    assert decode_stream_token(access_token) is None
+    response = client.get("/api/charging/stream", params={"token": access_token})
+    assert response.status_code == 401
+
+
+def test_expired_stream_token(client, db, station, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_TOKEN_EXPIRE_SECONDS", -1)
+    token = stream_token(client, station)
+    assert decode_stream_token(token) is None
+    assert client.get("/api/charging/stream", params={"token": token}).status_code == 401
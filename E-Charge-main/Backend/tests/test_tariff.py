@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+import pytest
+from hypothesis import given, settings, strategies as st
+from app.services.billing_service import BillingService
+from app.services.tariff import CompiledTariff
+
+moments = st.datetimes(min_value=datetime(2020, 1, 1), max_value=datetime(2030, 12, 31))
+durations = st.timedeltas(min_value=timedelta(0), max_value=timedelta(days=3))
+amounts = st.floats(min_value=0, max_value=500, allow_nan=False)
+
+
+# ---- 基准算法：改为预编译电价表之前 BillingService 的逐时段计费，原样保留作为对照，不随生产代码修改 ----
+
+def baseline_rate(moment: datetime) -> float:
+    hour = moment.time().hour
+    # 峰时：10:00-15:00, 18:00-21:00
+    if (10 <= hour < 15) or (18 <= hour < 21):
+        return 1.0
+    # 平时：7:00-10:00, 15:00-18:00, 21:00-23:00
+    elif (7 <= hour < 10) or (15 <= hour < 18) or (21 <= hour < 23):
+        return 0.7
+    # 谷时：23:00-次日7:00
+    else:
+        return 0.4
+
+
+def baseline_periods(start_time: datetime, end_time: datetime):
+    if start_time >= end_time:
+        return []
+    periods = []
+    current = start_time
+    while current < end_time:
+        rate = baseline_rate(current)
+        hour = current.hour
+        if 7 <= hour < 10:
+            next_rate_change = datetime(current.year, current.month, current.day, 10, 0)
+        elif 10 <= hour < 15:
+            next_rate_change = datetime(current.year, current.month, current.day, 15, 0)
+        elif 15 <= hour < 18:
+            next_rate_change = datetime(current.year, current.month, current.day, 18, 0)
+        elif 18 <= hour < 21:
+            next_rate_change = datetime(current.year, current.month, current.day, 21, 0)
+        elif 21 <= hour < 23:
+            next_rate_change = datetime(current.year, current.month, current.day, 23, 0)
+        elif hour >= 23:
+            next_day = current + timedelta(days=1)
+            next_rate_change = datetime(next_day.year, next_day.month, next_day.day, 7, 0)
+        else:
+            next_rate_change = datetime(current.year, current.month, current.day, 7, 0)
+        period_end = min(next_rate_change, end_time)
+        periods.append((current, period_end, rate))
+        current = period_end
+    return periods
+
+
+def baseline_fee(charging_amount: float, start_time: datetime, end_time: datetime):
+    service_fee = charging_amount * 0.8
+    periods = baseline_periods(start_time, end_time)
+    if not periods:
+        electricity_fee = charging_amount * baseline_rate(start_time)
+    else:
+        total_duration = (end_time - start_time).total_seconds() / 3600
+        electricity_fee = 0.0
+        for period_start, period_end, rate in periods:
+            period_duration = (period_end - period_start).total_seconds() / 3600
+            electricity_fee += charging_amount * (period_duration / total_duration) * rate
+    return electricity_fee, service_fee, electricity_fee + service_fee
+
+
+@settings(max_examples=500, deadline=None)
+@given(amount=amounts, start=moments, duration=durations)
+def test_compiled_fee_matches_period_walk(amount, start, duration):
+    billing = BillingService()
+    end = start + duration
+    expected = baseline_fee(amount, start, end)
+    assert billing.calculate_fee(amount, start, end) == pytest.approx(expected, rel=1e-9, abs=1e-9)
+    # 生产代码中保留的逐时段计费同样与基准一致
+    assert billing.calculate_fee_by_periods(amount, start, end) == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+
+@settings(max_examples=200, deadline=None)
+@given(start=moments, middle=durations, rest=durations)
+def test_integral_is_additive(start, middle, rest):
+    tariff = BillingService().timeline().schedules[0]
+    split = start + middle
+    end = split + rest
+    assert tariff.integral(start, end) == pytest.approx(
+        tariff.integral(start, split) + tariff.integral(split, end), rel=1e-9, abs=1e-6)
+
+
+def test_boundaries_and_rate_changes():
+    billing = BillingService()
+    # 9:30-10:30 跨平时/峰时各半小时
+    electricity_fee, service_fee, total_fee = billing.calculate_fee(
+        10.0, datetime(2024, 5, 1, 9, 30), datetime(2024, 5, 1, 10, 30))
+    assert electricity_fee == pytest.approx(5 * 0.7 + 5 * 1.0)
+    assert service_fee == pytest.approx(8.0)
+    assert total_fee == pytest.approx(electricity_fee + service_fee)
+    # 空区间按开始时刻的电价
+    moment = datetime(2024, 5, 1, 23, 59, 59)
+    assert billing.calculate_fee(10.0, moment, moment)[0] == pytest.approx(4.0)
+    # 修改电价后重新编译
+    billing.peak_rate = 2.0
+    assert billing.calculate_fee(10.0, datetime(2024, 5, 1, 11), datetime(2024, 5, 1, 12))[0] == pytest.approx(20.0)
+
+
+def test_rejects_incomplete_rate_table():
+    with pytest.raises(ValueError):
+        CompiledTariff([1.0] * 23)
+
+
+@settings(max_examples=100, deadline=None)
+@given(sessions=st.lists(st.tuples(amounts, moments, durations), min_size=1, max_size=50))
+def test_batch_fees_match_scalar(sessions):
+    billing = BillingService()
+    amounts = [amount for amount, _, _ in sessions]
+    starts = [start for _, start, _ in sessions]
+    ends = [start + duration for _, start, duration in sessions]
+    electricity_fees, service_fees, total_fees = billing.calculate_fees(amounts, starts, ends)
+    for i, (amount, start, end) in enumerate(zip(amounts, starts, ends)):
+        expected = billing.calculate_fee(amount, start, end)
+        assert (electricity_fees[i], service_fees[i], total_fees[i]) == pytest.approx(expected, rel=1e-9, abs=1e-9)
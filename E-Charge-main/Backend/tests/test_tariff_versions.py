@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from hypothesis import given, settings, strategies as st
+from app.models.models import TariffVersion
+from app.services.billing_service import BillingService
+from app.services.tariff import TariffSchedule, CompiledSchedule, DEFAULT_RATES, DEFAULT_PERIODS
+from app.services.tariff_registry import TariffRegistry
+
+
+VERSIONS = [
+    TariffSchedule.default(datetime(2024, 1, 1)),
+    # 6月1日12:30起峰时电价2.0元，服务费1.0元
+    TariffSchedule(datetime(2024, 6, 1, 12, 30), dict(DEFAULT_RATES, peak=2.0), DEFAULT_PERIODS, 1.0),
+    # 9月起周末全天谷时电价，7、8月峰时1.5元
+    TariffSchedule(datetime(2024, 9, 1), DEFAULT_RATES, DEFAULT_PERIODS, 0.8,
+                   weekend_periods=["valley"] * 24,
+                   seasons=[{"months": [7, 8], "rates": {"peak": 1.5}}]),
+]
+
+
+def make_registry(db):
+    registry = TariffRegistry()
+    for version in VERSIONS:
+        registry.add_version(db, version)
+    return registry
+
+
+def test_session_crossing_version_boundary(db):
+    billing = BillingService(make_registry(db))
+    electricity_fee, service_fee, total_fee = billing.calculate_fee(
+        10.0, datetime(2024, 6, 1, 12, 0), datetime(2024, 6, 1, 13, 0))
+    assert electricity_fee == pytest.approx(5 * 1.0 + 5 * 2.0)
+    assert service_fee == pytest.approx(5 * 0.8 + 5 * 1.0)
+    assert (electricity_fee, service_fee, total_fee) == pytest.approx(
+        billing.calculate_fee_by_periods(10.0, datetime(2024, 6, 1, 12, 0), datetime(2024, 6, 1, 13, 0)))
+
+
+def test_weekend_and_season_variants(db):
+    billing = BillingService(make_registry(db))
+    # 2024-09-07 为周六：全天谷时
+    assert billing.calculate_fee(10.0, datetime(2024, 9, 7, 11), datetime(2024, 9, 7, 12))[0] == pytest.approx(4.0)
+    # 工作日峰时
+    assert billing.calculate_fee(10.0, datetime(2024, 9, 9, 11), datetime(2024, 9, 9, 12))[0] == pytest.approx(10.0)
+    # 2025-07-01 为周二：夏季峰时1.5元
+    assert billing.calculate_fee(10.0, datetime(2025, 7, 1, 11), datetime(2025, 7, 1, 12))[0] == pytest.approx(15.0)
+
+
+def test_registry_loads_versions_from_database(db):
+    make_registry(db)
+    assert db.query(TariffVersion).count() == 3
+    registry = TariffRegistry()
+    registry.load(db)
+    assert [version.effective_from for version in registry.versions] == [
+        datetime(2024, 1, 1), datetime(2024, 6, 1, 12, 30), datetime(2024, 9, 1)]
+    assert registry.versions[2].weekend_periods == ["valley"] * 24
+
+
+def test_schedule_table_rebuilt_during_billing():
+    """共用的编译结果在计费过程中被其他请求向前重建日期表，本次计费仍使用取到的那份表"""
+    schedule = VERSIONS[2]
+    start, end = datetime(2024, 12, 30, 20), datetime(2024, 12, 31, 2)
+    expected = CompiledSchedule(schedule).integral(start, end)
+    shared = CompiledSchedule(schedule)
+    day_table = shared._day_table
+
+    def racing(first, last):
+        table = day_table(first, last)
+        # 另一个请求此时查询更早的日期
+        day_table(first - 30, first - 30)
+        return table
+
+    shared._day_table = racing
+    assert shared.integral(start, end) == expected
+    starts = np.array([start], dtype="datetime64[us]")
+    ends = np.array([end], dtype="datetime64[us]")
+    assert shared.integral_array(starts, ends)[0] == pytest.approx(expected)
+
+
+def test_invalid_schedules_rejected():
+    with pytest.raises(ValueError):
+        TariffSchedule(datetime(2024, 1, 1), DEFAULT_RATES, DEFAULT_PERIODS[:23], 0.8)
+    with pytest.raises(ValueError):
+        TariffSchedule(datetime(2024, 1, 1), {"peak": 1.0}, DEFAULT_PERIODS, 0.8)
+    with pytest.raises(ValueError):
+        TariffSchedule(datetime(2024, 1, 1), DEFAULT_RATES, DEFAULT_PERIODS, 0.8,
+                       seasons=[{"months": [7], "rates": {}}, {"months": [7, 8], "rates": {}}])
+
+
+sessions = st.tuples(
+    st.floats(min_value=0, max_value=200, allow_nan=False),
+    st.datetimes(min_value=datetime(2023, 12, 1), max_value=datetime(2025, 12, 31)),
+    st.timedeltas(min_value=timedelta(0), max_value=timedelta(days=4)),
+)
+
+
+@settings(max_examples=150, deadline=None)
+@given(batch=st.lists(sessions, min_size=1, max_size=20))
+def test_versioned_fees_match_period_walk(batch):
+    registry = TariffRegistry()
+    registry.set_versions(VERSIONS)
+    billing = BillingService(registry)
+    fees = billing.calculate_fees([amount for amount, _, _ in batch],
+                                  [start for _, start, _ in batch],
+                                  [start + duration for _, start, duration in batch])
+    for i, (amount, start, duration) in enumerate(batch):
+        expected = billing.calculate_fee_by_periods(amount, start, start + duration)
+        assert billing.calculate_fee(amount, start, start + duration) == pytest.approx(expected, rel=1e-9, abs=1e-9)
+        assert (fees[0][i], fees[1][i], fees[2][i]) == pytest.approx(expected, rel=1e-9, abs=1e-9)
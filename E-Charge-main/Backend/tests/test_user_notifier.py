@@ -0,0 +1,72 @@
+import asyncio
+from app.models.models import User, ChargingPile, ChargingMode, ChargingPileStatus
+from app.routers.charging import _check_charging_notification
+from app.services.station_state import StationState
+from app.services.user_notifier import UserNotifier
+from conftest import make_request, minutes_ago
+
+
+def add_user(db, name):
+    user = User(username=name, hashed_password="x", is_active=True, is_admin=False)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_waiter_woken_when_assigned_pile_frees_up(db, station):
+    """充电桩上的车辆离开时唤醒在该桩排队的用户，其他用户继续等待"""
+    queued, elsewhere = add_user(db, "queued"), add_user(db, "elsewhere")
+    charging = make_request(db, station, ChargingMode.FAST, 10.0, "F1", minutes_ago(30),
+                            status="charging", pile_id=1, started_at=minutes_ago(20))
+    make_request(db, queued, ChargingMode.FAST, 10.0, "F2", minutes_ago(20), pile_id=1)
+    make_request(db, elsewhere, ChargingMode.FAST, 10.0, "F3", minutes_ago(10), pile_id=2)
+    state = StationState(queue_len=2)
+    state.load(db)
+    notifier = UserNotifier(state)
+
+    async def scenario():
+        notifier.start()
+        loop = asyncio.get_running_loop()
+        woken = loop.create_task(notifier.wait(queued.id, notifier.version(queued.id), 5))
+        idle = loop.create_task(notifier.wait(elsewhere.id, notifier.version(elsewhere.id), 0.2))
+        await asyncio.sleep(0)
+        assert notifier.waiting_count == 2
+        # 状态变化发生在请求处理线程中
+        await loop.run_in_executor(None, state.request_finished, charging)
+        results = await asyncio.gather(woken, idle)
+        notifier.stop()
+        return results
+
+    assert asyncio.run(scenario()) == [True, False]
+    assert notifier.waiting_count == 0
+    # 请求所属用户的版本号也增加了
+    assert notifier.version(station.id) == 1
+
+
+def test_change_before_wait_returns_immediately(db, station):
+    state = StationState(queue_len=2)
+    state.load(db)
+    notifier = UserNotifier(state)
+
+    async def scenario():
+        notifier.start()
+        version = notifier.version(station.id)
+        request = make_request(db, station, ChargingMode.TRICKLE, 5.0, "T1")
+        state.request_created(request)
+        await asyncio.sleep(0)
+        changed = await notifier.wait(station.id, version, 5)
+        notifier.stop()
+        return changed
+
+    assert asyncio.run(scenario()) is True
+
+
+def test_notification_reports_available_pile(db, station):
+    request = make_request(db, station, ChargingMode.FAST, 10.0, "F1", pile_id=1)
+    result = _check_charging_notification(db, station.id)
+    assert result["has_available_pile"] is True
+    assert result["request_id"] == request.id and result["pile_info"]["pile_number"] == "A"
+
+    db.get(ChargingPile, 1).status = ChargingPileStatus.OCCUPIED
+    db.commit()
+    assert _check_charging_notification(db, station.id)["has_available_pile"] is False
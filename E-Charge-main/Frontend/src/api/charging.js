@@ -106,10 +106,13 @@ export const getWaitingVehicles = () => {
 }
 
 // 获取充电通知（检查是否有可用充电桩）
-export const getChargingNotification = () => {
+// wait > 0 时为长轮询：服务端最多挂起 wait 秒，充电桩空出或请求状态变化时立即返回
+export const getChargingNotification = (wait = 0) => {
   return request({
     url: '/api/charging/user/charging-notification',
-    method: 'get'
+    method: 'get',
+    params: wait ? { wait } : undefined,
+    timeout: (wait + 10) * 1000
   })
 }
 
@@ -119,4 +122,11 @@ export const startCharging = (requestId) => {
     url: `/api/charging/requests/${requestId}/start-charging`,
     method: 'post'
   })
-} 
\ No newline at end of file
+} 
+// 获取状态推送连接令牌（短期有效，只能用于建立推送连接）
+export const getStreamToken = () => {
+  return request({
+    url: '/api/charging/stream/token',
+    method: 'post'
+  })
+}
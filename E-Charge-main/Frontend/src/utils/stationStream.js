@@ -0,0 +1,100 @@
+// 充电站状态推送（Server-Sent Events）
+// 状态变化时服务端推送事件，视图收到事件后再刷新数据，代替固定间隔轮询
+import { getStreamToken } from '@/api/charging'
+
+const STREAM_URL = '/api/charging/stream'
+const STATION_EVENTS = [
+  'request_created', 'request_assigned', 'request_started', 'request_finished',
+  'request_cancelled', 'request_requeued', 'pile_status_changed', 'loaded'
+]
+// 连接断开或获取连接令牌失败后的重连间隔（毫秒）
+const RETRY_DELAY = 3000
+
+/**
+ * 订阅充电站状态事件
+ * @param {Function} onChange 状态变化回调 (events, data)，短时间内的多个事件合并为一次回调，
+ *   events 为这段时间内收到的事件名集合（Set），data 为最后一个事件的数据
+ * @param {Object} options { onMyRequest: 当前用户请求变化回调 (data), delay: 合并间隔毫秒 }
+ * @returns {Function} 取消订阅
+ */
+export function subscribeStationEvents(onChange, options = {}) {
+  if (!localStorage.getItem('token') || typeof EventSource === 'undefined') {
+    return () => {}
+  }
+  const delay = options.delay ?? 500
+  let source = null
+  let timer = null
+  let closed = false
+  let events = new Set()
+  let lastData = null
+
+  const flush = () => {
+    timer = null
+    if (events.size > 0) {
+      const seen = events
+      events = new Set()
+      onChange(seen, lastData)
+    }
+  }
+
+  const schedule = (event, data) => {
+    events.add(event)
+    lastData = data
+    if (timer === null) {
+      timer = setTimeout(flush, delay)
+    }
+  }
+
+  const reconnect = (wait) => {
+    if (source) {
+      source.close()
+      source = null
+    }
+    // 已退出登录时不再重连
+    if (!closed && localStorage.getItem('token')) {
+      setTimeout(connect, wait)
+    }
+  }
+
+  // EventSource 无法设置请求头，每次连接前用访问令牌换取短期有效的连接令牌放在 URL 中，
+  // 访问令牌本身不出现在 URL 里
+  const connect = async () => {
+    let streamToken
+    try {
+      streamToken = (await getStreamToken()).token
+    } catch (error) {
+      reconnect(RETRY_DELAY)
+      return
+    }
+    if (closed) {
+      return
+    }
+    source = new EventSource(`${STREAM_URL}?token=${encodeURIComponent(streamToken)}`)
+    STATION_EVENTS.forEach(name => {
+      source.addEventListener(name, e => schedule(name, JSON.parse(e.data)))
+    })
+    source.addEventListener('my_request', e => {
+      if (options.onMyRequest) {
+        options.onMyRequest(JSON.parse(e.data))
+      }
+    })
+    // 消息积压时服务端要求重新同步：刷新完整数据后重连
+    source.addEventListener('resync', e => {
+      schedule('resync', JSON.parse(e.data))
+      reconnect(delay)
+    })
+    // 连接令牌已过期，不能依赖 EventSource 自动重连，断开后重新获取令牌再连接
+    source.onerror = () => reconnect(RETRY_DELAY)
+  }
+
+  connect()
+  return () => {
+    closed = true
+    if (timer !== null) {
+      clearTimeout(timer)
+    }
+    if (source) {
+      source.close()
+    }
+  }
+}